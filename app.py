@@ -12,18 +12,47 @@ Refonte complète avec :
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
+import httpx
 from datetime import datetime, date, timedelta
 from dateutil.relativedelta import relativedelta
 import time
+import random
+import bisect
 from io import BytesIO
 import json
+import re
+import hashlib
+import unicodedata
+import math
+import os
+import threading
+import functools
+import contextlib
+import inspect
+import importlib.util
+import logging
+import logging.handlers
+import zipfile
+import uuid
+import sqlite3
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict
+import rapports
 
 # ==============================================================================
 # 1. CONFIGURATION & CONSTANTES
 # ==============================================================================
+# Copy-on-Write (toujours actif à partir de pandas 3) : les tables partagées entre
+# sessions ne sont jamais modifiées sur place, une écriture crée une copie
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
 APP_NAME = "Budget Couple V2"
 APP_VERSION = "2.0.0"
 
@@ -31,6 +60,15 @@ USERS = ["Pierre", "Elie"]
 TYPES = ["Dépense", "Revenu", "Virement Interne", "Épargne", "Investissement"]
 IMPUTATIONS = ["Perso", "Commun (50/50)", "Commun (Autre %)", "Avance/Cadeau"]
 TYPES_COMPTE = ["Courant", "Épargne"]
+PAGES = [
+    "🏠 Accueil",
+    "💳 Opérations",
+    "📊 Analyses",
+    "💎 Patrimoine",
+    "🤝 Remboursements",
+    "🏦 Crédits",
+    "⚙️ Réglages"
+]
 MOIS_FR = [
     "Janvier", "Février", "Mars", "Avril", "Mai", "Juin",
     "Juillet", "Août", "Septembre", "Octobre", "Novembre", "Décembre"
@@ -40,6 +78,103 @@ MOIS_FR = [
 SEUIL_DOUBLON_JOURS = 3
 SEUIL_DEPENSE_ANORMALE = 1.5  # 150% de la moyenne
 
+# Détection des abonnements récurrents
+# Périodicité : (écart nominal en jours, tolérance en jours, occurrences minimum)
+PERIODICITES = {
+    "Mensuel": (30.4, 4, 3),
+    "Trimestriel": (91.3, 8, 3),
+    "Annuel": (365.25, 15, 3),
+}
+BANDE_MONTANT = 0.10  # Montants à ±10% regroupés ensemble
+TOLERANCE_JOUR = 3  # Paiements à ±3 jours du jour habituel du mois (week-ends, fins de mois)
+SEUIL_REGULARITE = 0.75  # 75% des écarts doivent coller à la périodicité
+
+# Rythme d'épargne des projets : moyenne des versements sur les N derniers mois
+FENETRE_RYTHME_PROJETS = 6
+
+# Projections : colonnes des transactions lues par chaque traitement
+# (id inclus : les écritures en attente s'y appliquent aussi)
+COLONNES_SOLDES = ("id", "Date", "Montant", "Type", "Compte_Source", "Compte_Cible")
+COLONNES_PROJETS = ("id", "Date", "Projet_Epargne", "Montant")
+COLONNES_AVANCES = ("id", "Paye_Par", "Imputation", "Montant")
+PAGES_TRANSACTIONS_COMPLETES = {"🏠 Accueil", "💳 Opérations", "📊 Analyses"}
+
+# Détection des changements avant rechargement : table Versions (une ligne par table,
+# incrémentée par trigger, voir sql/versions.sql), à défaut nombre de lignes + id max
+TABLE_VERSIONS = "Versions"
+SONDE_TTL = 2  # Secondes pendant lesquelles une sonde est réutilisée (reruns rapprochés)
+SONDE_REPLI_TTL = 60  # Sans table Versions : rechargement forcé au plus tard après ce délai
+
+# Client Supabase : connexions HTTP gardées ouvertes (keep-alive) et réutilisées, délai
+# max par requête, nouveaux essais sur erreur réseau et disjoncteur (après plusieurs
+# échecs, plus aucune requête pendant un moment : les dernières tables chargées sont servies)
+SUPABASE_DELAI = 30.0  # Secondes max par requête (lecture, écriture)
+SUPABASE_DELAI_CONNEXION = 5.0
+SUPABASE_CONNEXIONS = 10  # Connexions simultanées max, toutes gardées ouvertes
+SUPABASE_KEEPALIVE = 60.0  # Secondes avant fermeture d'une connexion inutilisée
+ESSAIS_MAX = 3  # Tentatives par requête idempotente (lectures, update, upsert, delete, rpc)
+ESSAI_DELAI_BASE = 0.2  # Secondes, doublé à chaque essai, tiré au hasard entre 0 et ce plafond
+ESSAI_DELAI_MAX = 2.0
+DISJONCTEUR_SEUIL = 5  # Échecs réseau consécutifs avant ouverture
+DISJONCTEUR_DELAI = 30.0  # Secondes avant une requête d'essai
+# Erreurs passagères : statut HTTP (seulement quand la réponse n'est pas du JSON, ex. page
+# d'erreur de la passerelle), sinon code PostgREST ou SQLSTATE renvoyé par la base
+CODES_TRANSITOIRES = {
+    "408", "429", "500", "502", "503", "504",
+    "PGRST000", "PGRST001", "PGRST002", "PGRST003",  # Base injoignable, cache de schéma, pool saturé
+    "57P01", "57P02", "57P03", "57014",  # Arrêt ou redémarrage de Postgres, délai de requête dépassé
+    "53000", "53300", "40001", "40P01",  # Ressources ou connexions épuisées, conflit entre transactions
+}
+SQLSTATE_CONNEXION = "08"  # Classe SQLSTATE des erreurs de connexion
+LATENCE_BORNES_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)  # Histogramme par table
+
+# Cache partagé entre répliques : dossier commun (volume partagé) contenant les tables
+# nettoyées au format Arrow et un jeton de version par table, changé à chaque écriture
+CACHE_PARTAGE_ENV = "BUDGET_CACHE_PARTAGE"
+
+# Écritures groupées : nombre max d'ids par requête (limite de longueur d'URL)
+TAILLE_LOT_ECRITURE = 200
+
+# Écritures différées : journal local durable, vidé vers Supabase par un thread de fond
+ECRITURES_DELAI_BASE = 1.0  # Secondes avant le 1er nouvel essai, doublé à chaque échec
+ECRITURES_DELAI_MAX = 300.0
+ECRITURES_BAIL = 60.0  # Secondes : bail d'envoi d'un processus, prolongé tant qu'il tourne
+# Clé générée à l'ajout de chaque insertion (colonne de sql/ecritures.sql) : l'envoi est un
+# upsert sur cette clé, un nouvel essai après une réponse perdue ne crée pas de doublon
+CLE_ECRITURE = "Cle_Ecriture"
+
+# Export de l'historique complet
+FORMATS_EXPORT = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+TAILLE_LOT_EXPORT = 10_000
+EXCEL_LIGNES_PAR_FEUILLE = 1_048_575  # Limite d'Excel (1 048 576 lignes) moins l'en-tête
+
+# Rapports PDF générés en lot (un processus par cœur, plafonné)
+NB_PROCESSUS_RAPPORTS = min(4, os.cpu_count() or 1)
+
+# Fichiers locaux (modèles, caches disque)
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+MODELE_CATEGORIES_PATH = os.path.join(CACHE_DIR, "categoriseur.json")
+ECRITURES_PATH = os.path.join(CACHE_DIR, "ecritures.sqlite")
+
+# Profilage (désactivé par défaut : interrupteur dans la barre latérale ou BUDGET_PROFILAGE=1)
+PROFILAGE_ENV = "BUDGET_PROFILAGE"
+PROFILAGE_LOG_PATH = os.path.join(CACHE_DIR, "profilage.jsonl")
+PROFILAGE_LOG_TAILLE = 5 * 1024 * 1024  # Rotation à 5 Mo
+PROFILAGE_LOG_FICHIERS = 3
+
+# Client Supabase local (hors ligne, tests de charge) : chemin d'un JSON {table: [lignes]} ou "1" (vide)
+FAKE_SUPABASE_ENV = "BUDGET_FAKE_SUPABASE"
+FAKE_LATENCE_ENV = "BUDGET_FAKE_LATENCE_MS"
+FAKE_ECHECS_ENV = "BUDGET_FAKE_ECHECS"  # Part des requêtes en échec réseau simulé (0 à 1)
+
+# Agrégations des tableaux de bord : "pandas" (local, défaut) ou "supabase" (fonctions SQL
+# de sql/agregations.sql appelées en RPC, seules les lignes agrégées sont transférées)
+AGREGATIONS_ENV = "BUDGET_AGREGATIONS"
+
 # Couleurs du thème
 COLORS = {
     "primary": "#6366F1",      # Indigo
@@ -337,16 +472,649 @@ def apply_modern_style():
     """, unsafe_allow_html=True)
 
 
+# ==============================================================================
+# 2b. PROFILAGE
+# ==============================================================================
+@st.cache_resource
+def get_etat_profilage() -> threading.local:
+    """
+    État du passage en cours (trace, compteurs réseau), propre à chaque thread.
+    Partagé entre reruns : les objets en cache (client Supabase) gardent la même référence.
+    """
+    return threading.local()
+
+
+_profilage = get_etat_profilage()
+
+
+def profilage_actif() -> bool:
+    """Le profilage est opt-in : variable d'environnement ou interrupteur de session"""
+    if os.environ.get(PROFILAGE_ENV) == "1":
+        return True
+    try:
+        return bool(st.session_state.get("profilage", False))
+    except Exception:
+        return False
+
+
+@contextlib.contextmanager
+def mesurer(nom: str, categorie: str, **details):
+    """
+    Chronomètre un bloc et l'ajoute à la trace du passage en cours.
+    La première mesure d'un passage (run complet ou fragment) ouvre la trace
+    et la publie à sa fermeture. Le dict yieldé permet d'ajouter des détails.
+    """
+    if not profilage_actif():
+        yield details
+        return
+    
+    trace = getattr(_profilage, "trace", None)
+    racine = trace is None
+    if racine:
+        trace = _profilage.trace = {"debut": time.perf_counter(), "racine": nom, "mesures": []}
+        _profilage.profondeur = 0
+    
+    mesure = {"nom": nom, "categorie": categorie, "profondeur": _profilage.profondeur,
+              "debut_ms": (time.perf_counter() - trace["debut"]) * 1000}
+    _profilage.profondeur += 1
+    debut = time.perf_counter()
+    try:
+        yield details
+    finally:
+        mesure["duree_ms"] = (time.perf_counter() - debut) * 1000
+        mesure.update(details)
+        _profilage.profondeur -= 1
+        trace["mesures"].append(mesure)
+        if racine:
+            _profilage.trace = None
+            publier_trace(trace)
+
+
+def publier_trace(trace: dict):
+    """Garde la trace pour le panneau de la barre latérale et l'ajoute au journal JSONL"""
+    mesures = sorted(trace["mesures"], key=lambda m: m["debut_ms"])
+    try:
+        st.session_state["profilage_trace"] = {"racine": trace["racine"], "mesures": mesures}
+    except Exception:
+        pass
+    
+    journal = get_journal_profilage()
+    if journal is not None:
+        journal.info(json.dumps({
+            "horodatage": datetime.now().isoformat(timespec="milliseconds"),
+            "racine": trace["racine"],
+            "duree_ms": round(max(m["debut_ms"] + m["duree_ms"] for m in mesures), 2),
+            "mesures": mesures,
+        }, ensure_ascii=False, default=str))
+
+
+@st.cache_resource(show_spinner=False)
+def get_journal_profilage():
+    """Journal JSONL des traces, avec rotation (None si le dossier n'est pas inscriptible)"""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            PROFILAGE_LOG_PATH, maxBytes=PROFILAGE_LOG_TAILLE, backupCount=PROFILAGE_LOG_FICHIERS, encoding="utf-8"
+        )
+    except OSError:
+        return None
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    journal = logging.getLogger("budget.profilage")
+    journal.handlers = [handler]
+    journal.setLevel(logging.INFO)
+    journal.propagate = False
+    return journal
+
+
+def chronometrer(nom: str, categorie: str = "page"):
+    """
+    Mesure la durée de rendu d'une section (page complète ou fragment).
+    La section la plus externe délimite le passage : les requêtes Supabase
+    qu'il déclenche sont comptées (reseau_passage, et cumul de session dans reseau_session).
+    """
+    def decorateur(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            racine = getattr(_profilage, "reseau", None) is None
+            if racine:
+                _profilage.reseau = {}
+            debut = time.perf_counter()
+            try:
+                with mesurer(nom, categorie):
+                    return func(*args, **kwargs)
+            finally:
+                durees = st.session_state.setdefault("durees_rendu", {})
+                durees[nom] = (time.perf_counter() - debut) * 1000
+                if racine:
+                    st.session_state["reseau_passage"] = {"racine": nom, "requetes": _profilage.reseau}
+                    cumul = st.session_state.setdefault("reseau_session", {})
+                    for cle, c in _profilage.reseau.items():
+                        total = cumul.setdefault(cle, dict.fromkeys(c, 0))
+                        for k, v in c.items():
+                            total[k] += v
+                    _profilage.reseau = None
+        return wrapper
+    return decorateur
+
+
+def instrumenter(categorie: str):
+    """Décorateur de classe : chaque méthode est mesurée quand le profilage est actif"""
+    def decorateur(cls):
+        for nom, attribut in list(vars(cls).items()):
+            if not inspect.isfunction(attribut) or (nom.startswith("__") and nom != "__init__"):
+                continue
+            
+            def envelopper(func, nom_mesure):
+                @functools.wraps(func)
+                def wrapper(*args, **kwargs):
+                    with mesurer(nom_mesure, categorie):
+                        return func(*args, **kwargs)
+                return wrapper
+            
+            setattr(cls, nom, envelopper(attribut, f"{cls.__name__}.{nom}"))
+        return cls
+    return decorateur
+
+
 # ==============================================================================
 # 3. BACKEND SUPABASE
 # ==============================================================================
+class ReponseFake:
+    """Réponse au format du client Supabase (data, count)"""
+    
+    def __init__(self, data: list, count: int = None):
+        self.data = data
+        self.count = count
+
+
+class RequeteFake:
+    """Chaîne table().select/insert/update/delete/eq/in_/range/order/limit sur des listes de dicts"""
+    
+    def __init__(self, client: "FakeSupabaseClient", table: str):
+        self.client = client
+        self.table = table
+        self.operation = "select"
+        self.colonnes = "*"
+        self.compter = None
+        self.payload = None
+        self.filtres = []
+        self.tri = None
+        self.plage = None
+        self.limite = None
+    
+    def select(self, colonnes: str = "*", count: str = None):
+        self.colonnes, self.compter = colonnes, count
+        return self
+    
+    def insert(self, payload):
+        self.operation, self.payload = "insert", payload
+        return self
+    
+    def upsert(self, payload, on_conflict: str = "id"):
+        self.operation, self.payload, self.conflit = "upsert", payload, on_conflict
+        return self
+    
+    def update(self, payload: dict):
+        self.operation, self.payload = "update", payload
+        return self
+    
+    def delete(self):
+        self.operation = "delete"
+        return self
+    
+    def eq(self, colonne: str, valeur):
+        self.filtres.append(lambda r: r.get(colonne) == valeur)
+        return self
+    
+    def in_(self, colonne: str, valeurs: list):
+        valeurs = set(valeurs)
+        self.filtres.append(lambda r: r.get(colonne) in valeurs)
+        return self
+    
+    def order(self, colonne: str, desc: bool = False):
+        self.tri = (colonne, desc)
+        return self
+    
+    def range(self, debut: int, fin: int):
+        self.plage = (debut, fin)
+        return self
+    
+    def limit(self, n: int):
+        self.limite = n
+        return self
+    
+    def execute(self) -> ReponseFake:
+        self.client.simuler_reseau()
+        with self.client.lock:
+            lignes = self.client.tables.setdefault(self.table, [])
+            retenues = [r for r in lignes if all(f(r) for f in self.filtres)]
+            
+            if self.operation != "select":
+                self.client.revision += 1
+                self.client.incrementer_version(self.table)
+            
+            if self.operation == "insert":
+                nouvelles = self.payload if isinstance(self.payload, list) else [self.payload]
+                data = []
+                for ligne in nouvelles:
+                    self.client.dernier_id += 1
+                    data.append({**ligne, "id": self.client.dernier_id})
+                lignes.extend(data)
+                return ReponseFake([dict(r) for r in data])
+            
+            if self.operation == "upsert":
+                existantes = {r.get(self.conflit): r for r in lignes if r.get(self.conflit) is not None}
+                data = []
+                for ligne in self.payload if isinstance(self.payload, list) else [self.payload]:
+                    r = existantes.get(ligne.get(self.conflit))
+                    if r is None:
+                        self.client.dernier_id += 1
+                        r = {**ligne, "id": ligne.get("id") or self.client.dernier_id}
+                        lignes.append(r)
+                    else:
+                        r.update(ligne)
+                    data.append(dict(r))
+                return ReponseFake(data)
+            
+            if self.operation == "update":
+                for r in retenues:
+                    r.update(self.payload)
+                return ReponseFake([dict(r) for r in retenues])
+            
+            if self.operation == "delete":
+                supprimees = {id(r) for r in retenues}
+                self.client.tables[self.table] = [r for r in lignes if id(r) not in supprimees]
+                return ReponseFake([dict(r) for r in retenues])
+            
+            total = len(retenues)
+            if self.tri:
+                colonne, desc = self.tri
+                retenues = sorted(retenues, key=lambda r: (r.get(colonne) is None, r.get(colonne)), reverse=desc)
+            if self.plage:
+                retenues = retenues[self.plage[0]:self.plage[1] + 1]
+            if self.limite is not None:
+                retenues = retenues[:self.limite]
+            if self.colonnes != "*":
+                noms = [c.strip() for c in self.colonnes.split(",")]
+                retenues = [{c: r.get(c) for c in noms} for r in retenues]
+            else:
+                retenues = [dict(r) for r in retenues]
+            return ReponseFake(retenues, total if self.compter else None)
+
+
+class RpcFake:
+    """Appel rpc() du client local : la fonction d'agrégation est exécutée par MoteurSQLite"""
+    
+    def __init__(self, client: "FakeSupabaseClient", fonction: str, params: dict):
+        self.client = client
+        self.fonction = fonction
+        self.params = params
+    
+    def execute(self) -> ReponseFake:
+        self.client.simuler_reseau()
+        with self.client.lock:
+            return ReponseFake(self.client.moteur_sql().appeler(self.fonction, self.params))
+
+
+class FakeSupabaseClient:
+    """
+    Client Supabase local, en mémoire (développement hors ligne, mesure des allers-retours).
+    Une latence fixe peut être ajoutée à chaque requête pour simuler le réseau,
+    ainsi qu'une part de requêtes en échec (coupure avant d'atteindre le serveur).
+    Les fonctions RPC d'agrégation sont servies par une copie SQLite des tables.
+    """
+    
+    def __init__(self, tables: dict = None, latence_ms: float = 0.0, taux_echec: float = 0.0):
+        self.tables = {nom: [dict(r) for r in lignes] for nom, lignes in (tables or {}).items()}
+        self.latence_ms = latence_ms
+        self.taux_echec = taux_echec
+        self.lock = threading.Lock()
+        self.dernier_id = max((r.get("id") or 0 for lignes in self.tables.values() for r in lignes), default=0)
+        self.revision = 0  # Incrémentée à chaque écriture
+        self._moteur = None
+    
+    @classmethod
+    def depuis_fichier(cls, chemin: str, latence_ms: float = 0.0, taux_echec: float = 0.0) -> "FakeSupabaseClient":
+        """Tables lues dans un JSON {table: [lignes]}"""
+        with open(chemin, encoding="utf-8") as f:
+            return cls(json.load(f), latence_ms, taux_echec)
+    
+    def simuler_reseau(self):
+        """Latence de chaque requête, et coupure aléatoire selon taux_echec"""
+        if self.latence_ms:
+            time.sleep(self.latence_ms / 1000)
+        if self.taux_echec and random.random() < self.taux_echec:
+            raise ConnectionError("Coupure réseau simulée")
+    
+    def table(self, nom: str) -> RequeteFake:
+        return RequeteFake(self, nom)
+    
+    def rpc(self, fonction: str, params: dict = None) -> RpcFake:
+        return RpcFake(self, fonction, params or {})
+    
+    def incrementer_version(self, table: str):
+        """Équivalent du trigger de sql/versions.sql (si la table Versions est renseignée)"""
+        versions = self.tables.get(TABLE_VERSIONS)
+        if not versions or table == TABLE_VERSIONS:
+            return
+        ligne = next((r for r in versions if r.get("Table") == table), None)
+        if ligne is None:
+            versions.append({"Table": table, "Version": 1})
+        else:
+            ligne["Version"] = (ligne.get("Version") or 0) + 1
+    
+    def moteur_sql(self) -> "MoteurSQLite":
+        """Copie SQLite des tables, reconstruite après une écriture (appelé sous verrou)"""
+        if self._moteur is None or self._moteur[0] != self.revision:
+            self._moteur = (self.revision, MoteurSQLite(self.tables))
+        return self._moteur[1]
+
+
+def montant_sqlite(colonne: str) -> str:
+    """Expression SQLite équivalente à clean_amount (0 si vide ou illisible)"""
+    return (f"COALESCE(CAST(REPLACE(REPLACE(REPLACE(REPLACE(CAST({colonne} AS TEXT), ' ', ''), "
+            f"char(160), ''), '€', ''), ',', '.') AS REAL), 0)")
+
+
+# Fonctions de sql/agregations.sql réécrites pour SQLite (mêmes noms, paramètres et colonnes)
+REQUETES_SQLITE = {
+    "budget_soldes": f"""
+        WITH releves AS (
+            SELECT "Compte" AS compte, substr("Date", 1, 10) AS jour, {montant_sqlite('"Montant"')} AS montant,
+                   ROW_NUMBER() OVER (PARTITION BY "Compte" ORDER BY substr("Date", 1, 10) DESC) AS rang
+            FROM "Patrimoine" WHERE "Date" IS NOT NULL
+        ),
+        base AS (
+            SELECT c.value AS compte, COALESCE(r.montant, 0) AS solde, COALESCE(r.jour, '2000-01-01') AS depuis
+            FROM json_each(:p_comptes) c LEFT JOIN releves r ON r.compte = c.value AND r.rang = 1
+        ),
+        transactions AS (
+            SELECT substr("Date", 1, 10) AS jour, "Type" AS type, COALESCE("Compte_Source", '') AS source,
+                   COALESCE("Compte_Cible", '') AS cible, {montant_sqlite('"Montant"')} AS montant
+            FROM "Data" WHERE "Date" IS NOT NULL
+        ),
+        mouvements AS (
+            SELECT cible AS compte, jour,
+                   montant * CASE WHEN type IN ('Virement Interne', 'Épargne') THEN 2 ELSE 1 END AS delta
+            FROM transactions WHERE cible <> ''
+            UNION ALL
+            SELECT source, jour, montant FROM transactions WHERE type = 'Revenu' AND source <> cible
+            UNION ALL
+            SELECT source, jour, -montant FROM transactions
+            WHERE type IN ('Dépense', 'Investissement', 'Épargne', 'Virement Interne')
+        )
+        SELECT b.compte AS "Compte", b.solde + COALESCE(SUM(m.delta), 0) AS "Solde"
+        FROM base b LEFT JOIN mouvements m ON m.compte = b.compte AND m.jour > b.depuis
+        GROUP BY b.compte, b.solde
+    """,
+    "budget_totaux_categories": f"""
+        SELECT "Type", "Categorie", SUM(montant) AS "Total", COUNT(*) AS "Nb", AVG(montant) AS "Moyenne"
+        FROM (SELECT "Type", "Categorie", {montant_sqlite('"Montant"')} AS montant FROM "Data"
+              WHERE CAST("Mois" AS INTEGER) = :p_mois AND CAST("Annee" AS INTEGER) = :p_annee
+                AND "Type" IS NOT NULL AND "Categorie" IS NOT NULL)
+        GROUP BY "Type", "Categorie"
+        ORDER BY "Type", "Categorie"
+    """,
+    "budget_flux_mensuels": f"""
+        SELECT CAST("Annee" AS INTEGER) AS "Annee", CAST("Mois" AS INTEGER) AS "Mois",
+               SUM(CASE WHEN "Type" = 'Revenu' THEN {montant_sqlite('"Montant"')} ELSE 0 END) AS "Revenus",
+               SUM(CASE WHEN "Type" = 'Dépense' THEN {montant_sqlite('"Montant"')} ELSE 0 END) AS "Depenses"
+        FROM "Data"
+        WHERE "Qui_Connecte" = :p_utilisateur
+          AND CAST("Annee" AS INTEGER) * 12 + CAST("Mois" AS INTEGER) - 1
+              BETWEEN :p_annee * 12 + :p_mois - :p_nb_mois AND :p_annee * 12 + :p_mois - 1
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+    """,
+}
+
+
+class MoteurSQLite:
+    """
+    Équivalent local des fonctions d'agrégation Supabase : les tables brutes
+    (listes de dicts, format de l'API) copiées dans une base SQLite en mémoire.
+    """
+    
+    TABLES = {
+        "Data": ("Date", "Mois", "Annee", "Qui_Connecte", "Type", "Categorie", "Montant",
+                 "Compte_Source", "Compte_Cible"),
+        "Patrimoine": ("Date", "Compte", "Montant"),
+    }
+    
+    def __init__(self, tables: dict):
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        for table, colonnes in self.TABLES.items():
+            noms = ", ".join(f'"{c}"' for c in colonnes)
+            self.conn.execute(f'CREATE TABLE "{table}" ({noms})')
+            self.conn.executemany(
+                f'INSERT INTO "{table}" VALUES ({", ".join("?" * len(colonnes))})',
+                ([str(v) if isinstance(v, (date, datetime)) else v for v in map(r.get, colonnes)]
+                 for r in tables.get(table, []))
+            )
+    
+    def appeler(self, fonction: str, params: dict) -> list:
+        """Exécute une fonction d'agrégation ; lignes au format de la réponse RPC"""
+        if fonction not in REQUETES_SQLITE:
+            raise ValueError(f"Fonction inconnue : {fonction}")
+        params = {k: json.dumps(v) if isinstance(v, list) else v for k, v in params.items()}
+        curseur = self.conn.execute(REQUETES_SQLITE[fonction], params)
+        colonnes = [c[0] for c in curseur.description]
+        return [dict(zip(colonnes, ligne)) for ligne in curseur.fetchall()]
+
+
+class RequeteInstrumentee:
+    """Enveloppe d'une requête : transmet la chaîne d'appels et mesure execute()"""
+    
+    OPERATIONS = {"select", "insert", "update", "upsert", "delete"}
+    
+    def __init__(self, client: "ClientInstrumente", table: str, requete, operation: str = "select",
+                 octets_envoyes: int = 0):
+        self._client = client
+        self._table = table
+        self._requete = requete
+        self._operation = operation
+        self._octets_envoyes = octets_envoyes
+    
+    def __getattr__(self, nom: str):
+        methode = getattr(self._requete, nom)
+        
+        def appel(*args, **kwargs):
+            operation, octets = self._operation, self._octets_envoyes
+            if nom in self.OPERATIONS:
+                operation = nom
+                if args and nom != "select":
+                    octets = len(json.dumps(args[0], default=str))
+            return RequeteInstrumentee(self._client, self._table, methode(*args, **kwargs), operation, octets)
+        return appel
+    
+    def execute(self):
+        return self._client.executer(self._table, self._operation, self._requete, self._octets_envoyes)
+
+
+def taille_json(lignes: list, echantillon: int = 1000) -> int:
+    """Taille JSON d'une liste de lignes (extrapolée d'un échantillon au-delà de 1000 lignes)"""
+    if len(lignes) <= echantillon:
+        return len(json.dumps(lignes, default=str))
+    return len(json.dumps(lignes[:echantillon], default=str)) * len(lignes) // echantillon
+
+
+class SupabaseIndisponible(ConnectionError):
+    """Requête refusée sans appel réseau : le disjoncteur est ouvert"""
+
+
+def erreur_transitoire(e: Exception) -> bool:
+    """Erreur réseau ou serveur momentanément indisponible (un nouvel essai peut réussir)"""
+    if isinstance(e, (httpx.TransportError, ConnectionError, TimeoutError)):
+        return True
+    code = str(getattr(e, "code", None) or "")
+    return code in CODES_TRANSITOIRES or (len(code) == 5 and code.startswith(SQLSTATE_CONNEXION))
+
+
+class Disjoncteur:
+    """
+    Coupe les requêtes après DISJONCTEUR_SEUIL échecs réseau consécutifs, pendant
+    DISJONCTEUR_DELAI secondes ; une seule requête d'essai passe ensuite, qui le
+    referme si elle réussit ou le rouvre sinon.
+    """
+    
+    def __init__(self, seuil: int = DISJONCTEUR_SEUIL, delai: float = DISJONCTEUR_DELAI):
+        self.seuil = seuil
+        self.delai = delai
+        self._lock = threading.Lock()
+        self.echecs = 0
+        self.ouvert_jusqua = None
+        self._essai_en_cours = False
+    
+    def autoriser(self) -> bool:
+        with self._lock:
+            if self.ouvert_jusqua is None:
+                return True
+            if time.time() < self.ouvert_jusqua or self._essai_en_cours:
+                return False
+            self._essai_en_cours = True
+            return True
+    
+    def succes(self):
+        with self._lock:
+            self.echecs = 0
+            self.ouvert_jusqua = None
+            self._essai_en_cours = False
+    
+    def echec(self):
+        with self._lock:
+            self.echecs += 1
+            if self._essai_en_cours or self.echecs >= self.seuil:
+                self.ouvert_jusqua = time.time() + self.delai
+            self._essai_en_cours = False
+    
+    def ouvert(self) -> bool:
+        return self.ouvert_jusqua is not None
+    
+    def reste(self) -> float:
+        """Secondes avant la prochaine requête d'essai"""
+        ouvert_jusqua = self.ouvert_jusqua
+        return max(0.0, ouvert_jusqua - time.time()) if ouvert_jusqua is not None else 0.0
+
+
+def quantile_histogramme(compteurs: list, q: float) -> float:
+    """Borne haute (ms) de la classe contenant le quantile q (inf pour la dernière classe)"""
+    seuil = q * sum(compteurs)
+    cumul = 0
+    for borne, n in zip((*LATENCE_BORNES_MS, math.inf), compteurs):
+        cumul += n
+        if cumul >= seuil and cumul:
+            return borne
+    return 0.0
+
+
+class ClientInstrumente:
+    """
+    Enveloppe du client Supabase : compte requêtes, lignes, octets et durée
+    par table et opération, depuis le démarrage et pour le passage en cours,
+    et histogramme des latences par table.
+    Chaque requête passe par le disjoncteur ; les requêtes idempotentes sont
+    relancées (délai exponentiel aléatoire) sur erreur réseau.
+    """
+    
+    IDEMPOTENTES = {"select", "update", "upsert", "delete", "rpc"}
+    
+    def __init__(self, client):
+        self._client = client
+        self._lock = threading.Lock()
+        self.totaux = {}
+        self.latences = {}
+        self.disjoncteur = Disjoncteur()
+    
+    def __getattr__(self, nom: str):
+        return getattr(self._client, nom)
+    
+    def table(self, nom: str) -> RequeteInstrumentee:
+        return RequeteInstrumentee(self, nom, self._client.table(nom))
+    
+    def rpc(self, fonction: str, params: dict = None) -> RequeteInstrumentee:
+        params = params or {}
+        return RequeteInstrumentee(self, fonction, self._client.rpc(fonction, params), "rpc",
+                                   len(json.dumps(params, default=str)))
+    
+    def executer(self, table: str, operation: str, requete, octets_envoyes: int = 0):
+        """execute() d'une requête, mesuré, avec disjoncteur et nouveaux essais"""
+        essais = ESSAIS_MAX if operation in self.IDEMPOTENTES else 1
+        for essai in range(essais):
+            if not self.disjoncteur.autoriser():
+                raise SupabaseIndisponible(
+                    f"Supabase injoignable, nouvel essai dans {self.disjoncteur.reste():.0f} s"
+                )
+            try:
+                with mesurer(f"supabase.{operation}({table})", "réseau") as details:
+                    debut = time.perf_counter()
+                    reponse = requete.execute()
+                    duree = (time.perf_counter() - debut) * 1000
+                    data = reponse.data if isinstance(getattr(reponse, "data", None), list) else []
+                    # Sérialiser la réponse pour la mesurer coûte : seulement quand on profile
+                    octets = octets_envoyes + taille_json(data) if profilage_actif() else 0
+                    details.update(lignes=len(data), octets=octets, essai=essai + 1)
+            except Exception as e:
+                if not erreur_transitoire(e):
+                    self.disjoncteur.succes()  # Le serveur a répondu (requête refusée)
+                    raise
+                self.disjoncteur.echec()
+                self.enregistrer(table, operation, echec=True)
+                if essai == essais - 1:
+                    raise
+                time.sleep(random.uniform(0, min(ESSAI_DELAI_MAX, ESSAI_DELAI_BASE * 2 ** essai)))
+                continue
+            
+            self.disjoncteur.succes()
+            self.enregistrer(table, operation, details["lignes"], details["octets"], duree)
+            return reponse
+    
+    def enregistrer(self, table: str, operation: str, lignes: int = 0, octets: int = 0,
+                    duree_ms: float = 0.0, echec: bool = False):
+        """Ajoute une requête (ou un échec) aux totaux et aux compteurs du passage (run ou fragment) en cours"""
+        cle = f"{operation} {table}"
+        passage = getattr(_profilage, "reseau", None)
+        with self._lock:
+            for compteurs in (self.totaux, passage):
+                if compteurs is None:
+                    continue
+                c = compteurs.setdefault(cle, {"requetes": 0, "lignes": 0, "octets": 0, "ms": 0.0, "echecs": 0})
+                if echec:
+                    c["echecs"] += 1
+                    continue
+                c["requetes"] += 1
+                c["lignes"] += lignes
+                c["octets"] += octets
+                c["ms"] += duree_ms
+            if not echec:
+                histogramme = self.latences.setdefault(table, [0] * (len(LATENCE_BORNES_MS) + 1))
+                histogramme[bisect.bisect_left(LATENCE_BORNES_MS, duree_ms)] += 1
+
+
 @st.cache_resource
 def get_db() -> Client:
-    """Connexion Supabase (singleton)"""
+    """
+    Connexion Supabase (singleton), instrumentée ; client local si BUDGET_FAKE_SUPABASE est défini.
+    Un seul client HTTP pour tout le processus : connexions réutilisées d'une requête à l'autre.
+    """
+    fake = os.environ.get(FAKE_SUPABASE_ENV)
+    if fake:
+        latence = float(os.environ.get(FAKE_LATENCE_ENV, 0))
+        echecs = float(os.environ.get(FAKE_ECHECS_ENV, 0))
+        client = FakeSupabaseClient(latence_ms=latence, taux_echec=echecs) if fake == "1" \
+            else FakeSupabaseClient.depuis_fichier(fake, latence, echecs)
+        return ClientInstrumente(client)
+    
     try:
         url = st.secrets["SUPABASE_URL"]
         key = st.secrets["SUPABASE_KEY"]
-        return create_client(url, key)
+        http = httpx.Client(
+            timeout=httpx.Timeout(SUPABASE_DELAI, connect=SUPABASE_DELAI_CONNEXION),
+            limits=httpx.Limits(max_connections=SUPABASE_CONNEXIONS, max_keepalive_connections=SUPABASE_CONNEXIONS,
+                                keepalive_expiry=SUPABASE_KEEPALIVE),
+            follow_redirects=True,
+            http2=True,
+        )
+        return ClientInstrumente(create_client(url, key, options=ClientOptions(httpx_client=http)))
     except Exception as e:
         st.error(f"❌ Erreur connexion Supabase: {e}")
         return None
@@ -363,182 +1131,1435 @@ def clean_amount(val) -> float:
         return 0.0
 
 
-@st.cache_data(ttl=60, show_spinner=False)
-def load_table(table_name: str) -> pd.DataFrame:
-    """Charge une table Supabase avec nettoyage automatique"""
-    supabase = get_db()
-    if not supabase:
-        return pd.DataFrame()
-    
+def normaliser_texte(val) -> str:
+    """Minuscules sans accents (pour comparer des libellés)"""
+    if val is None or (isinstance(val, float) and pd.isna(val)):
+        return ""
+    s = unicodedata.normalize("NFKD", str(val))
+    return s.encode("ascii", "ignore").decode("ascii").lower().strip()
+
+
+def normaliser_serie(serie: pd.Series) -> pd.Series:
+    """Version vectorisée de normaliser_texte"""
+    return (
+        serie.fillna("").astype(str)
+        .str.normalize("NFKD")
+        .str.encode("ascii", "ignore")
+        .str.decode("ascii")
+        .str.lower()
+        .str.strip()
+    )
+
+
+def calculer_version(df: pd.DataFrame) -> str:
+    """Empreinte du contenu d'une table (change dès qu'une ligne change)"""
+    if df.empty:
+        return "vide"
     try:
-        response = supabase.table(table_name).select("*").execute()
-        df = pd.DataFrame(response.data)
+        empreinte = pd.util.hash_pandas_object(df, index=False).values.tobytes()
+    except TypeError:
+        empreinte = df.to_json().encode()
+    return hashlib.md5(empreinte).hexdigest()
+
+
+class CachePartage:
+    """
+    Cache partagé entre processus (répliques derrière un répartiteur) dans un dossier commun :
+    tables nettoyées en fichiers Arrow IPC lus par memory-map, un fichier par
+    (table, projection, signature), et jetons de version des tables.
+    Un autre stockage clé-valeur (Redis...) peut le remplacer avec les mêmes méthodes.
+    """
+    
+    def __init__(self, dossier: str):
+        self.dossier = dossier
+        os.makedirs(os.path.join(dossier, "versions"), exist_ok=True)
+    
+    def _ecrire_atomique(self, chemin: str, ecrire):
+        """Écrit dans un fichier temporaire propre au processus puis le renomme"""
+        tmp = f"{chemin}.{os.getpid()}.{threading.get_ident()}.tmp"
+        ecrire(tmp)
+        os.replace(tmp, chemin)
+    
+    def jeton(self, table_name: str) -> str:
+        """Jeton de version de la table (le même pour toutes les répliques)"""
+        try:
+            with open(os.path.join(self.dossier, "versions", table_name), encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return "0"
+    
+    def changer_jeton(self, table_name: str):
+        """Signale une écriture à toutes les répliques"""
+        def ecrire(tmp):
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(uuid.uuid4().hex)
+        self._ecrire_atomique(os.path.join(self.dossier, "versions", table_name), ecrire)
+    
+    def _chemin(self, table_name: str, colonnes: tuple, signature: str) -> str:
+        projection = "" if colonnes is None else "-" + hashlib.md5(",".join(colonnes).encode()).hexdigest()[:8]
+        return os.path.join(self.dossier, f"{table_name}{projection}@{hashlib.md5(signature.encode()).hexdigest()[:16]}.arrow")
+    
+    def lire(self, table_name: str, colonnes: tuple, signature: str) -> pd.DataFrame:
+        """Table nettoyée pour cette signature (None si aucune réplique ne l'a encore écrite)"""
+        import pyarrow as pa
+        
+        try:
+            with pa.memory_map(self._chemin(table_name, colonnes, signature)) as source:
+                table = pa.ipc.open_file(source).read_all()
+        except (OSError, pa.ArrowInvalid):
+            return None
+        df = table.to_pandas()
+        df.attrs["version"] = table.schema.metadata.get(b"budget_version", b"vide").decode()
+        return df
+    
+    def ecrire(self, table_name: str, colonnes: tuple, signature: str, df: pd.DataFrame):
+        """Publie une table nettoyée et supprime les versions précédentes de la même projection"""
+        import pyarrow as pa
         
         if df.empty:
-            return df
-        
-        # Nettoyage des types
-        if "Date" in df.columns:
-            df["Date"] = pd.to_datetime(df["Date"], errors='coerce').dt.date
-        
-        # Colonnes montants
-        money_cols = ["Montant", "Cible", "Montant_Initial", "Montant_Restant", 
-                      "Mensualite", "Budget", "Part_Perso"]
-        for col in money_cols:
-            if col in df.columns:
-                df[col] = df[col].apply(clean_amount)
-        
-        # Colonnes numériques
-        int_cols = ["Mois", "Annee", "Jour", "Pourcentage_Perso"]
-        for col in int_cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
+            return
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            return  # Colonne de types mélangés : pas de copie partagée
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}), b"budget_version": df.attrs.get("version", "vide").encode()
+        })
+        
+        def ecrire(tmp):
+            with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        
+        chemin = self._chemin(table_name, colonnes, signature)
+        try:
+            self._ecrire_atomique(chemin, ecrire)
+        except OSError:
+            return
         
-        return df
-    except Exception as e:
-        return pd.DataFrame()
+        prefixe = os.path.basename(chemin).split("@")[0] + "@"
+        for nom in os.listdir(self.dossier):
+            if nom.startswith(prefixe) and nom.endswith(".arrow") and nom != os.path.basename(chemin):
+                with contextlib.suppress(OSError):
+                    os.remove(os.path.join(self.dossier, nom))
 
 
-def save_row(table_name: str, data: dict) -> bool:
-    """Insère une nouvelle ligne"""
+@st.cache_resource
+def get_cache_partage() -> CachePartage:
+    """Cache partagé si BUDGET_CACHE_PARTAGE désigne un dossier (None sinon, ou sans pyarrow)"""
+    dossier = os.environ.get(CACHE_PARTAGE_ENV)
+    if not dossier:
+        return None
+    if importlib.util.find_spec("pyarrow") is None:
+        return None
+    try:
+        return CachePartage(dossier)
+    except OSError:
+        return None
+
+
+@st.cache_resource
+def get_revisions_locales() -> dict:
+    """Nombre d'écritures faites par ce processus, par table (partagé par toutes les sessions)"""
+    return {}
+
+
+def marquer_modifiee(table_name: str):
+    """Après une écriture : seule cette table sera rechargée, les autres restent en cache"""
+    revisions = get_revisions_locales()
+    revisions[table_name] = revisions.get(table_name, 0) + 1
+    partage = get_cache_partage()
+    if partage is not None:
+        partage.changer_jeton(table_name)
+
+
+@st.cache_data(ttl=SONDE_TTL, show_spinner=False)
+def sonder_versions() -> dict:
+    """Versions de toutes les tables en une requête (None si la table Versions est absente ou vide)"""
     supabase = get_db()
     if not supabase:
-        return False
+        return None
     
     try:
-        clean_data = {}
-        for k, v in data.items():
-            if isinstance(v, (date, datetime)):
-                clean_data[k] = str(v)
-            elif isinstance(v, float):
-                clean_data[k] = str(v)
-            else:
-                clean_data[k] = v
-        
-        supabase.table(table_name).insert(clean_data).execute()
-        st.cache_data.clear()
-        return True
+        lignes = supabase.table(TABLE_VERSIONS).select("Table,Version").execute().data
     except Exception as e:
-        st.error(f"Erreur sauvegarde: {e}")
-        return False
+        if erreur_transitoire(e):
+            raise  # Non mis en cache : Supabase injoignable n'est pas « table absente »
+        return None
+    return {ligne["Table"]: ligne["Version"] for ligne in lignes} or None
 
 
-def update_row(table_name: str, row_id: int, changes: dict) -> bool:
-    """Met à jour une ligne existante"""
+@st.cache_data(ttl=SONDE_TTL, show_spinner=False)
+def sonder_table(table_name: str) -> str:
+    """
+    Sonde de repli (sans table Versions) : nombre de lignes et id max.
+    Ne voit pas les modifications sur place faites par d'autres clients.
+    """
     supabase = get_db()
     if not supabase:
-        return False
+        return "hors-ligne"
     
     try:
-        clean_changes = {}
-        for k, v in changes.items():
-            if isinstance(v, (date, datetime)):
-                clean_changes[k] = str(v)
-            elif isinstance(v, float):
-                clean_changes[k] = str(v)
+        reponse = supabase.table(table_name).select("id", count="exact").order("id", desc=True).limit(1).execute()
+    except Exception as e:
+        if erreur_transitoire(e):
+            raise
+        return "inconnue"
+    return f"{reponse.count}-{reponse.data[0]['id'] if reponse.data else 0}"
+
+
+@st.cache_data(show_spinner=False)
+def table_versions_presente() -> bool:
+    """La table Versions est installée (vérifié une fois, puis à chaque « Actualiser »)"""
+    return sonder_versions() is not None
+
+
+def signature_table(table_name: str) -> str:
+    """
+    Empreinte bon marché d'une table, vérifiée avant de servir le cache : version
+    distante (table Versions, sinon sonde de la table et tranche de SONDE_REPLI_TTL s)
+    et écritures de l'application (jeton du cache partagé, commun aux répliques,
+    sinon compteur du processus)
+    """
+    try:
+        versions = sonder_versions() if table_versions_presente() else None
+        if versions is not None:
+            distante = versions.get(table_name, 0)
+        else:
+            # La sonde ne voit pas les modifications sur place : durée de vie bornée
+            distante = f"{sonder_table(table_name)}~{int(time.time() // SONDE_REPLI_TTL)}"
+    except Exception:
+        distante = "hors-ligne"  # Rechargement tenté, dernière version chargée servie en cas d'échec
+    partage = get_cache_partage()
+    ecritures = partage.jeton(table_name) if partage is not None else get_revisions_locales().get(table_name, 0)
+    return f"{distante}.{ecritures}"
+
+
+class TablesPartagees:
+    """
+    Tables nettoyées partagées par toutes les sessions du processus, sans copie ni
+    sérialisation : une entrée par (table, projection), remplacée quand la signature
+    change (l'ancienne version est libérée). Chaque appelant reçoit une copie
+    superficielle : en copy-on-write, modifier sa table ne touche jamais l'original.
+    Si le rechargement échoue, la dernière version chargée reste servie (perimees).
+    """
+    
+    def __init__(self):
+        self._entrees = {}
+        self._verrous = {}
+        self._lock = threading.Lock()
+        self.perimees = {}  # table servie en repli → heure de son chargement (vidé dès que Supabase répond)
+    
+    def get(self, table_name: str, colonnes: tuple, signature: str) -> pd.DataFrame:
+        """Table pour cette signature (un seul chargement à la fois par table et projection)"""
+        cle = (table_name, colonnes)
+        with self._lock:
+            entree = self._entrees.get(cle)
+            verrou = self._verrous.setdefault(cle, threading.Lock())
+        if entree is not None and entree[0] == signature:
+            if self.perimees and not signature.startswith("hors-ligne"):
+                with self._lock:
+                    self.perimees.clear()  # Version distante lue : Supabase de nouveau joignable
+            return entree[1].copy(deep=False)
+        
+        with verrou:
+            with self._lock:
+                entree = self._entrees.get(cle)
+            if entree is None or entree[0] != signature:
+                try:
+                    df = _charger_table(table_name, colonnes, signature)
+                except Exception as e:
+                    repli = self._repli(table_name, colonnes) if erreur_transitoire(e) else None
+                    if repli is None:
+                        raise
+                    _profilage.chargement = "périmé"
+                    with self._lock:
+                        self.perimees.setdefault(table_name, repli[1])
+                    return repli[0]
+                entree = (signature, df, datetime.now())
+                with self._lock:
+                    self._entrees[cle] = entree
+                    self.perimees.clear()
+        return entree[1].copy(deep=False)
+    
+    def _repli(self, table_name: str, colonnes: tuple) -> tuple:
+        """(table, heure de chargement) : dernière version chargée de cette projection ou d'une plus large"""
+        with self._lock:
+            candidates = [(cle[1], entree) for cle, entree in self._entrees.items() if cle[0] == table_name]
+        for projection, (_, df, charge_le) in sorted(candidates, key=lambda c: c[0] != colonnes):
+            if projection == colonnes:
+                return df.copy(deep=False), charge_le
+            if colonnes is not None and set(colonnes) <= set(df.columns):
+                return df[list(colonnes)], charge_le
+        return None
+    
+    def vider(self):
+        """Oublie les tables chargées (sauf pour le repli si Supabase est injoignable)"""
+        with self._lock:
+            self._entrees = {cle: (None, *entree[1:]) for cle, entree in self._entrees.items()}
+
+
+@st.cache_resource
+def get_tables_partagees() -> TablesPartagees:
+    return TablesPartagees()
+
+
+def load_table(table_name: str, colonnes: tuple = None) -> pd.DataFrame:
+    """
+    Charge une table Supabase (via le cache), mesurée quand le profilage est actif.
+    colonnes : projection (seules ces colonnes sont transférées, cache séparé)
+    Le cache est servi tant que la signature de la table ne change pas.
+    """
+    nom = f"load_table({table_name}{'' if colonnes is None else f'[{len(colonnes)} col.]'})"
+    with mesurer(nom, "données") as details:
+        _profilage.chargement = "hit"
+        signature = signature_table(table_name)
+        try:
+            df = get_tables_partagees().get(table_name, colonnes, signature)
+        except Exception as e:
+            # Échec non mis en cache : nouvel essai au prochain accès ; table vide pour le rendu seulement
+            cause = "Supabase injoignable, aucune donnée en cache" if erreur_transitoire(e) else "chargement impossible"
+            st.error(f"❌ {table_name} : {cause} ({e})")
+            df = pd.DataFrame()
+        file = get_file_ecritures()
+        if file is not None:
+            df = file.appliquer(table_name, df)
+        if profilage_actif():
+            details.update({
+                "cache": _profilage.chargement,
+                "signature": signature,
+                "lignes": len(df),
+                "octets": df.attrs.get("octets") or int(df.memory_usage().sum()),
+            })
+    return df
+
+
+def _charger_table(table_name: str, colonnes: tuple = None, signature: str = None) -> pd.DataFrame:
+    """
+    Charge une table Supabase (toutes les colonnes ou une projection) avec nettoyage automatique.
+    Avec un cache partagé, la copie nettoyée par une autre réplique est réutilisée.
+    """
+    partage = get_cache_partage()
+    if partage is not None:
+        df = partage.lire(table_name, colonnes, signature)
+        if df is not None:
+            _profilage.chargement = "partagé"
+            return df
+    
+    _profilage.chargement = "miss"
+    supabase = get_db()
+    if not supabase:
+        return pd.DataFrame()
+    
+    response = supabase.table(table_name).select(",".join(colonnes) if colonnes else "*").execute()
+    df = nettoyer_table(pd.DataFrame(response.data))
+    if partage is not None:
+        partage.ecrire(table_name, colonnes, signature, df)
+    return df
+
+
+def nettoyer_table(df: pd.DataFrame) -> pd.DataFrame:
+    """Nettoyage des types d'une table brute (dates, montants, entiers) et calcul de sa version"""
+    if df.empty:
+        return df
+    df = df.drop(columns=[CLE_ECRITURE], errors="ignore")  # Technique (écritures différées)
+    
+    # Nettoyage des types
+    if "Date" in df.columns:
+        df["Date"] = pd.to_datetime(df["Date"], errors='coerce').dt.date
+    
+    # Colonnes montants
+    money_cols = ["Montant", "Cible", "Montant_Initial", "Montant_Restant", 
+                  "Mensualite", "Budget", "Part_Perso"]
+    for col in money_cols:
+        if col in df.columns:
+            df[col] = df[col].apply(clean_amount)
+    
+    # Colonnes numériques
+    int_cols = ["Mois", "Annee", "Jour", "Pourcentage_Perso"]
+    for col in int_cols:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
+    
+    # Version du contenu, utilisée comme clé par les caches dérivés
+    df.attrs["version"] = calculer_version(df)
+    if profilage_actif():
+        df.attrs["octets"] = int(df.memory_usage(deep=True).sum())
+    
+    return df
+
+
+def serialiser_valeurs(data: dict) -> dict:
+    """Convertit dates et floats au format attendu par Supabase"""
+    clean = {}
+    for k, v in data.items():
+        if isinstance(v, (date, datetime)):
+            clean[k] = str(v)
+        elif isinstance(v, float):
+            clean[k] = str(v)
+        else:
+            clean[k] = v
+    return clean
+
+
+def executer_ecriture(supabase, table_name: str, operation: str, payload=None, ids: list = None) -> list:
+    """Envoie une écriture à Supabase (une requête par lot d'ids) ; lignes renvoyées pour un insert"""
+    if operation == "insert":
+        return supabase.table(table_name).insert(payload).execute().data
+    for i in range(0, len(ids), TAILLE_LOT_ECRITURE):
+        lot = [int(x) for x in ids[i:i + TAILLE_LOT_ECRITURE]]
+        requete = supabase.table(table_name).update(payload) if operation == "update" \
+            else supabase.table(table_name).delete()
+        requete.in_("id", lot).execute()
+    return []
+
+
+class ReponseIncoherente(Exception):
+    """Réponse d'insertion inexploitable (ids manquants ou en nombre différent des lignes envoyées)"""
+
+
+class FileEcritures:
+    """
+    Écritures différées (write-behind). Chaque modification est d'abord ajoutée à un
+    journal SQLite local (WAL, synchronous=FULL) puis envoyée à Supabase par un thread
+    de fond : dans l'ordre, les insertions consécutives d'une table en une requête,
+    avec nouvel essai et délai exponentiel en cas d'erreur réseau. Rien n'est perdu
+    pendant une coupure : le journal est repris au prochain démarrage. Chaque insertion
+    porte une clé (CLE_ECRITURE) et part en upsert sur celle-ci : renvoyer un lot déjà
+    enregistré ne crée pas de doublon.
+    Une écriture refusée par Supabase (données invalides, droits) est mise à l'écart
+    (statut « rejetee ») sans bloquer les suivantes, jusqu'à ce que l'utilisateur la
+    relance ou l'abandonne.
+    En attendant l'envoi, les écritures sont appliquées aux tables chargées
+    (superposition optimiste ; une ligne insérée porte l'id temporaire -n° d'écriture).
+    """
+    
+    def __init__(self, chemin: str, apres_envoi=None):
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        self.apres_envoi = apres_envoi
+        self.conn = sqlite3.connect(chemin, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS ecritures (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, table_name TEXT NOT NULL, operation TEXT NOT NULL,
+            payload TEXT, ids TEXT, tentatives INTEGER NOT NULL DEFAULT 0,
+            prochain_essai REAL NOT NULL DEFAULT 0, erreur TEXT, statut TEXT NOT NULL DEFAULT 'attente')""")
+        if "statut" not in {c[1] for c in self.conn.execute("PRAGMA table_info(ecritures)")}:
+            self.conn.execute("ALTER TABLE ecritures ADD COLUMN statut TEXT NOT NULL DEFAULT 'attente'")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS correspondances (
+            temporaire INTEGER PRIMARY KEY, reel INTEGER NOT NULL)""")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS bail (
+            id INTEGER PRIMARY KEY CHECK (id = 1), proprietaire TEXT NOT NULL, expire REAL NOT NULL)""")
+        self._lock = threading.Lock()
+        self._reveil = threading.Event()
+        self._isoler = None  # Lot d'insertions refusé : sa tête est renvoyée seule
+        self._cles = {}  # table → colonne CLE_ECRITURE présente
+        # Un seul processus vide le journal (les autres ne font qu'y ajouter)
+        self._proprietaire = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        threading.Thread(target=self._boucle, name="ecritures-supabase", daemon=True).start()
+    
+    def ajouter(self, table_name: str, operation: str, payload=None, ids: list = None) -> int:
+        """Ajoute une écriture au journal (durable au retour) et réveille le thread d'envoi"""
+        if operation == "insert":
+            payload = {**payload, CLE_ECRITURE: uuid.uuid4().hex}
+        with self._lock:
+            curseur = self.conn.execute(
+                "INSERT INTO ecritures (table_name, operation, payload, ids) VALUES (?, ?, ?, ?)",
+                (table_name, operation, json.dumps(payload, default=str),
+                 None if ids is None else json.dumps([int(x) for x in ids]))
+            )
+        self._reveil.set()
+        return curseur.lastrowid
+    
+    def en_attente(self, table_name: str = None, statut: str = "attente") -> list:
+        """Écritures pas encore envoyées (ou rejetées), dans l'ordre"""
+        requete = ("SELECT id, table_name, operation, payload, ids, tentatives, prochain_essai, erreur "
+                   "FROM ecritures WHERE statut = ?")
+        with self._lock:
+            if table_name is None:
+                lignes = self.conn.execute(f"{requete} ORDER BY id", (statut,)).fetchall()
             else:
-                clean_changes[k] = v
+                lignes = self.conn.execute(f"{requete} AND table_name = ? ORDER BY id", (statut, table_name)).fetchall()
+        return [{
+            "id": l[0], "table": l[1], "operation": l[2], "payload": json.loads(l[3]),
+            "ids": None if l[4] is None else json.loads(l[4]), "tentatives": l[5],
+            "prochain_essai": l[6], "erreur": l[7],
+        } for l in lignes]
+    
+    def rejetees(self) -> list:
+        """Écritures refusées par Supabase, en attente d'une décision de l'utilisateur"""
+        return self.en_attente(statut="rejetee")
+    
+    def relancer(self, ecriture_id: int):
+        """Remet une écriture rejetée dans la file (à sa place d'origine)"""
+        with self._lock:
+            self.conn.execute(
+                "UPDATE ecritures SET statut = 'attente', tentatives = 0, prochain_essai = 0, erreur = NULL WHERE id = ?",
+                (ecriture_id,)
+            )
+        self._reveil.set()
+    
+    def abandonner(self, ecriture_id: int):
+        """Supprime une écriture rejetée (sa ligne disparaît des tables affichées)"""
+        with self._lock:
+            self.conn.execute("DELETE FROM ecritures WHERE id = ? AND statut = 'rejetee'", (ecriture_id,))
+    
+    def etat(self) -> dict:
+        """Nombre d'écritures en attente et dernière erreur d'envoi"""
+        with self._lock:
+            n, erreur = self.conn.execute(
+                "SELECT COUNT(*), (SELECT erreur FROM ecritures WHERE statut = 'attente' ORDER BY id LIMIT 1) "
+                "FROM ecritures WHERE statut = 'attente'"
+            ).fetchone()
+        return {"en_attente": n, "erreur": erreur}
+    
+    def appliquer(self, table_name: str, df: pd.DataFrame) -> pd.DataFrame:
+        """Table chargée + écritures en attente (la version change avec elles)"""
+        ecritures = self.en_attente(table_name)
+        if not ecritures:
+            return df
         
-        supabase.table(table_name).update(clean_changes).eq("id", row_id).execute()
-        st.cache_data.clear()
+        colonnes = list(df.columns)
+        for e in ecritures:
+            if e["operation"] == "insert":
+                ligne = nettoyer_table(pd.DataFrame([{**e["payload"], "id": -e["id"]}]))
+                df = pd.concat([df, ligne[[c for c in colonnes if c in ligne.columns]] if colonnes else ligne],
+                               ignore_index=True)
+            elif "id" in df.columns:
+                masque = df["id"].isin(e["ids"])
+                if e["operation"] == "delete":
+                    df = df[~masque]
+                elif masque.any():
+                    changements = nettoyer_table(pd.DataFrame([e["payload"]]))
+                    df = df.copy()
+                    for col in changements.columns.intersection(df.columns):
+                        df.loc[masque, col] = changements[col].iloc[0]
+        
+        empreinte = f"{df.attrs.get('version', 'vide')}+{','.join(str(e['id']) for e in ecritures)}"
+        df.attrs["version"] = hashlib.md5(empreinte.encode()).hexdigest()
+        return df
+    
+    def _traduire(self, ids: list) -> list:
+        """Ids temporaires (négatifs) remplacés par les ids attribués par Supabase"""
+        if not any(i < 0 for i in ids):
+            return ids
+        with self._lock:
+            correspondances = dict(self.conn.execute("SELECT temporaire, reel FROM correspondances").fetchall())
+        return [correspondances.get(i, i) if i < 0 else i for i in ids]
+    
+    def _cle_presente(self, supabase, table_name: str) -> bool:
+        """La table a la colonne CLE_ECRITURE (vérifié une fois par table)"""
+        if table_name not in self._cles:
+            try:
+                supabase.table(table_name).select(CLE_ECRITURE).limit(1).execute()
+                self._cles[table_name] = True
+            except Exception as e:
+                if erreur_transitoire(e):
+                    raise
+                self._cles[table_name] = False
+        return self._cles[table_name]
+    
+    def _inserer(self, supabase, table_name: str, groupe: list) -> list:
+        """
+        Envoie un lot d'insertions : upsert sur la clé d'écriture (sans la colonne, simple
+        insert, un nouvel essai peut alors dupliquer). Retourne les couples (id temporaire,
+        id réel) ; lève ReponseIncoherente si une ligne envoyée n'a pas d'id en retour.
+        """
+        payloads = [e["payload"] for e in groupe]
+        if self._cle_presente(supabase, table_name):
+            lignes = supabase.table(table_name).upsert(payloads, on_conflict=CLE_ECRITURE).execute().data or []
+            par_cle = {ligne.get(CLE_ECRITURE): ligne.get("id") for ligne in lignes}
+            ids = [par_cle.get(p.get(CLE_ECRITURE)) for p in payloads]
+        else:
+            payloads = [{k: v for k, v in p.items() if k != CLE_ECRITURE} for p in payloads]
+            lignes = supabase.table(table_name).insert(payloads).execute().data or []
+            ids = [ligne.get("id") for ligne in lignes] if len(lignes) == len(payloads) else [None] * len(payloads)
+        
+        if any(i is None for i in ids):
+            raise ReponseIncoherente(
+                f"{table_name} : {len(lignes)} ligne(s) renvoyée(s) pour {len(payloads)} insertion(s), "
+                f"{sum(i is None for i in ids)} sans id"
+            )
+        return [(-e["id"], i) for e, i in zip(groupe, ids)]
+    
+    def envoyer_lot(self) -> float:
+        """
+        Envoie la plus ancienne écriture (et les insertions consécutives de la même table).
+        Retourne le délai avant le prochain envoi : 0 s'il reste des écritures prêtes.
+        """
+        ecritures = self.en_attente()
+        if not ecritures:
+            return None
+        tete = ecritures[0]
+        if tete["prochain_essai"] > time.time():
+            return tete["prochain_essai"] - time.time()
+        
+        groupe = [tete]
+        if tete["operation"] == "insert" and self._isoler != tete["id"]:
+            for e in ecritures[1:TAILLE_LOT_ECRITURE]:
+                if e["operation"] != "insert" or e["table"] != tete["table"]:
+                    break
+                groupe.append(e)
+        
+        correspondances = []
+        try:
+            supabase = get_db()
+            if not supabase:
+                raise SupabaseIndisponible("Supabase indisponible")
+            if tete["operation"] == "insert":
+                correspondances = self._inserer(supabase, tete["table"], groupe)
+            else:
+                executer_ecriture(supabase, tete["table"], tete["operation"], tete["payload"], self._traduire(tete["ids"]))
+        except Exception as e:
+            if not erreur_transitoire(e):
+                if len(groupe) > 1:
+                    self._isoler = tete["id"]  # Une seule ligne fautive suffit à refuser le lot
+                    return 0.0
+                with self._lock:
+                    self.conn.execute("UPDATE ecritures SET statut = 'rejetee', erreur = ? WHERE id = ?",
+                                      (str(e)[:200], tete["id"]))
+                return 0.0
+            delai = min(ECRITURES_DELAI_MAX, ECRITURES_DELAI_BASE * 2 ** tete["tentatives"])
+            with self._lock:
+                self.conn.execute(
+                    "UPDATE ecritures SET tentatives = tentatives + 1, prochain_essai = ?, erreur = ? WHERE id = ?",
+                    (time.time() + delai, str(e)[:200], tete["id"])
+                )
+            return delai
+        
+        with self._lock:
+            self.conn.execute("BEGIN")
+            self.conn.executemany("INSERT OR REPLACE INTO correspondances VALUES (?, ?)", correspondances)
+            self.conn.executemany("DELETE FROM ecritures WHERE id = ?", [(e["id"],) for e in groupe])
+            self.conn.execute("COMMIT")
+        if self.apres_envoi is not None:
+            self.apres_envoi(tete["table"])
+        return 0.0
+    
+    def prendre_bail(self) -> bool:
+        """
+        Bail d'envoi, dans le journal lui-même (portable, sans verrou de fichier) :
+        pris s'il est libre ou expiré, prolongé s'il est déjà à ce processus
+        """
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                ligne = self.conn.execute("SELECT proprietaire, expire FROM bail WHERE id = 1").fetchone()
+                libre = ligne is None or ligne[0] == self._proprietaire or ligne[1] < time.time()
+                if libre:
+                    self.conn.execute("INSERT OR REPLACE INTO bail VALUES (1, ?, ?)",
+                                      (self._proprietaire, time.time() + ECRITURES_BAIL))
+                self.conn.execute("COMMIT")
+            except sqlite3.Error:
+                self.conn.execute("ROLLBACK")
+                raise
+        return libre
+    
+    def _boucle(self):
+        """
+        Thread d'envoi : vide le journal au fil de l'eau tant qu'il détient le bail ;
+        sinon (ou journal vide) revient au moins deux fois par durée de bail
+        """
+        while True:
+            try:
+                delai = self.envoyer_lot() if self.prendre_bail() else None
+            except Exception:
+                delai = ECRITURES_DELAI_BASE
+            if delai != 0.0:
+                self._reveil.wait(timeout=min(delai or ECRITURES_BAIL, ECRITURES_BAIL / 2))
+                self._reveil.clear()
+
+
+@st.cache_resource
+def get_file_ecritures() -> FileEcritures:
+    """Journal des écritures du processus (None si le dossier local n'est pas inscriptible)"""
+    try:
+        return FileEcritures(ECRITURES_PATH, apres_envoi=marquer_modifiee)
+    except (OSError, sqlite3.Error):
+        return None
+
+
+def ecrire(table_name: str, operation: str, payload=None, ids: list = None, libelle: str = "écriture") -> bool:
+    """
+    Ajoute une écriture au journal (latence disque locale, envoi en arrière-plan).
+    Sans journal, envoi direct à Supabase comme auparavant.
+    """
+    try:
+        file = get_file_ecritures()
+        if file is not None:
+            file.ajouter(table_name, operation, payload, ids)
+            return True
+        
+        supabase = get_db()
+        if not supabase:
+            return False
+        executer_ecriture(supabase, table_name, operation, payload, ids)
+        marquer_modifiee(table_name)
         return True
     except Exception as e:
-        st.error(f"Erreur modification: {e}")
+        st.error(f"Erreur {libelle}: {e}")
         return False
 
 
+def save_row(table_name: str, data: dict) -> bool:
+    """Insère une nouvelle ligne"""
+    return ecrire(table_name, "insert", serialiser_valeurs(data), libelle="sauvegarde")
+
+
+def update_row(table_name: str, row_id: int, changes: dict) -> bool:
+    """Met à jour une ligne existante"""
+    return ecrire(table_name, "update", serialiser_valeurs(changes), [row_id], libelle="modification")
+
+
+def update_rows(table_name: str, row_ids: list, changes: dict) -> bool:
+    """
+    Applique les mêmes modifications à plusieurs lignes
+    (une requête par lot d'ids au lieu d'une par ligne)
+    """
+    return ecrire(table_name, "update", serialiser_valeurs(changes), row_ids, libelle="modification groupée")
+
+
+def delete_rows(table_name: str, row_ids: list) -> bool:
+    """Supprime plusieurs lignes (une requête par lot d'ids)"""
+    return ecrire(table_name, "delete", ids=row_ids, libelle="suppression")
+
+
 def delete_row(table_name: str, row_id: int) -> bool:
     """Supprime une ligne"""
+    return ecrire(table_name, "delete", ids=[row_id], libelle="suppression")
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def appeler_fonction_sql(fonction: str, params: dict, signatures: tuple) -> list:
+    """Appel RPC d'une fonction d'agrégation, en cache tant que les tables lues ne changent pas"""
     supabase = get_db()
     if not supabase:
-        return False
+        return None
+    return supabase.rpc(fonction, params).execute().data
+
+
+# ==============================================================================
+# 4. CHARGEMENT DES DONNÉES
+# ==============================================================================
+@st.cache_resource
+def get_versions_projections() -> tuple:
+    """Versions des projections déjà calculées (verrou, {(version source, colonnes): version})"""
+    return threading.Lock(), OrderedDict()
+
+
+def version_projection(version_source: str, colonnes: tuple, df: pd.DataFrame) -> str:
+    """Empreinte du contenu d'une projection, calculée une fois par (version de la table source, colonnes)"""
+    lock, versions = get_versions_projections()
+    cle = (version_source, colonnes)
+    with lock:
+        if cle in versions:
+            versions.move_to_end(cle)
+            return versions[cle]
+    version = calculer_version(df)
+    with lock:
+        versions[cle] = version
+        while len(versions) > 256:
+            versions.popitem(last=False)
+    return version
+
+
+class DataStore:
+    """
+    Classe centralisant toutes les données.
+    Les tables sont chargées à la première utilisation : une page
+    ne charge que ce dont elle a besoin.
+    """
     
-    try:
-        supabase.table(table_name).delete().eq("id", row_id).execute()
-        st.cache_data.clear()
-        return True
-    except Exception as e:
-        st.error(f"Erreur suppression: {e}")
-        return False
+    TABLES = {
+        "transactions": "Data",
+        "patrimoine": "Patrimoine",
+        "config": "Config",
+        "comptes": "Comptes",
+        "objectifs": "Objectifs",
+        "abonnements": "Abonnements",
+        "projets": "Projets_Config",
+        "mots_cles": "Mots_Cles",
+        "remboursements": "Remboursements",
+        "credits": "Credits",
+    }
+    
+    def __init__(self, tables: dict = None):
+        # Tables déjà chargées (benchmarks) : elles court-circuitent load_table
+        for nom, df in (tables or {}).items():
+            setattr(self, nom, df)
+        
+        # Agrégations des tableaux de bord (locales ou côté serveur)
+        self.agregations = creer_agregations(self)
+        
+        # Pré-calculs (Config et Comptes servent à toutes les pages)
+        self._build_categories()
+        self._build_comptes()
+    
+    def __getattr__(self, nom: str):
+        """Chargement paresseux des tables (appelé seulement si l'attribut n'existe pas encore)"""
+        table = DataStore.TABLES.get(nom)
+        if table is None:
+            raise AttributeError(nom)
+        df = load_table(table)
+        setattr(self, nom, df)
+        return df
+    
+    @property
+    def version(self) -> str:
+        """Version des transactions (clé des caches dérivés)"""
+        return self.transactions.attrs.get("version", "vide")
+    
+    def get_version(self, nom: str) -> str:
+        """Version d'une table quelconque"""
+        return getattr(self, nom).attrs.get("version", "vide")
+    
+    def projection(self, nom: str, colonnes: tuple) -> pd.DataFrame:
+        """
+        Table réduite aux colonnes demandées. Si la table complète est déjà chargée,
+        simple sélection ; sinon seules ces colonnes sont lues dans Supabase.
+        La version (attrs) suit la projection : empreinte de son contenu, identique
+        quel que soit le chemin, qui ne change que si ces colonnes changent.
+        """
+        projections = self.__dict__.setdefault("_projections", {})
+        cle = (nom, colonnes)
+        if cle not in projections:
+            if nom in self.__dict__:
+                source = self.__dict__[nom]
+                df = source[[c for c in colonnes if c in source.columns]]
+            else:
+                source = df = load_table(DataStore.TABLES[nom], colonnes)
+            df.attrs["version"] = version_projection(source.attrs.get("version"), colonnes, df)
+            projections[cle] = df
+        return projections[cle]
+    
+    def precharger(self, *noms: str):
+        """Charge des tables complètes d'avance (les projections demandées ensuite en sont extraites)"""
+        for nom in noms:
+            getattr(self, nom)
+    
+    def _build_categories(self):
+        """Construit le dictionnaire des catégories par type"""
+        self.categories = {t: [] for t in TYPES}
+        
+        if not self.config.empty:
+            for _, r in self.config.iterrows():
+                t = r.get("Type")
+                c = r.get("Categorie")
+                if t in self.categories and c and c not in self.categories[t]:
+                    self.categories[t].append(c)
+        
+        # Catégories par défaut
+        if not self.categories["Dépense"]:
+            self.categories["Dépense"] = ["Alimentation", "Transport", "Logement", "Loisirs", "Autre"]
+        if not self.categories["Revenu"]:
+            self.categories["Revenu"] = ["Salaire", "Prime", "Autre"]
+    
+    def _build_comptes(self):
+        """Construit les listes de comptes"""
+        self.comptes_par_proprio = {}  # {Proprio: [comptes]}
+        self.type_compte = {}  # {compte: type}
+        
+        if not self.comptes.empty:
+            for _, r in self.comptes.iterrows():
+                proprio = r.get("Proprietaire", "Commun")
+                compte = r.get("Compte")
+                type_c = r.get("Type", "Courant")
+                
+                if proprio not in self.comptes_par_proprio:
+                    self.comptes_par_proprio[proprio] = []
+                if compte not in self.comptes_par_proprio[proprio]:
+                    self.comptes_par_proprio[proprio].append(compte)
+                
+                self.type_compte[compte] = type_c
+    
+    def get_comptes_visibles(self, user: str) -> list:
+        """Retourne les comptes accessibles par un utilisateur"""
+        comptes = []
+        comptes.extend(self.comptes_par_proprio.get(user, []))
+        comptes.extend(self.comptes_par_proprio.get("Commun", []))
+        return comptes if comptes else ["Principal"]
+    
+    def get_transactions_mois(self, mois: int, annee: int) -> pd.DataFrame:
+        """Filtre les transactions pour un mois donné"""
+        if self.transactions.empty:
+            return pd.DataFrame()
+        return self.transactions[
+            (self.transactions["Mois"] == mois) & 
+            (self.transactions["Annee"] == annee)
+        ]
+
+    def get_matcher(self) -> "KeywordMatcher":
+        """Règles Mots_Cles compilées (recompilées seulement si la table change)"""
+        return get_keyword_matcher(self.mots_cles, self.mots_cles.attrs.get("version", "vide"))
+    
+    def get_categoriseur(self) -> "CategoriseurTitres":
+        """Modèle appris Titre → Catégorie/Compte, mis à jour avec les nouvelles lignes"""
+        categoriseur = get_categoriseur()
+        categoriseur.mettre_a_jour(self.transactions, self.version)
+        return categoriseur
+    
+    def get_ordre_chronologique(self) -> np.ndarray:
+        """Positions des transactions de la plus récente à la plus ancienne"""
+        return ordre_chronologique(self.transactions, self.version)
+    
+    def get_transaction_index(self) -> "TransactionIndex":
+        """Index secondaires (plages et bitmaps) des transactions"""
+        return get_transaction_index(self.transactions, self.version)
+    
+    def get_search_index(self) -> "SearchIndex":
+        """Index plein texte des transactions (reconstruit à chaque nouvelle version)"""
+        return get_search_index(self.transactions, self.version)
+
+
+# ==============================================================================
+# 4b. CATÉGORISATION AUTOMATIQUE
+# ==============================================================================
+class KeywordMatcher:
+    """
+    Automate d'Aho-Corasick compilé à partir des règles Mots_Cles.
+    Une recherche coûte O(longueur du titre), quel que soit le nombre de règles.
+    En cas de plusieurs mots-clés trouvés : priorité la plus haute,
+    puis mot-clé le plus long, puis ordre de la table.
+    """
+
+    def __init__(self, mots_cles: pd.DataFrame):
+        self._goto = [{}]      # transitions par état
+        self._fail = [0]       # liens d'échec
+        self._best = [None]    # meilleure règle reconnue en arrivant sur l'état
+        self.nb_regles = 0
+
+        if not mots_cles.empty and "Mot_Cle" in mots_cles.columns:
+            for ordre, (_, mc) in enumerate(mots_cles.iterrows()):
+                self._ajouter(mc, ordre)
+
+        self._compiler()
+
+    def _ajouter(self, mc: pd.Series, ordre: int):
+        """Insère un mot-clé dans le trie"""
+        mot = normaliser_texte(mc.get("Mot_Cle", ""))
+        if not mot:
+            return
+
+        priorite = pd.to_numeric(mc.get("Priorite", 0), errors="coerce")
+        regle = {
+            "cle": (0 if pd.isna(priorite) else priorite, len(mot), -ordre),
+            "Mot_Cle": mc.get("Mot_Cle"),
+            "Categorie": mc.get("Categorie"),
+            "Compte": mc.get("Compte"),
+        }
+
+        etat = 0
+        for ch in mot:
+            suivant = self._goto[etat].get(ch)
+            if suivant is None:
+                suivant = len(self._goto)
+                self._goto[etat][ch] = suivant
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(None)
+            etat = suivant
+
+        if self._best[etat] is None or regle["cle"] > self._best[etat]["cle"]:
+            self._best[etat] = regle
+        self.nb_regles += 1
+
+    def _compiler(self):
+        """Calcule les liens d'échec (parcours en largeur)"""
+        file = list(self._goto[0].values())
+        i = 0
+        while i < len(file):
+            etat = file[i]
+            i += 1
+            for ch, suivant in self._goto[etat].items():
+                if etat:
+                    f = self._fail[etat]
+                    while f and ch not in self._goto[f]:
+                        f = self._fail[f]
+                    self._fail[suivant] = self._goto[f].get(ch, 0)
+                # Un état hérite de la meilleure règle de son suffixe le plus long
+                herite = self._best[self._fail[suivant]]
+                if herite and (self._best[suivant] is None or herite["cle"] > self._best[suivant]["cle"]):
+                    self._best[suivant] = herite
+                file.append(suivant)
+
+    def match(self, titre) -> dict:
+        """Retourne la règle gagnante pour un titre, ou None"""
+        texte = normaliser_texte(titre)
+        if not texte or not self.nb_regles:
+            return None
+
+        goto, fail, best = self._goto, self._fail, self._best
+        etat = 0
+        gagnante = None
+        for ch in texte:
+            while etat and ch not in goto[etat]:
+                etat = fail[etat]
+            etat = goto[etat].get(ch, 0)
+            regle = best[etat]
+            if regle and (gagnante is None or regle["cle"] > gagnante["cle"]):
+                gagnante = regle
+        return gagnante
+
+    def categorize(self, titles: pd.Series) -> pd.DataFrame:
+        """Catégorise une série de titres (chaque titre distinct n'est analysé qu'une fois)"""
+        colonnes = ["Mot_Cle", "Categorie", "Compte"]
+        resultats = {}
+        for titre in titles.dropna().unique():
+            regle = self.match(titre)
+            if regle:
+                resultats[titre] = [regle[c] for c in colonnes]
+
+        table = pd.DataFrame.from_dict(resultats, orient="index", columns=colonnes)
+        return table.reindex(titles.to_numpy()).set_axis(titles.index)
+
+
+def previsualiser_recategorisation(data: DataStore) -> pd.DataFrame:
+    """
+    Applique les règles Mots_Cles à tout l'historique des dépenses
+    et retourne uniquement les lignes dont la catégorie ou le compte change
+    """
+    colonnes = ["id", "Date", "Titre", "Mot_Cle", "Categorie", "Nouvelle_Categorie",
+                "Compte_Source", "Nouveau_Compte"]
+    df = data.transactions
+    if df.empty or data.mots_cles.empty:
+        return pd.DataFrame(columns=colonnes)
+
+    depenses = df[df["Type"] == "Dépense"]
+    regles = data.get_matcher().categorize(depenses["Titre"])
+
+    diff = depenses[["id", "Date", "Titre", "Categorie", "Compte_Source"]].copy()
+    diff["Mot_Cle"] = regles["Mot_Cle"]
+    diff["Nouvelle_Categorie"] = regles["Categorie"].fillna(diff["Categorie"])
+    diff["Nouveau_Compte"] = regles["Compte"].fillna(diff["Compte_Source"])
+
+    change = diff["Mot_Cle"].notna() & (
+        (diff["Nouvelle_Categorie"] != diff["Categorie"]) |
+        (diff["Nouveau_Compte"].fillna("") != diff["Compte_Source"].fillna(""))
+    )
+    return diff.loc[change, colonnes].sort_values("Date", ascending=False)
+
+
+def appliquer_recategorisation(diff: pd.DataFrame) -> int:
+    """
+    Écrit les nouvelles catégories/comptes : une mise à jour groupée par
+    couple (catégorie, compte) cible
+    """
+    nb_modifies = 0
+    groupes = diff.groupby(["Nouvelle_Categorie", "Nouveau_Compte"], dropna=False)["id"]
+
+    for (categorie, compte), ids in groupes:
+        changes = {
+            "Categorie": None if pd.isna(categorie) else categorie,
+            "Compte_Source": None if pd.isna(compte) else compte,
+        }
+        if update_rows("Data", ids.tolist(), changes):
+            nb_modifies += len(ids)
+
+    return nb_modifies
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def get_keyword_matcher(_mots_cles: pd.DataFrame, version: str) -> KeywordMatcher:
+    """Automate partagé, reconstruit uniquement quand la version de Mots_Cles change"""
+    return KeywordMatcher(_mots_cles)
+
+
+class TitleClassifier:
+    """
+    Naive Bayes multinomial sur les trigrammes de caractères du titre.
+    Les compteurs sont additifs : l'entraînement est incrémental.
+    """
+
+    def __init__(self):
+        self.docs_par_classe = {}     # {classe: nb titres}
+        self.ngrammes = {}            # {ngramme: {classe: nb}}
+        self.total_par_classe = {}    # {classe: nb de ngrammes}
+        self._base = None             # scores de départ précalculés
+
+    @staticmethod
+    def decouper(titre) -> list:
+        """Trigrammes du titre normalisé (avec bordures de mots)"""
+        texte = f" {normaliser_texte(titre)} "
+        return [texte[i:i + 3] for i in range(len(texte) - 2)]
+
+    def partial_fit(self, titres, labels):
+        """Ajoute des exemples au modèle"""
+        for titre, label in zip(titres, labels):
+            grams = self.decouper(titre)
+            if not grams:
+                continue
+            self.docs_par_classe[label] = self.docs_par_classe.get(label, 0) + 1
+            self.total_par_classe[label] = self.total_par_classe.get(label, 0) + len(grams)
+            for g in grams:
+                compte = self.ngrammes.setdefault(g, {})
+                compte[label] = compte.get(label, 0) + 1
+        self._base = None
+
+    def _preparer(self):
+        """log P(classe) - longueur * log(total + V), calculé une fois par entraînement"""
+        nb_docs = sum(self.docs_par_classe.values())
+        vocab = len(self.ngrammes) + 1
+        self._base = {
+            c: (math.log(n / nb_docs), math.log(self.total_par_classe[c] + vocab))
+            for c, n in self.docs_par_classe.items()
+        }
+
+    def predict(self, titre, candidats=None):
+        """Classe la plus probable (limitée aux candidats si fournis), ou None"""
+        if not self.docs_par_classe:
+            return None
+        if self._base is None:
+            self._preparer()
+
+        # Les trigrammes jamais vus n'apportent aucune information : ignorés
+        connus = [self.ngrammes[g] for g in self.decouper(titre) if g in self.ngrammes]
+        if not connus:
+            return None
+
+        classes = self._base if candidats is None else {c: self._base[c] for c in candidats if c in self._base}
+        if not classes:
+            return None
+
+        scores = {c: prior - len(connus) * norme for c, (prior, norme) in classes.items()}
+        for compte in connus:
+            for c, n in compte.items():
+                if c in scores:
+                    scores[c] += math.log(n + 1)
+        return max(scores, key=scores.get)
+
+    def to_dict(self) -> dict:
+        return {
+            "docs_par_classe": self.docs_par_classe,
+            "ngrammes": self.ngrammes,
+            "total_par_classe": self.total_par_classe,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "TitleClassifier":
+        modele = cls()
+        modele.docs_par_classe = d.get("docs_par_classe", {})
+        modele.ngrammes = d.get("ngrammes", {})
+        modele.total_par_classe = d.get("total_par_classe", {})
+        return modele
+
+
+class CategoriseurTitres:
+    """
+    Catégorisation apprise sur l'historique (Titre → Categorie, Compte_Source),
+    complément des règles Mots_Cles. Persisté sur disque, entraîné uniquement
+    sur les lignes plus récentes que le dernier entraînement ; réentraîné en
+    entier si une ligne déjà apprise a été modifiée ou supprimée.
+    Chaque mise à jour construit de nouveaux modèles, substitués d'un bloc :
+    les prédictions en cours (autres sessions) ne voient jamais un modèle à moitié appris.
+    """
+
+    CIBLES = ["Categorie", "Compte_Source"]
+
+    def __init__(self, chemin: str = MODELE_CATEGORIES_PATH):
+        self.chemin = chemin
+        self.modeles = {c: TitleClassifier() for c in self.CIBLES}
+        self.dernier_id = 0
+        self.empreinte = None  # Empreinte des lignes apprises (id, titre, cibles)
+        self.version = None
+        self._lock = threading.Lock()
+        self._charger()
+
+    def _charger(self):
+        """Recharge le modèle sauvegardé s'il existe"""
+        try:
+            with open(self.chemin, encoding="utf-8") as f:
+                d = json.load(f)
+            self.modeles = {c: TitleClassifier.from_dict(d["modeles"].get(c, {})) for c in self.CIBLES}
+            self.dernier_id = d.get("dernier_id", 0)
+            self.empreinte = d.get("empreinte")
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _sauvegarder(self):
+        """Écriture atomique du modèle"""
+        try:
+            os.makedirs(os.path.dirname(self.chemin), exist_ok=True)
+            tmp = f"{self.chemin}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({
+                    "dernier_id": self.dernier_id,
+                    "empreinte": self.empreinte,
+                    "modeles": {c: m.to_dict() for c, m in self.modeles.items()},
+                }, f, ensure_ascii=False)
+            os.replace(tmp, self.chemin)
+        except OSError:
+            pass
+
+    def _empreinte(self, lignes: pd.DataFrame) -> str:
+        """Empreinte de ce que le modèle a appris de ces lignes"""
+        colonnes = [c for c in ["id", "Titre", *self.CIBLES] if c in lignes.columns]
+        valeurs = pd.util.hash_pandas_object(lignes[colonnes].sort_values("id"), index=False)
+        return hashlib.md5(valeurs.to_numpy().tobytes()).hexdigest()
+
+    def mettre_a_jour(self, transactions: pd.DataFrame, version: str):
+        """
+        Entraîne sur les lignes d'id supérieur au dernier id appris, ou sur tout
+        l'historique si des lignes apprises ont changé (recatégorisation, suppression)
+        """
+        if version == self.version or transactions.empty or "id" not in transactions.columns:
+            return
+
+        with self._lock:
+            if version == self.version:
+                return
+
+            ids = pd.to_numeric(transactions["id"], errors="coerce")
+            enregistrees = transactions[ids > 0]  # Sans les insertions pas encore envoyées (ids négatifs)
+            ids = ids[ids > 0]
+            apprises = enregistrees[ids <= self.dernier_id]
+
+            if self._empreinte(apprises) != self.empreinte:
+                # Lignes modifiées ou supprimées depuis l'entraînement : on repart de zéro
+                modeles = {c: TitleClassifier() for c in self.CIBLES}
+                nouvelles = enregistrees
+            else:
+                modeles = None
+                nouvelles = enregistrees[ids > self.dernier_id]
+            nouvelles = nouvelles[nouvelles["Titre"].fillna("").astype(str).str.strip() != ""]
+
+            if modeles is not None or not nouvelles.empty:
+                if modeles is None:
+                    modeles = {c: TitleClassifier.from_dict(m.to_dict()) for c, m in self.modeles.items()}
+                for cible, modele in modeles.items():
+                    exemples = nouvelles[nouvelles[cible].fillna("").astype(str) != ""]
+                    if not exemples.empty:
+                        modele.partial_fit(exemples["Titre"], exemples[cible])
+                self.modeles = modeles  # Substitution d'un bloc
+                self.dernier_id = int(ids.max()) if not ids.empty else 0
+                self.empreinte = self._empreinte(enregistrees)
+                self._sauvegarder()
+            self.version = version
+
+    def predire(self, titre: str, categories=None, comptes=None) -> dict:
+        """Suggestion pour un titre, restreinte aux catégories/comptes proposés"""
+        modeles = self.modeles  # Référence stable si une mise à jour substitue les modèles
+        return {
+            "Categorie": modeles["Categorie"].predict(titre, categories),
+            "Compte_Source": modeles["Compte_Source"].predict(titre, comptes),
+        }
+
+    def predire_serie(self, titles: pd.Series) -> pd.DataFrame:
+        """Catégorise un lot de titres (imports en masse) ; chaque titre distinct n'est évalué qu'une fois"""
+        uniques = titles.dropna().unique()
+        table = pd.DataFrame(
+            [self.predire(t) for t in uniques],
+            index=uniques,
+            columns=self.CIBLES
+        )
+        return table.reindex(titles.to_numpy()).set_axis(titles.index)
+
+
+@st.cache_resource(show_spinner=False)
+def get_categoriseur() -> CategoriseurTitres:
+    """Instance unique du catégoriseur (chargée depuis le disque au démarrage)"""
+    return CategoriseurTitres()
+
+
+# ==============================================================================
+# 4c. RECHERCHE
+# ==============================================================================
+class SearchIndex:
+    """
+    Index inversé des transactions sur Titre et Catégorie (sans accents ni casse).
+    Les mots sont stockés triés : une recherche par préfixe est une simple
+    dichotomie, indépendante de la taille de l'historique.
+    """
+
+    POIDS_CHAMPS = {"Titre": 2.0, "Categorie": 1.0}
+    BONUS_MOT_EXACT = 1.0
+
+    def __init__(self, transactions: pd.DataFrame):
+        self.nb_lignes = len(transactions)
+        morceaux = []
+
+        for champ, poids in self.POIDS_CHAMPS.items():
+            if champ not in transactions.columns:
+                continue
+            # Découpage fait une fois par libellé distinct, puis rattaché aux lignes
+            codes, libelles = pd.factorize(transactions[champ])
+            mots = normaliser_serie(pd.Series(libelles, dtype=object)).str.findall(r"\w+")
+            mots = pd.DataFrame({"code": np.arange(len(libelles)), "mot": mots}).explode("mot").dropna()
+            lignes = pd.DataFrame({"pos": np.arange(len(transactions)), "code": codes})
+            mots = lignes.merge(mots, on="code")[["pos", "mot"]]
+            mots["poids"] = poids
+            morceaux.append(mots)
+
+        if morceaux:
+            postings = pd.concat(morceaux).sort_values("mot", kind="stable")
+            self.mots = postings["mot"].to_numpy(dtype=object)
+            self.pos = postings["pos"].to_numpy(dtype=np.int64)
+            self.poids = postings["poids"].to_numpy(dtype=float)
+        else:
+            self.mots = np.array([], dtype=object)
+            self.pos = np.array([], dtype=np.int64)
+            self.poids = np.array([], dtype=float)
+
+        # Départage des scores égaux : les plus récentes d'abord
+        if "Date" in transactions.columns:
+            dates = pd.to_datetime(transactions["Date"], errors="coerce").fillna(pd.Timestamp(0))
+            self.dates = dates.to_numpy().astype("int64")
+        else:
+            self.dates = np.zeros(self.nb_lignes, dtype=np.int64)
+
+    def _chercher_terme(self, terme: str) -> pd.Series:
+        """Score par ligne pour un terme (préfixe d'un mot indexé)"""
+        debut = np.searchsorted(self.mots, terme, side="left")
+        fin = np.searchsorted(self.mots, terme + "\uffff", side="left")
+        if debut == fin:
+            return pd.Series(dtype=float)
+
+        scores = self.poids[debut:fin] + np.where(self.mots[debut:fin] == terme, self.BONUS_MOT_EXACT, 0.0)
+        return pd.Series(scores).groupby(self.pos[debut:fin]).max()
+
+    def search(self, requete: str) -> np.ndarray:
+        """
+        Positions (iloc) des transactions contenant tous les termes,
+        triées par pertinence puis par date décroissante
+        """
+        termes = re.findall(r"\w+", normaliser_texte(requete))
+        if not termes:
+            return np.arange(self.nb_lignes)
+
+        total = None
+        for terme in termes:
+            scores = self._chercher_terme(terme)
+            total = scores if total is None else total.add(scores).dropna()
+            if total.empty:
+                return np.array([], dtype=np.int64)
+
+        positions = total.index.to_numpy()
+        ordre = np.lexsort((-self.dates[positions], -total.to_numpy()))
+        return positions[ordre]
+
+
+class TransactionIndex:
+    """
+    Index secondaires des transactions pour les requêtes multi-critères :
+    tableaux triés pour les plages (Date, Montant), bitmaps compressés
+    (np.packbits) par valeur pour les colonnes catégorielles.
+    Une requête combinée se réduit à des ET binaires entre bitmaps.
+    """
+
+    COLONNES_PLAGE = ["Date", "Montant"]
+    COLONNES_CATEGORIELLES = ["Type", "Imputation", "Paye_Par", "Projet_Epargne",
+                              "Compte_Source", "Compte_Cible", "Qui_Connecte", "Categorie"]
+
+    def __init__(self, transactions: pd.DataFrame):
+        self.nb_lignes = len(transactions)
+        self.tris = {}      # {colonne: (valeurs triées, positions)}
+        self.bitmaps = {}   # {colonne: {valeur: bitmap compressé}}
+
+        for col in self.COLONNES_PLAGE:
+            if col not in transactions.columns:
+                continue
+            if col == "Date":
+                valeurs = pd.to_datetime(transactions[col], errors="coerce").to_numpy().astype("datetime64[ns]").astype("int64")
+                valides = ~pd.isna(transactions[col]).to_numpy()
+            else:
+                valeurs = transactions[col].to_numpy(dtype=float)
+                valides = ~np.isnan(valeurs)
+            positions = np.flatnonzero(valides)
+            ordre = np.argsort(valeurs[positions], kind="stable")
+            self.tris[col] = (valeurs[positions][ordre], positions[ordre])
+
+        for col in self.COLONNES_CATEGORIELLES:
+            if col not in transactions.columns:
+                continue
+            codes, valeurs = pd.factorize(transactions[col].fillna(""))
+            self.bitmaps[col] = {
+                v: np.packbits(codes == i) for i, v in enumerate(valeurs)
+            }
+
+    def _vide(self) -> np.ndarray:
+        return np.zeros((self.nb_lignes + 7) // 8, dtype=np.uint8)
+
+    def _plage(self, col: str, mini=None, maxi=None) -> np.ndarray:
+        """Bitmap des lignes dont la valeur est dans [mini, maxi]"""
+        valeurs, positions = self.tris.get(col, (np.array([]), np.array([], dtype=np.int64)))
+        debut = 0 if mini is None else np.searchsorted(valeurs, mini, side="left")
+        fin = len(valeurs) if maxi is None else np.searchsorted(valeurs, maxi, side="right")
+        masque = np.zeros(self.nb_lignes, dtype=bool)
+        masque[positions[debut:fin]] = True
+        return np.packbits(masque)
+
+    def _valeurs(self, col: str, valeurs) -> np.ndarray:
+        """Bitmap des lignes dont la colonne vaut l'une des valeurs"""
+        bitmap = self._vide()
+        for v in valeurs:
+            b = self.bitmaps.get(col, {}).get(v)
+            if b is not None:
+                bitmap |= b
+        return bitmap
+
+    def masque(self, date_min: date = None, date_max: date = None,
+               montant_min: float = None, montant_max: float = None,
+               comptes: list = None, types: list = None, imputations: list = None,
+               payeurs: list = None, projets: list = None) -> np.ndarray:
+        """Masque booléen (une valeur par ligne) des transactions satisfaisant tous les critères"""
+        bitmaps = []
+
+        if date_min is not None or date_max is not None:
+            bitmaps.append(self._plage(
+                "Date",
+                None if date_min is None else np.datetime64(date_min, "ns").astype("int64"),
+                None if date_max is None else np.datetime64(date_max, "ns").astype("int64"),
+            ))
+        if montant_min is not None or montant_max is not None:
+            bitmaps.append(self._plage("Montant", montant_min, montant_max))
+        if comptes:
+            # Un compte est concerné qu'il soit source ou cible
+            bitmaps.append(self._valeurs("Compte_Source", comptes) | self._valeurs("Compte_Cible", comptes))
+        for col, valeurs in [("Type", types), ("Imputation", imputations),
+                             ("Paye_Par", payeurs), ("Projet_Epargne", projets)]:
+            if valeurs:
+                bitmaps.append(self._valeurs(col, valeurs))
+
+        if not bitmaps:
+            return np.ones(self.nb_lignes, dtype=bool)
+
+        resultat = bitmaps[0].copy()
+        for b in bitmaps[1:]:
+            resultat &= b
+        return np.unpackbits(resultat, count=self.nb_lignes).astype(bool)
 
+    def requete(self, **criteres) -> np.ndarray:
+        """Positions (iloc) des transactions satisfaisant tous les critères"""
+        return np.flatnonzero(self.masque(**criteres))
+
+    def valeurs_distinctes(self, col: str) -> list:
+        """Valeurs connues d'une colonne catégorielle (pour les filtres)"""
+        return sorted(v for v in self.bitmaps.get(col, {}) if v != "")
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def get_transaction_index(_transactions: pd.DataFrame, version: str) -> TransactionIndex:
+    """Index secondaires partagés, construits une fois par version des transactions"""
+    return TransactionIndex(_transactions)
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def ordre_chronologique(_transactions: pd.DataFrame, version: str) -> np.ndarray:
+    """Tri par date décroissante, calculé une fois par version des transactions"""
+    if _transactions.empty:
+        return np.array([], dtype=np.int64)
+    dates = pd.to_datetime(_transactions["Date"], errors="coerce").fillna(pd.Timestamp(0))
+    return np.argsort(dates.to_numpy(), kind="stable")[::-1].copy()
 
-# ==============================================================================
-# 4. CHARGEMENT DES DONNÉES
-# ==============================================================================
-class DataStore:
-    """Classe centralisant toutes les données"""
-    
-    def __init__(self):
-        self.transactions = load_table("Data")
-        self.patrimoine = load_table("Patrimoine")
-        self.config = load_table("Config")
-        self.comptes = load_table("Comptes")
-        self.objectifs = load_table("Objectifs")
-        self.abonnements = load_table("Abonnements")
-        self.projets = load_table("Projets_Config")
-        self.mots_cles = load_table("Mots_Cles")
-        self.remboursements = load_table("Remboursements")
-        self.credits = load_table("Credits")
-        
-        # Pré-calculs
-        self._build_categories()
-        self._build_comptes()
-    
-    def _build_categories(self):
-        """Construit le dictionnaire des catégories par type"""
-        self.categories = {t: [] for t in TYPES}
-        
-        if not self.config.empty:
-            for _, r in self.config.iterrows():
-                t = r.get("Type")
-                c = r.get("Categorie")
-                if t in self.categories and c and c not in self.categories[t]:
-                    self.categories[t].append(c)
-        
-        # Catégories par défaut
-        if not self.categories["Dépense"]:
-            self.categories["Dépense"] = ["Alimentation", "Transport", "Logement", "Loisirs", "Autre"]
-        if not self.categories["Revenu"]:
-            self.categories["Revenu"] = ["Salaire", "Prime", "Autre"]
-    
-    def _build_comptes(self):
-        """Construit les listes de comptes"""
-        self.comptes_par_proprio = {}  # {Proprio: [comptes]}
-        self.type_compte = {}  # {compte: type}
-        
-        if not self.comptes.empty:
-            for _, r in self.comptes.iterrows():
-                proprio = r.get("Proprietaire", "Commun")
-                compte = r.get("Compte")
-                type_c = r.get("Type", "Courant")
-                
-                if proprio not in self.comptes_par_proprio:
-                    self.comptes_par_proprio[proprio] = []
-                if compte not in self.comptes_par_proprio[proprio]:
-                    self.comptes_par_proprio[proprio].append(compte)
-                
-                self.type_compte[compte] = type_c
-    
-    def get_comptes_visibles(self, user: str) -> list:
-        """Retourne les comptes accessibles par un utilisateur"""
-        comptes = []
-        comptes.extend(self.comptes_par_proprio.get(user, []))
-        comptes.extend(self.comptes_par_proprio.get("Commun", []))
-        return comptes if comptes else ["Principal"]
-    
-    def get_transactions_mois(self, mois: int, annee: int) -> pd.DataFrame:
-        """Filtre les transactions pour un mois donné"""
-        if self.transactions.empty:
-            return pd.DataFrame()
-        return self.transactions[
-            (self.transactions["Mois"] == mois) & 
-            (self.transactions["Annee"] == annee)
-        ]
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def get_search_index(_transactions: pd.DataFrame, version: str) -> SearchIndex:
+    """Index partagé, construit une fois par version des transactions"""
+    return SearchIndex(_transactions)
 
 
 # ==============================================================================
 # 5. CALCULS FINANCIERS
 # ==============================================================================
+@instrumenter("calcul")
 class FinanceEngine:
     """Moteur de calculs financiers"""
     
@@ -564,8 +2585,9 @@ class FinanceEngine:
                 date_ref = dernier["Date"]
         
         # 2. Ajouter tous les mouvements depuis cette date
-        if not self.data.transactions.empty:
-            df = self.data.transactions[self.data.transactions["Date"] > date_ref]
+        transactions = self.data.projection("transactions", COLONNES_SOLDES)
+        if not transactions.empty:
+            df = transactions[transactions["Date"] > date_ref]
             
             # Entrées sur ce compte
             entrees = df[
@@ -591,6 +2613,19 @@ class FinanceEngine:
         
         return solde
     
+    def calculer_soldes(self, comptes: list) -> dict:
+        """Soldes de plusieurs comptes (calcul local en cache, ou côté serveur selon les agrégations)"""
+        return self.data.agregations.soldes(comptes)
+    
+    def historique_patrimoine(self, comptes: list) -> pd.DataFrame:
+        """Patrimoine de fin de mois par type de compte (Courant / Épargne) et total"""
+        soldes = get_historique_patrimoine().get(self.data, comptes)
+        types = [self.data.type_compte.get(c, "Courant") for c in soldes.columns]
+        historique = soldes.T.groupby(types).sum().T.reindex(columns=TYPES_COMPTE, fill_value=0.0)
+        historique["Total"] = historique.sum(axis=1)
+        historique.index = historique.index.to_timestamp(how="end").normalize()
+        return historique
+    
     def calculer_reste_a_vivre(self, mois: int, annee: int) -> dict:
         """
         Calcule le reste à vivre pour un mois :
@@ -628,6 +2663,38 @@ class FinanceEngine:
             "reste_a_vivre": rav
         }
     
+    def resume_periodes(self, par: list) -> pd.DataFrame:
+        """
+        Reste à vivre de l'utilisateur pour toutes les périodes de l'historique
+        (même définition que calculer_reste_a_vivre, calculé en un seul groupby)
+        """
+        df = self.data.transactions
+        colonnes = par + ["Revenus", "Dépenses Perso", "Part Commune", "Épargne", "Investissements", "Reste à Vivre"]
+        if df.empty:
+            return pd.DataFrame(columns=colonnes)
+        
+        est_user = df["Qui_Connecte"] == self.user
+        montant = df["Montant"]
+        pct = df["Pourcentage_Perso"] if "Pourcentage_Perso" in df.columns else 50
+        part_autre = np.where(df["Paye_Par"] == self.user, montant * pct / 100, montant * (100 - pct) / 100)
+        
+        lignes = df[par].copy()
+        lignes["Revenus"] = montant.where(est_user & (df["Type"] == "Revenu"), 0)
+        lignes["Dépenses Perso"] = montant.where(est_user & (df["Type"] == "Dépense") & (df["Imputation"] == "Perso"), 0)
+        lignes["Part Commune"] = (
+            montant.where(df["Imputation"] == "Commun (50/50)", 0) / 2 +
+            pd.Series(part_autre, index=df.index).where(df["Imputation"] == "Commun (Autre %)", 0)
+        )
+        lignes["Épargne"] = montant.where(est_user & (df["Type"] == "Épargne"), 0)
+        lignes["Investissements"] = montant.where(est_user & (df["Type"] == "Investissement"), 0)
+        
+        resume = lignes.groupby(par).sum().reset_index()
+        resume["Reste à Vivre"] = (
+            resume["Revenus"] - resume["Dépenses Perso"] - resume["Part Commune"]
+            - resume["Épargne"] - resume["Investissements"]
+        )
+        return resume[colonnes]
+    
     def _calculer_part_commune(self, df: pd.DataFrame, mois: int, annee: int) -> float:
         """Calcule la part des dépenses communes pour l'utilisateur"""
         part = 0.0
@@ -678,9 +2745,339 @@ class FinanceEngine:
         }
 
 
+@st.cache_data(max_entries=32, show_spinner=False)
+def calculer_soldes(_data: DataStore, versions: tuple, comptes: tuple) -> dict:
+    """Soldes par compte, partagés entre la barre latérale, le patrimoine et l'assistant"""
+    engine = FinanceEngine(_data, "")
+    return {compte: engine.calculer_solde_compte(compte) for compte in comptes}
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def progression_projets(_transactions: pd.DataFrame, _projets: pd.DataFrame, versions: tuple,
+                        reference: date) -> pd.DataFrame:
+    """
+    Avancement de tous les projets d'épargne en un seul groupby :
+    montant épargné, rythme mensuel récent et date d'atteinte estimée de la cible.
+    Partagé entre l'accueil et le patrimoine, recalculé quand les données changent.
+    """
+    colonnes = ["id", "Projet", "Cible", "Epargne", "Progression", "Rythme_Mensuel", "Date_Estimee"]
+    if _projets.empty:
+        return pd.DataFrame(columns=colonnes)
+    
+    projets = _projets[["id", "Projet", "Cible"]].copy()
+    projets["Cible"] = pd.to_numeric(projets["Cible"], errors="coerce").fillna(0.0)
+    
+    versements = _transactions[["Date", "Projet_Epargne", "Montant"]].copy() if not _transactions.empty \
+        else pd.DataFrame(columns=["Date", "Projet_Epargne", "Montant"])
+    versements = versements[versements["Projet_Epargne"].isin(projets["Projet"])]
+    versements["Date"] = pd.to_datetime(versements["Date"], errors="coerce")
+    
+    # Versements récents, rapportés au nombre de mois écoulés depuis le premier (plafonné à la fenêtre)
+    debut_fenetre = pd.Timestamp(reference) - pd.DateOffset(months=FENETRE_RYTHME_PROJETS)
+    versements["Recent"] = versements["Montant"].where(versements["Date"] > debut_fenetre, 0.0)
+    
+    agg = versements.groupby("Projet_Epargne").agg(
+        Epargne=("Montant", "sum"), Recent=("Recent", "sum"), Premier=("Date", "min")
+    )
+    projets = projets.join(agg, on="Projet")
+    projets["Epargne"] = pd.to_numeric(projets["Epargne"]).fillna(0.0)
+    projets["Recent"] = pd.to_numeric(projets["Recent"]).fillna(0.0)
+    projets["Premier"] = pd.to_datetime(projets["Premier"])
+    
+    mois_ecoules = (
+        (reference.year - projets["Premier"].dt.year) * 12 + (reference.month - projets["Premier"].dt.month) + 1
+    ).clip(1, FENETRE_RYTHME_PROJETS)
+    projets["Rythme_Mensuel"] = (projets["Recent"] / mois_ecoules).fillna(0.0)
+    projets["Progression"] = (projets["Epargne"] / projets["Cible"].where(projets["Cible"] > 0) * 100).fillna(0.0)
+    
+    # Projection : mois restants au rythme actuel (aucune date si cible atteinte ou rythme nul)
+    restant = projets["Cible"] - projets["Epargne"]
+    en_cours = (restant > 0) & (projets["Rythme_Mensuel"] > 0)
+    mois_restants = np.ceil(restant / projets["Rythme_Mensuel"].where(en_cours))
+    index_mois = reference.year * 12 + reference.month - 1 + mois_restants
+    projets["Date_Estimee"] = pd.to_datetime(pd.DataFrame({
+        "year": index_mois // 12, "month": index_mois % 12 + 1, "day": 1
+    }), errors="coerce")
+    
+    return projets[colonnes].reset_index(drop=True)
+
+
+def mouvements_comptes(transactions: pd.DataFrame, comptes: list) -> pd.DataFrame:
+    """
+    Transactions dépliées en mouvements signés (Compte, Date, Delta), avec les
+    mêmes règles que calculer_solde_compte : chaque ligne compte pour la cible
+    (deux fois pour un virement/épargne entrant), pour la source en sortie,
+    et pour la source d'un revenu.
+    """
+    colonnes = ["Compte", "Date", "Delta"]
+    if transactions.empty:
+        return pd.DataFrame(columns=colonnes)
+    
+    df = transactions[["Date", "Type", "Montant", "Compte_Source", "Compte_Cible"]]
+    vers_cible = df[df["Compte_Cible"].isin(comptes)]
+    revenus = df[(df["Type"] == "Revenu") & df["Compte_Source"].isin(comptes) & (df["Compte_Source"] != df["Compte_Cible"])]
+    sorties = df[df["Compte_Source"].isin(comptes) &
+                 df["Type"].isin(["Dépense", "Investissement", "Épargne", "Virement Interne"])]
+    
+    mouvements = pd.concat([
+        pd.DataFrame({
+            "Compte": vers_cible["Compte_Cible"], "Date": vers_cible["Date"],
+            "Delta": vers_cible["Montant"] * np.where(vers_cible["Type"].isin(["Virement Interne", "Épargne"]), 2, 1)
+        }),
+        pd.DataFrame({"Compte": revenus["Compte_Source"], "Date": revenus["Date"], "Delta": revenus["Montant"]}),
+        pd.DataFrame({"Compte": sorties["Compte_Source"], "Date": sorties["Date"], "Delta": -sorties["Montant"]}),
+    ], ignore_index=True)
+    mouvements["Date"] = pd.to_datetime(mouvements["Date"], errors="coerce").astype("datetime64[ns]")
+    return mouvements.dropna(subset=["Date"])[colonnes]
+
+
+class HistoriquePatrimoine:
+    """
+    Soldes de fin de mois par compte sur tout l'historique.
+    Le solde à une date D = dernier relevé Patrimoine ≤ D + mouvements depuis ce relevé,
+    obtenu par merge_asof sur les flux cumulés. Chaque mois est signé (hash de ses
+    relevés et mouvements) : après une modification, seuls les mois à partir du
+    premier mois touché sont recalculés, les mois antérieurs sont conservés.
+    """
+    
+    def __init__(self):
+        self._entrees = {}
+        self._lock = threading.Lock()
+    
+    def get(self, data: DataStore, comptes: list) -> pd.DataFrame:
+        """Soldes de fin de mois (index : Period mensuelle, colonnes : comptes)"""
+        cle = tuple(comptes)
+        transactions = data.projection("transactions", COLONNES_SOLDES)
+        versions = (transactions.attrs.get("version", "vide"), data.get_version("patrimoine"))
+        with self._lock:
+            entree = self._entrees.get(cle)
+        if entree is not None and entree["versions"] == versions:
+            return entree["historique"]
+        
+        mouvements = mouvements_comptes(transactions, comptes)
+        releves = pd.DataFrame(columns=["Compte", "Date", "Montant"])
+        if not data.patrimoine.empty:
+            releves = data.patrimoine.loc[data.patrimoine["Compte"].isin(comptes), ["Compte", "Date", "Montant"]].copy()
+        releves["Date"] = pd.to_datetime(releves["Date"], errors="coerce").astype("datetime64[ns]")
+        releves = releves.dropna(subset=["Date"])
+        
+        dates = pd.concat([mouvements["Date"], releves["Date"]])
+        if dates.empty:
+            return pd.DataFrame(columns=comptes, index=pd.PeriodIndex([], freq="M"), dtype=float)
+        periodes = pd.period_range(min(dates.min(), pd.Timestamp(date.today())),
+                                   max(dates.max(), pd.Timestamp(date.today())), freq="M")
+        signatures = self._signatures(mouvements, releves)
+        
+        historique = pd.DataFrame(columns=comptes, index=pd.PeriodIndex([], freq="M"), dtype=float)
+        a_calculer = periodes
+        if entree is not None:
+            anciennes = entree["signatures"]
+            toutes = signatures.index.union(anciennes.index)
+            modifies = toutes[signatures.reindex(toutes, fill_value=0) != anciennes.reindex(toutes, fill_value=0)]
+            conserve = entree["historique"].index.intersection(periodes)
+            if len(modifies):
+                conserve = conserve[conserve < modifies.min()]
+            historique = entree["historique"].loc[conserve]
+            a_calculer = periodes.difference(conserve)
+        
+        if len(a_calculer):
+            historique = pd.concat([historique, self._calculer(mouvements, releves, comptes, a_calculer)]).sort_index()
+        
+        with self._lock:
+            self._entrees[cle] = {"versions": versions, "signatures": signatures, "historique": historique}
+        return historique
+    
+    @staticmethod
+    def _signatures(mouvements: pd.DataFrame, releves: pd.DataFrame) -> pd.Series:
+        """Empreinte de chaque mois (somme des hash de ses lignes)"""
+        lignes = pd.concat([mouvements.assign(Releve=False),
+                            releves.rename(columns={"Montant": "Delta"}).assign(Releve=True)], ignore_index=True)
+        empreintes = pd.util.hash_pandas_object(lignes, index=False)
+        return empreintes.groupby(lignes["Date"].dt.to_period("M")).sum()
+    
+    @staticmethod
+    def _calculer(mouvements: pd.DataFrame, releves: pd.DataFrame, comptes: list,
+                  periodes: pd.PeriodIndex) -> pd.DataFrame:
+        """Soldes de fin de mois des périodes demandées, en un passage"""
+        fins = periodes.to_timestamp(how="end").normalize().astype("datetime64[ns]")
+        grille = pd.DataFrame({
+            "Compte": np.repeat(comptes, len(fins)),
+            "Date": np.tile(fins.values, len(comptes)),
+        }).sort_values("Date")
+        
+        flux = mouvements.groupby(["Compte", "Date"])["Delta"].sum().groupby(level="Compte").cumsum()
+        flux = flux.rename("Cumul").reset_index().sort_values("Date")
+        
+        # Base d'un relevé = montant relevé - flux cumulés jusqu'à sa date (mouvements du jour inclus)
+        releves = pd.merge_asof(releves.sort_values("Date"), flux, on="Date", by="Compte")
+        releves["Base"] = releves["Montant"] - releves["Cumul"].fillna(0.0)
+        
+        # Sans relevé : solde parti de 0 au 01/01/2000
+        avant_2000 = mouvements[mouvements["Date"] <= pd.Timestamp(2000, 1, 1)].groupby("Compte")["Delta"].sum()
+        
+        grille = pd.merge_asof(grille, flux, on="Date", by="Compte")
+        grille = pd.merge_asof(grille, releves[["Compte", "Date", "Base"]], on="Date", by="Compte")
+        grille["Base"] = grille["Base"].fillna(-grille["Compte"].map(avant_2000).fillna(0.0))
+        grille["Solde"] = grille["Base"] + grille["Cumul"].fillna(0.0)
+        grille["Periode"] = grille["Date"].dt.to_period("M")
+        
+        return grille.pivot(index="Periode", columns="Compte", values="Solde").reindex(columns=comptes)
+
+
+@st.cache_resource(show_spinner=False)
+def get_historique_patrimoine() -> HistoriquePatrimoine:
+    """Historique du patrimoine partagé entre sessions, complété au fil des modifications"""
+    return HistoriquePatrimoine()
+
+
+# ==============================================================================
+# 5b. AGRÉGATIONS (LOCALES OU CÔTÉ SERVEUR)
+# ==============================================================================
+class Agregations:
+    """
+    Agrégations des tableaux de bord : soldes des comptes, totaux du mois par
+    catégorie, revenus/dépenses mensuels. Implémentations : AgregationsPandas
+    (transactions téléchargées) et AgregationsSupabase (fonctions SQL côté serveur).
+    """
+    
+    COLONNES_TOTAUX = ["Type", "Categorie", "Total", "Nb", "Moyenne"]
+    COLONNES_FLUX = ["Annee", "Mois", "Revenus", "Depenses"]
+    locale = True  # Calcul sur les transactions téléchargées
+    
+    def __init__(self, data: DataStore):
+        self.data = data
+    
+    def soldes(self, comptes: list) -> dict:
+        """Solde temps réel de chaque compte"""
+        raise NotImplementedError
+    
+    def totaux_categories(self, mois: int, annee: int) -> pd.DataFrame:
+        """Total, nombre et moyenne des opérations du mois par (Type, Categorie)"""
+        raise NotImplementedError
+    
+    def flux_mensuels(self, user: str, mois: int, annee: int, nb_mois: int = 6) -> pd.DataFrame:
+        """Revenus et dépenses de l'utilisateur, un mois par ligne, sur les nb_mois finissant au mois donné"""
+        raise NotImplementedError
+    
+    @classmethod
+    def _completer_mois(cls, flux: pd.DataFrame, mois: int, annee: int, nb_mois: int) -> pd.DataFrame:
+        """Une ligne par mois de la fenêtre, dans l'ordre chronologique (0 si aucune opération)"""
+        fin = annee * 12 + mois - 1
+        index = pd.MultiIndex.from_tuples(
+            [(i // 12, i % 12 + 1) for i in range(fin - nb_mois + 1, fin + 1)], names=["Annee", "Mois"]
+        )
+        flux = flux.astype({"Annee": int, "Mois": int, "Revenus": float, "Depenses": float})
+        return flux.set_index(["Annee", "Mois"]).reindex(index, fill_value=0.0).reset_index()[cls.COLONNES_FLUX]
+
+
+@instrumenter("calcul")
+class AgregationsPandas(Agregations):
+    """Agrégations calculées localement avec pandas (implémentation par défaut)"""
+    
+    def soldes(self, comptes: list) -> dict:
+        transactions = self.data.projection("transactions", COLONNES_SOLDES)
+        versions = (transactions.attrs.get("version", "vide"), self.data.get_version("patrimoine"))
+        return calculer_soldes(self.data, versions, tuple(comptes))
+    
+    def totaux_categories(self, mois: int, annee: int) -> pd.DataFrame:
+        df = self.data.get_transactions_mois(mois, annee)
+        if df.empty:
+            return pd.DataFrame(columns=self.COLONNES_TOTAUX)
+        return df.groupby(["Type", "Categorie"])["Montant"].agg(
+            Total="sum", Nb="count", Moyenne="mean"
+        ).reset_index()
+    
+    def flux_mensuels(self, user: str, mois: int, annee: int, nb_mois: int = 6) -> pd.DataFrame:
+        df = self.data.transactions
+        if df.empty:
+            return self._completer_mois(pd.DataFrame(columns=self.COLONNES_FLUX), mois, annee, nb_mois)
+        
+        fin = annee * 12 + mois - 1
+        periode = df["Annee"] * 12 + df["Mois"] - 1
+        df = df[(df["Qui_Connecte"] == user) & periode.between(fin - nb_mois + 1, fin)]
+        flux = pd.DataFrame({
+            "Annee": df["Annee"], "Mois": df["Mois"],
+            "Revenus": df["Montant"].where(df["Type"] == "Revenu", 0.0),
+            "Depenses": df["Montant"].where(df["Type"] == "Dépense", 0.0),
+        }).groupby(["Annee", "Mois"], as_index=False).sum()
+        return self._completer_mois(flux, mois, annee, nb_mois)
+
+
+@instrumenter("calcul")
+class AgregationsSupabase(AgregationsPandas):
+    """
+    Agrégations calculées par Supabase (fonctions RPC de sql/agregations.sql) :
+    quelques lignes transférées au lieu de la table Data. Calcul local si une
+    fonction échoue ; une fonction refusée par Supabase (non installée) n'est plus
+    appelée par ce processus, et l'avertissement n'est affiché qu'une fois.
+    """
+    
+    FONCTIONS = ("budget_soldes", "budget_totaux_categories", "budget_flux_mensuels")
+    
+    @property
+    def locale(self) -> bool:
+        """Calcul local (table Data complète) dès qu'une fonction manque"""
+        return bool(get_fonctions_absentes() & set(self.FONCTIONS))
+    
+    @staticmethod
+    def _appeler(fonction: str, params: dict) -> list:
+        """Résultat RPC, en cache jusqu'au prochain changement de Data ou Patrimoine (None si échec)"""
+        absentes = get_fonctions_absentes()
+        if fonction in absentes:
+            return None
+        try:
+            return appeler_fonction_sql(fonction, params, (signature_table("Data"), signature_table("Patrimoine")))
+        except Exception as e:
+            if not erreur_transitoire(e) and fonction not in absentes:
+                absentes.add(fonction)
+                logging.getLogger("budget.agregations").warning(
+                    "Fonction %s indisponible (%s) : agrégations calculées localement", fonction, e
+                )
+                st.warning(f"⚠️ Fonction Supabase {fonction} indisponible : calcul local "
+                           "(installer sql/agregations.sql)")
+            return None
+    
+    def soldes(self, comptes: list) -> dict:
+        lignes = self._appeler("budget_soldes", {"p_comptes": list(comptes)})
+        if lignes is None:
+            return super().soldes(comptes)
+        soldes = {l["Compte"]: float(l["Solde"] or 0) for l in lignes}
+        return {c: soldes.get(c, 0.0) for c in comptes}
+    
+    def totaux_categories(self, mois: int, annee: int) -> pd.DataFrame:
+        lignes = self._appeler("budget_totaux_categories", {"p_mois": mois, "p_annee": annee})
+        if lignes is None:
+            return super().totaux_categories(mois, annee)
+        return pd.DataFrame(lignes, columns=self.COLONNES_TOTAUX).astype(
+            {"Total": float, "Nb": int, "Moyenne": float}
+        )
+    
+    def flux_mensuels(self, user: str, mois: int, annee: int, nb_mois: int = 6) -> pd.DataFrame:
+        lignes = self._appeler("budget_flux_mensuels", {
+            "p_utilisateur": user, "p_mois": mois, "p_annee": annee, "p_nb_mois": nb_mois
+        })
+        if lignes is None:
+            return super().flux_mensuels(user, mois, annee, nb_mois)
+        return self._completer_mois(pd.DataFrame(lignes, columns=self.COLONNES_FLUX), mois, annee, nb_mois)
+
+
+@st.cache_resource
+def get_fonctions_absentes() -> set:
+    """Fonctions d'agrégation refusées par Supabase (non installées), pour tout le processus"""
+    return set()
+
+
+def creer_agregations(data: DataStore) -> Agregations:
+    """Implémentation choisie par BUDGET_AGREGATIONS (« pandas » par défaut, ou « supabase »)"""
+    if os.environ.get(AGREGATIONS_ENV, "pandas") == "supabase":
+        return AgregationsSupabase(data)
+    return AgregationsPandas(data)
+
+
 # ==============================================================================
 # 6. ASSISTANT INTELLIGENT (NOTIFICATIONS)
 # ==============================================================================
+@instrumenter("assistant")
 class SmartAssistant:
     """Détecte les anomalies et génère des alertes"""
     
@@ -828,9 +3225,9 @@ class SmartAssistant:
     def _verifier_soldes_negatifs(self):
         """Alerte si un compte est en négatif"""
         engine = FinanceEngine(self.data, self.user)
+        soldes = engine.calculer_soldes(self.data.get_comptes_visibles(self.user))
         
-        for compte in self.data.get_comptes_visibles(self.user):
-            solde = engine.calculer_solde_compte(compte)
+        for compte, solde in soldes.items():
             if solde < 0:
                 self.notifications.append({
                     "type": "danger",
@@ -840,9 +3237,105 @@ class SmartAssistant:
                 })
 
 
+@st.cache_data(max_entries=32, show_spinner=False)
+def detecter_abonnements(_transactions: pd.DataFrame, version: str, reference: date) -> pd.DataFrame:
+    """
+    Détecte les paiements récurrents dans tout l'historique :
+    regroupement par (utilisateur, titre normalisé, bande de montant),
+    paiements retenus autour du jour habituel du mois,
+    puis périodicité déduite des écarts entre dates.
+    Résultat mis en cache tant que les transactions (version) ne changent pas.
+    """
+    colonnes = ["Proprietaire", "Nom", "Montant", "Jour", "Categorie", "Imputation",
+                "Periodicite", "Occurrences", "Derniere"]
+    if _transactions.empty:
+        return pd.DataFrame(columns=colonnes)
+
+    df = _transactions[
+        (_transactions["Type"] == "Dépense") & (_transactions["Montant"] > 0)
+    ][["Date", "Titre", "Montant", "Categorie", "Imputation", "Qui_Connecte"]].copy()
+    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+    df = df.dropna(subset=["Date"])
+
+    # Clés de regroupement : titre sans chiffres ni ponctuation, bande de montant
+    df["cle_titre"] = normaliser_serie(df["Titre"]).str.replace(r"[\d\W_]+", " ", regex=True).str.strip()
+    df = df[df["cle_titre"] != ""]
+    if df.empty:
+        return pd.DataFrame(columns=colonnes)
+    df["bande"] = np.floor(np.log(df["Montant"]) / np.log1p(BANDE_MONTANT)).astype(int)
+
+    cles = ["Qui_Connecte", "cle_titre", "bande"]
+    df["jour"] = df["Date"].dt.day
+
+    # Cœur régulier de chaque groupe : paiements proches du jour habituel, un seul par mois
+    # (les achats ponctuels de même titre et même montant ne cassent plus la série)
+    ecart_jour = (df["jour"] - df.groupby(cles)["jour"].transform("median")).abs()
+    df["ecart_jour"] = np.minimum(ecart_jour, 31 - ecart_jour)
+    df = df[df["ecart_jour"] <= TOLERANCE_JOUR]
+    df["mois"] = df["Date"].dt.to_period("M")
+    df = df.sort_values(cles + ["mois", "ecart_jour"]).drop_duplicates(cles + ["mois"])
+
+    df = df.sort_values(cles + ["Date"])
+    groupes = df.groupby(cles, sort=False)
+    df["ecart"] = groupes["Date"].diff().dt.days
+    # Nom proposé : titre d'origine sans les références variables (dates, numéros)
+    df["nom"] = df["Titre"].astype(str).str.replace(r"[\d/.#-]+", " ", regex=True).str.split().str.join(" ")
+
+    # Périodicité candidate de chaque groupe d'après l'écart médian
+    ecart_median = groupes["ecart"].transform("median")
+    noms = list(PERIODICITES)
+    nominal = np.array([PERIODICITES[n][0] for n in noms])
+    tolerance = np.array([PERIODICITES[n][1] for n in noms])
+    proches = np.abs(ecart_median.to_numpy()[:, None] - nominal[None, :]) <= tolerance[None, :]
+    idx_periode = np.where(proches.any(axis=1), proches.argmax(axis=1), -1)
+    df["periode"] = np.where(idx_periode >= 0, np.array(noms, dtype=object)[idx_periode], None)
+
+    # Régularité : part des écarts compatibles avec la périodicité retenue
+    nominal_ligne = np.where(idx_periode >= 0, nominal[idx_periode], np.nan)
+    tolerance_ligne = np.where(idx_periode >= 0, tolerance[idx_periode], np.nan)
+    regulier = ((df["ecart"] - nominal_ligne).abs() <= tolerance_ligne).astype(float)
+    df["regulier"] = regulier.where(df["ecart"].notna())
+
+    stats = df.groupby(cles, sort=False).agg(
+        Nom=("nom", "last"),
+        Montant=("Montant", "median"),
+        Jour=("jour", "median"),
+        Categorie=("Categorie", "last"),
+        Imputation=("Imputation", "last"),
+        Periodicite=("periode", "first"),
+        Occurrences=("Date", "size"),
+        Derniere=("Date", "max"),
+        Regularite=("regulier", "mean"),
+    ).reset_index()
+
+    stats = stats[stats["Periodicite"].notna()]
+    if stats.empty:
+        return pd.DataFrame(columns=colonnes)
+
+    periodes = stats["Periodicite"].map(PERIODICITES)
+    min_occurrences = periodes.str[2]
+    jours_periode = periodes.str[0]
+
+    # Toujours actif : dernier paiement il y a moins d'1,5 période
+    anciennete = (pd.Timestamp(reference) - stats["Derniere"]).dt.days
+    stats = stats[
+        (stats["Occurrences"] >= min_occurrences) &
+        (stats["Regularite"] >= SEUIL_REGULARITE) &
+        (anciennete <= jours_periode * 1.5)
+    ]
+
+    stats = stats.rename(columns={"Qui_Connecte": "Proprietaire"})
+    stats["Montant"] = stats["Montant"].round(2)
+    stats["Jour"] = stats["Jour"].round().clip(1, 31).astype(int)
+    stats["Derniere"] = stats["Derniere"].dt.date
+
+    return stats[colonnes].sort_values("Montant", ascending=False).reset_index(drop=True)
+
+
 # ==============================================================================
 # 7. EXPORT PDF & EXCEL
 # ==============================================================================
+@instrumenter("export")
 class ExportManager:
     """Gère les exports de données"""
     
@@ -885,6 +3378,144 @@ class ExportManager:
         output.seek(0)
         return output
     
+    def export_historique(self, format: str = "xlsx") -> str:
+        """
+        Exporte tout l'historique dans un fichier (xlsx, csv ou parquet).
+        Les lignes sont écrites par lots vers le disque (classeur en mode
+        write-only) : la mémoire utilisée ne dépend pas de la taille de l'historique.
+        Retourne le chemin du fichier (réutilisé tant que les données ne changent pas ;
+        un seul fichier conservé par utilisateur et format).
+        """
+        if format not in FORMATS_EXPORT:
+            raise ValueError(f"Format d'export inconnu: {format}")
+        
+        dossier = os.path.join(CACHE_DIR, "exports")
+        os.makedirs(dossier, exist_ok=True)
+        prefixe = f"historique_{self.user}_"
+        nom = f"{prefixe}{self.data.version[:12]}.{format}"
+        chemin = os.path.join(dossier, nom)
+        if os.path.exists(chemin):
+            return chemin
+        
+        # Fichier temporaire propre à ce fil : deux sessions peuvent exporter la même version
+        tmp = f"{chemin}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            if format == "xlsx":
+                self._ecrire_xlsx(tmp)
+            elif format == "csv":
+                self._ecrire_csv(tmp)
+            else:
+                self._ecrire_parquet(tmp)
+            os.replace(tmp, chemin)
+        except Exception:
+            with contextlib.suppress(OSError):
+                os.remove(tmp)
+            raise
+        
+        # Exports des versions précédentes
+        for ancien in os.listdir(dossier):
+            if ancien != nom and ancien.startswith(prefixe) and ancien.endswith(f".{format}"):
+                with contextlib.suppress(OSError):
+                    os.remove(os.path.join(dossier, ancien))
+        return chemin
+    
+    def _lots(self):
+        """Découpe l'historique en lots (valeurs manquantes → None)"""
+        df = self.data.transactions
+        for debut in range(0, len(df), TAILLE_LOT_EXPORT):
+            lot = df.iloc[debut:debut + TAILLE_LOT_EXPORT]
+            yield debut, lot.astype(object).where(lot.notna(), None)
+    
+    def _feuilles_resume(self) -> dict:
+        """Feuilles de synthèse multi-années de l'export complet"""
+        df = self.data.transactions
+        if df.empty:
+            return {}
+        engine = FinanceEngine(self.data, self.user)
+        return {
+            "Résumé": engine.resume_periodes(["Annee", "Mois"]),
+            "Résumé annuel": engine.resume_periodes(["Annee"]),
+            "Par Catégorie": df.groupby(["Annee", "Type", "Categorie"])["Montant"].sum().reset_index(),
+        }
+    
+    def _ecrire_xlsx(self, chemin: str):
+        """
+        Classeur Transactions / Résumé / Résumé annuel / Par Catégorie.
+        Au-delà de la limite d'Excel, les transactions continuent sur
+        « Transactions 2 », « Transactions 3 »...
+        XlsxWriter en mode constant_memory si disponible (beaucoup plus rapide),
+        sinon openpyxl en mode write-only.
+        """
+        try:
+            import xlsxwriter
+        except ImportError:
+            xlsxwriter = None
+        
+        colonnes = list(self.data.transactions.columns)
+        
+        if xlsxwriter is not None:
+            wb = xlsxwriter.Workbook(chemin, {"constant_memory": True, "default_date_format": "yyyy-mm-dd"})
+            ws = wb.add_worksheet("Transactions")
+            ws.write_row(0, 0, colonnes)
+            feuille = 0
+            for debut, lot in self._lots():
+                for i, ligne in enumerate(lot.itertuples(index=False, name=None), start=debut):
+                    n, rang = divmod(i, EXCEL_LIGNES_PAR_FEUILLE)
+                    if n != feuille:
+                        feuille = n
+                        ws = wb.add_worksheet(f"Transactions {n + 1}")
+                        ws.write_row(0, 0, colonnes)
+                    ws.write_row(rang + 1, 0, ligne)
+            for nom, table in self._feuilles_resume().items():
+                ws = wb.add_worksheet(nom)
+                ws.write_row(0, 0, list(table.columns))
+                for i, ligne in enumerate(table.itertuples(index=False, name=None), start=1):
+                    ws.write_row(i, 0, ligne)
+            wb.close()
+            return
+        
+        from openpyxl import Workbook
+        
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Transactions")
+        ws.append(colonnes)
+        feuille = 0
+        for debut, lot in self._lots():
+            for i, ligne in enumerate(lot.itertuples(index=False, name=None), start=debut):
+                n = i // EXCEL_LIGNES_PAR_FEUILLE
+                if n != feuille:
+                    feuille = n
+                    ws = wb.create_sheet(f"Transactions {n + 1}")
+                    ws.append(colonnes)
+                ws.append(ligne)
+        for nom, table in self._feuilles_resume().items():
+            ws = wb.create_sheet(nom)
+            ws.append(list(table.columns))
+            for ligne in table.itertuples(index=False, name=None):
+                ws.append(ligne)
+        wb.save(chemin)
+    
+    def _ecrire_csv(self, chemin: str):
+        """CSV (séparateur ;, compatible Excel FR) écrit lot par lot"""
+        with open(chemin, "w", encoding="utf-8-sig", newline="") as f:
+            for debut, lot in self._lots():
+                lot.to_csv(f, sep=";", index=False, header=(debut == 0))
+    
+    def _ecrire_parquet(self, chemin: str):
+        """Parquet écrit par row groups successifs (nécessite pyarrow)"""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("L'export Parquet nécessite pyarrow (pip install pyarrow)")
+        
+        df = self.data.transactions
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+        with pq.ParquetWriter(chemin, schema) as writer:
+            for debut in range(0, len(df), TAILLE_LOT_EXPORT):
+                lot = df.iloc[debut:debut + TAILLE_LOT_EXPORT]
+                writer.write_table(pa.Table.from_pandas(lot, schema=schema, preserve_index=False))
+    
     def generate_report_data(self) -> dict:
         """Génère les données pour le rapport PDF"""
         engine = FinanceEngine(self.data, self.user)
@@ -915,6 +3546,77 @@ class ExportManager:
             "top_depenses": top_depenses,
             "repartition": repartition
         }
+    
+    def export_pdf(self) -> BytesIO:
+        """Génère le rapport PDF du mois"""
+        return BytesIO(generer_pdf_rapport(self.generate_report_data()))
+
+
+def generer_pdf_rapport(rapport: dict) -> bytes:
+    """Rapport PDF d'un mois (mise en page dans rapports.py, sans streamlit)"""
+    return rapports.generer_pdf_rapport(rapport, APP_NAME, COLORS)
+
+
+@st.cache_resource
+def get_pool_rapports() -> ProcessPoolExecutor:
+    """
+    Pool de rendu des PDF, créé une fois par processus. Workers lancés par forkserver
+    (ou spawn) et non par fork : le serveur Streamlit a des threads et des verrous
+    qu'un processus copié pourrait hériter verrouillés.
+    """
+    methode = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=NB_PROCESSUS_RAPPORTS, mp_context=multiprocessing.get_context(methode))
+
+
+def generer_pdfs_en_lot(liste_rapports: list) -> list:
+    """
+    Met en page plusieurs rapports en parallèle sur le pool de processus.
+    Si le pool échoue, l'erreur est journalisée et le rendu se fait ici, en séquence.
+    """
+    if len(liste_rapports) > 1 and NB_PROCESSUS_RAPPORTS > 1:
+        try:
+            rendu = functools.partial(rapports.generer_pdf_rapport, app_name=APP_NAME, couleurs=COLORS)
+            return list(get_pool_rapports().map(
+                rendu, liste_rapports, chunksize=max(1, len(liste_rapports) // (NB_PROCESSUS_RAPPORTS * 2))
+            ))
+        except BrokenProcessPool:
+            logging.getLogger("budget.rapports").exception("Worker de rendu PDF perdu, rendu séquentiel")
+            get_pool_rapports.clear()  # Nouveau pool au prochain lot
+        except Exception:
+            logging.getLogger("budget.rapports").exception("Pool de rendu des PDF en échec, rendu séquentiel")
+    return [generer_pdf_rapport(r) for r in liste_rapports]
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def rapport_pdf_cache(_data: DataStore, user: str, mois: int, annee: int, version: str) -> bytes:
+    """Rapport PDF du mois, généré une fois par (utilisateur, période, version)"""
+    return ExportManager(_data, user, mois, annee).export_pdf().getvalue()
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def archive_rapports_cache(_data: DataStore, annee: int, version: str) -> bytes:
+    """
+    Archive zip des rapports de l'année : un PDF par utilisateur et par mois.
+    Les données sont préparées ici, seule la mise en page part dans le pool.
+    """
+    rapports = [
+        ExportManager(_data, user, mois, annee).generate_report_data()
+        for user in USERS for mois in range(1, 13)
+    ]
+    pdfs = generer_pdfs_en_lot(rapports)
+    
+    output = BytesIO()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+        for rapport, pdf in zip(rapports, pdfs):
+            mois = MOIS_FR.index(rapport["mois"]) + 1
+            archive.writestr(f"{annee}/{rapport['user']}/rapport_{annee}_{mois:02d}_{rapport['user']}.pdf", pdf)
+    return output.getvalue()
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def export_excel_cache(_data: DataStore, user: str, mois: int, annee: int, version: str) -> bytes:
+    """Classeur Excel du mois, généré une fois par (utilisateur, période, version)"""
+    return ExportManager(_data, user, mois, annee).export_excel().getvalue()
 
 
 # ==============================================================================
@@ -945,41 +3647,426 @@ def render_notification(notif: dict):
     """, unsafe_allow_html=True)
 
 
-def render_transaction_item(row: pd.Series, show_delete: bool = True) -> bool:
-    """Affiche une ligne de transaction. Retourne True si supprimée."""
-    type_icons = {
-        "Dépense": ("💸", "expense", "negative"),
-        "Revenu": ("💰", "income", "positive"),
-        "Épargne": ("🏦", "saving", "neutral"),
-        "Investissement": ("📈", "saving", "negative"),
-        "Virement Interne": ("🔄", "transfer", "neutral"),
-    }
+def render_transaction_item(row: pd.Series, show_delete: bool = True) -> bool:
+    """Affiche une ligne de transaction. Retourne True si supprimée."""
+    type_icons = {
+        "Dépense": ("💸", "expense", "negative"),
+        "Revenu": ("💰", "income", "positive"),
+        "Épargne": ("🏦", "saving", "neutral"),
+        "Investissement": ("📈", "saving", "negative"),
+        "Virement Interne": ("🔄", "transfer", "neutral"),
+    }
+    
+    icon, icon_class, amount_class = type_icons.get(row["Type"], ("📝", "expense", "neutral"))
+    
+    col1, col2, col3, col4 = st.columns([0.5, 3, 2, 1])
+    
+    with col1:
+        st.markdown(f'<div class="transaction-icon {icon_class}">{icon}</div>', unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown(f"""
+            <div class="transaction-title">{row['Titre']}</div>
+            <div class="transaction-category">{row['Categorie']} · {row['Date']}</div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        sign = "-" if row["Type"] in ["Dépense", "Investissement"] else "+"
+        st.markdown(f"""
+            <div class="transaction-amount {amount_class}">{sign}{row['Montant']:,.2f} €</div>
+        """, unsafe_allow_html=True)
+    
+    with col4:
+        if show_delete:
+            if st.button("🗑️", key=f"del_{row['id']}", help="Supprimer"):
+                return True
+    
+    return False
+
+
+def _changer_page_journal(delta: int, nb_pages: int):
+    """Callback des boutons de navigation du journal"""
+    page = st.session_state.get("journal_page", 1) + delta
+    st.session_state["journal_page"] = min(max(page, 1), nb_pages)
+
+
+def render_journal(transactions: pd.DataFrame, positions: np.ndarray, filtres: tuple = ()):
+    """
+    Affiche une page du journal : un seul tableau par page (quelle que soit
+    la taille de l'historique), sélection de lignes pour la suppression
+    """
+    # Retour à la première page quand les filtres changent
+    if st.session_state.get("journal_filtres") != filtres:
+        st.session_state["journal_filtres"] = filtres
+        st.session_state["journal_page"] = 1
+    
+    col_n1, col_n2, col_n3, col_n4, col_n5 = st.columns([1, 1, 2, 1, 1])
+    
+    with col_n3:
+        taille_page = st.selectbox("Lignes par page", [25, 50, 100, 200], index=1, key="journal_taille")
+    
+    nb_pages = max(1, math.ceil(len(positions) / taille_page))
+    st.session_state["journal_page"] = min(st.session_state.get("journal_page", 1), nb_pages)
+    
+    with col_n1:
+        st.button("⏮", key="journal_debut", use_container_width=True,
+                  on_click=_changer_page_journal, args=(-nb_pages, nb_pages))
+    with col_n2:
+        st.button("◀", key="journal_prec", use_container_width=True,
+                  on_click=_changer_page_journal, args=(-1, nb_pages))
+    with col_n4:
+        st.button("▶", key="journal_suiv", use_container_width=True,
+                  on_click=_changer_page_journal, args=(1, nb_pages))
+    with col_n5:
+        st.button("⏭", key="journal_fin", use_container_width=True,
+                  on_click=_changer_page_journal, args=(nb_pages, nb_pages))
+    
+    page = st.number_input(f"Page (sur {nb_pages})", min_value=1, max_value=nb_pages, key="journal_page")
+    
+    debut = (page - 1) * taille_page
+    page_df = transactions.iloc[positions[debut:debut + taille_page]]
+    
+    type_icons = {
+        "Dépense": "💸", "Revenu": "💰", "Épargne": "🏦",
+        "Investissement": "📈", "Virement Interne": "🔄",
+    }
+    signe = np.where(page_df["Type"].isin(["Dépense", "Investissement"]), -1, 1)
+    vue = pd.DataFrame({
+        "": page_df["Type"].map(type_icons).fillna("📝"),
+        "Date": page_df["Date"],
+        "Titre": page_df["Titre"],
+        "Catégorie": page_df["Categorie"],
+        "Montant": page_df["Montant"] * signe,
+        "Compte": page_df.get("Compte_Source"),
+        "Par": page_df.get("Qui_Connecte"),
+    })
+    
+    st.caption(f"{debut + 1}–{debut + len(page_df)} sur {len(positions)} transaction(s)")
+    # Une sélection par page et par filtres : des positions choisies sur une page
+    # ne doivent jamais désigner les lignes d'une autre
+    cle_grille = f"journal_grille_{page}_{taille_page}_{hashlib.md5(repr(filtres).encode()).hexdigest()[:8]}"
+    event = st.dataframe(
+        vue,
+        use_container_width=True,
+        hide_index=True,
+        column_config={"Montant": st.column_config.NumberColumn(format="%.2f €")},
+        on_select="rerun",
+        selection_mode="multi-row",
+        key=cle_grille,
+    )
+    
+    selection = [i for i in (event.selection.rows if event else []) if i < len(page_df)]
+    if selection:
+        ids = page_df["id"].iloc[selection].tolist()
+        if st.button(f"🗑️ Supprimer la sélection ({len(ids)})", type="secondary"):
+            delete_rows("Data", ids)
+            st.session_state.pop(cle_grille, None)  # Les lignes restantes se décalent : sélection vidée
+            st.rerun()
+
+
+class FigureCache:
+    """
+    Cache LRU des figures Plotly prêtes à afficher (spec dict), indexé par
+    (type de graphique, utilisateur, période, version des données).
+    Un graphique inchangé ne coûte qu'une recherche dans un dictionnaire.
+    """
+
+    def __init__(self, taille_max: int = 64):
+        self.taille_max = taille_max
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cle: tuple, construire):
+        """Retourne la figure en cache, ou la construit via construire()"""
+        with self._lock:
+            if cle in self._figures:
+                self._figures.move_to_end(cle)
+                return self._figures[cle]
+
+        fig = construire()
+        spec = fig.to_dict() if fig is not None else None
+
+        with self._lock:
+            self._figures[cle] = spec
+            while len(self._figures) > self.taille_max:
+                self._figures.popitem(last=False)
+        return spec
+
+
+@st.cache_resource(show_spinner=False)
+def get_figure_cache() -> FigureCache:
+    """Cache de figures partagé par toutes les sessions"""
+    return FigureCache()
+
+
+def construire_figure_repartition(totaux: pd.DataFrame):
+    """Camembert des dépenses par catégorie, d'après les totaux du mois (None si aucune dépense)"""
+    df_dep = totaux[totaux["Type"] == "Dépense"]
+    
+    if df_dep.empty:
+        return None
+    
+    fig = px.pie(
+        df_dep,
+        values="Total",
+        names="Categorie",
+        hole=0.4,
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    fig.update_layout(
+        showlegend=False,
+        margin=dict(t=20, b=20, l=20, r=20)
+    )
+    return fig
+
+
+def construire_figure_evolution(flux: pd.DataFrame):
+    """Barres revenus/dépenses de l'utilisateur, d'après les flux mensuels (ordre chronologique)"""
+    df_evol = pd.DataFrame({
+        "Mois": [MOIS_FR[m - 1][:3] for m in flux["Mois"]],
+        "Revenus": flux["Revenus"],
+        "Dépenses": flux["Depenses"],
+    })
+    
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=df_evol["Mois"],
+        y=df_evol["Revenus"],
+        name="Revenus",
+        marker_color="#10B981"
+    ))
+    fig.add_trace(go.Bar(
+        x=df_evol["Mois"],
+        y=df_evol["Dépenses"],
+        name="Dépenses",
+        marker_color="#EF4444"
+    ))
+    fig.update_layout(
+        barmode='group',
+        margin=dict(t=20, b=20, l=20, r=20),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02)
+    )
+    return fig
+
+
+def construire_figure_patrimoine(historique: pd.DataFrame):
+    """Courbes du patrimoine de fin de mois : total et par type de compte"""
+    if historique.empty:
+        return None
+    
+    fig = go.Figure()
+    for colonne, couleur in [("Total", COLORS["primary"]), ("Courant", COLORS["info"]), ("Épargne", COLORS["success"])]:
+        fig.add_trace(go.Scatter(
+            x=historique.index,
+            y=historique[colonne],
+            name=colonne,
+            mode="lines",
+            line=dict(color=couleur, width=3 if colonne == "Total" else 2)
+        ))
+    fig.update_layout(
+        margin=dict(t=20, b=20, l=20, r=20),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02),
+        hovermode="x unified"
+    )
+    return fig
+
+
+def render_export_excel(data: DataStore, user: str, mois: int, annee: int, file_name: str,
+                        label: str = "📥 Télécharger Excel", key: str = "export_excel"):
+    """
+    Bouton d'export à la demande : le classeur n'est généré qu'au premier clic,
+    puis servi depuis le cache tant que les données ne changent pas
+    """
+    cle = (user, mois, annee, data.version)
+    prets = st.session_state.setdefault("exports_prets", set())
+    zone = st.empty()
     
-    icon, icon_class, amount_class = type_icons.get(row["Type"], ("📝", "expense", "neutral"))
+    if cle not in prets:
+        if not zone.button(label, key=f"{key}_preparer", use_container_width=True):
+            return
+        prets.add(cle)
     
-    col1, col2, col3, col4 = st.columns([0.5, 3, 2, 1])
+    with st.spinner("Préparation du fichier..."):
+        excel_data = export_excel_cache(data, user, mois, annee, data.version)
     
-    with col1:
-        st.markdown(f'<div class="transaction-icon {icon_class}">{icon}</div>', unsafe_allow_html=True)
+    zone.download_button(
+        f"⬇️ {file_name}",
+        excel_data,
+        file_name=file_name,
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        key=f"{key}_telecharger",
+        on_click="ignore",
+        use_container_width=True
+    )
+
+
+def render_export_historique(data: DataStore, user: str, mois: int, annee: int):
+    """
+    Export de tout l'historique, au format choisi, généré au premier clic ;
+    le bouton de téléchargement reste affiché tant que les données ne changent pas
+    """
+    format_export = st.selectbox("Format", list(FORMATS_EXPORT), key="export_historique_format",
+                                 label_visibility="collapsed")
+    cle = ("historique", user, format_export, data.version)
+    prets = st.session_state.setdefault("exports_prets", set())
+    zone = st.empty()
     
-    with col2:
-        st.markdown(f"""
-            <div class="transaction-title">{row['Titre']}</div>
-            <div class="transaction-category">{row['Categorie']} · {row['Date']}</div>
-        """, unsafe_allow_html=True)
+    if cle not in prets:
+        if not zone.button("🗄️ Exporter tout l'historique", key="export_historique", use_container_width=True):
+            return
+        if format_export == "xlsx" and len(data.transactions) > EXCEL_LIGNES_PAR_FEUILLE:
+            st.info(f"ℹ️ {len(data.transactions):,} transactions : plusieurs feuilles « Transactions » "
+                    "(limite d'Excel). CSV ou Parquet tiennent en un seul tableau.")
+        prets.add(cle)
     
-    with col3:
-        sign = "-" if row["Type"] in ["Dépense", "Investissement"] else "+"
-        st.markdown(f"""
-            <div class="transaction-amount {amount_class}">{sign}{row['Montant']:,.2f} €</div>
-        """, unsafe_allow_html=True)
+    try:
+        with st.spinner("Export en cours..."):
+            chemin = ExportManager(data, user, mois, annee).export_historique(format_export)
+    except RuntimeError as e:
+        prets.discard(cle)
+        zone.error(f"❌ {e}")
+        return
     
-    with col4:
-        if show_delete:
-            if st.button("🗑️", key=f"del_{row['id']}", help="Supprimer"):
-                return True
+    with open(chemin, "rb") as f:
+        zone.download_button(
+            f"⬇️ historique_{user}.{format_export}",
+            f,
+            file_name=f"historique_{user}.{format_export}",
+            mime=FORMATS_EXPORT[format_export],
+            key="export_historique_telecharger",
+            on_click="ignore",
+            use_container_width=True
+        )
+
+
+def render_export_rapports(data: DataStore, user: str, mois: int, annee: int):
+    """Rapport PDF du mois et archive annuelle (tous utilisateurs), générés à la demande"""
+    cle = ("pdf", user, mois, annee, data.version)
+    prets = st.session_state.setdefault("exports_prets", set())
+    zone = st.empty()
     
-    return False
+    if cle in prets or zone.button("📄 Rapport PDF", key="export_pdf_preparer", use_container_width=True):
+        prets.add(cle)
+        with st.spinner("Mise en page du rapport..."):
+            pdf = rapport_pdf_cache(data, user, mois, annee, data.version)
+        zone.download_button(
+            f"⬇️ rapport_{MOIS_FR[mois-1]}_{annee}.pdf",
+            pdf,
+            file_name=f"rapport_{MOIS_FR[mois-1]}_{annee}_{user}.pdf",
+            mime="application/pdf",
+            key="export_pdf_telecharger",
+            on_click="ignore",
+            use_container_width=True
+        )
+    
+    cle = ("archive", annee, data.version)
+    zone = st.empty()
+    
+    if cle in prets or zone.button(f"🗂️ Archive des rapports {annee}", key="export_archive_preparer",
+                                   use_container_width=True):
+        prets.add(cle)
+        with st.spinner(f"Génération des {len(USERS) * 12} rapports..."):
+            archive = archive_rapports_cache(data, annee, data.version)
+        zone.download_button(
+            f"⬇️ rapports_{annee}.zip",
+            archive,
+            file_name=f"rapports_{annee}.zip",
+            mime="application/zip",
+            key="export_archive_telecharger",
+            on_click="ignore",
+            use_container_width=True
+        )
+
+
+def construire_figure_profilage(mesures: list, nb_max: int = 40):
+    """Cascade des mesures d'un passage : une barre par appel, placée à son instant de début"""
+    df = pd.DataFrame(mesures).nlargest(nb_max, "duree_ms").sort_values("debut_ms")
+    couleurs = {"page": COLORS["primary"], "données": COLORS["warning"], "calcul": COLORS["success"],
+                "assistant": COLORS["info"], "export": COLORS["danger"], "réseau": COLORS["dark"]}
+    
+    fig = go.Figure(go.Bar(
+        y=[f"{'· ' * p}{n}" for p, n in zip(df["profondeur"], df["nom"])],
+        x=df["duree_ms"],
+        base=df["debut_ms"],
+        orientation="h",
+        marker_color=[couleurs.get(c, COLORS["muted"]) for c in df["categorie"]],
+        hovertemplate="%{y}<br>%{x:.1f} ms<extra></extra>"
+    ))
+    fig.update_layout(
+        height=max(200, 22 * len(df)),
+        margin=dict(t=10, b=10, l=10, r=10),
+        xaxis_title="ms",
+        yaxis=dict(autorange="reversed", tickfont=dict(size=10))
+    )
+    return fig
+
+
+def render_ecritures_rejetees(file):
+    """Écritures refusées par Supabase : erreur visible, relance ou abandon"""
+    for e in file.rejetees() if file is not None else []:
+        payload = e["payload"] or {}
+        libelle = payload.get("Titre") or payload.get("Nom") or ", ".join(f"{k}={v}" for k, v in list(payload.items())[:3])
+        st.error(f"❌ Écriture refusée ({e['operation']} {e['table']}{f' · {libelle}' if libelle else ''}) : {e['erreur']}")
+        col1, col2 = st.columns(2)
+        if col1.button("🔁 Réessayer", key=f"ecriture_relancer_{e['id']}", use_container_width=True):
+            file.relancer(e["id"])
+            st.rerun()
+        if col2.button("🗑️ Abandonner", key=f"ecriture_abandonner_{e['id']}", use_container_width=True):
+            file.abandonner(e["id"])
+            st.rerun()
+
+
+def render_profilage():
+    """
+    Panneau de profilage : temps de rendu et réseau du dernier passage, latences Supabase,
+    puis (profilage activé) cascade du dernier passage et points chauds
+    """
+    with st.expander("🔬 Profilage"):
+        st.toggle("Activer le profilage", key="profilage")
+        actif = profilage_actif()
+        
+        # Temps de rendu du dernier passage (run complet ou fragment)
+        durees = st.session_state.get("durees_rendu", {})
+        for nom, ms in sorted(durees.items(), key=lambda x: -x[1]):
+            st.caption(f"{nom} : {ms:,.0f} ms")
+        
+        reseau = st.session_state.get("reseau_passage")
+        if reseau:
+            requetes = reseau["requetes"].values()
+            # Les octets ne sont mesurés qu'en profilage
+            octets = f" · {sum(r['octets'] for r in requetes) / 1024:,.0f} Ko" if actif else ""
+            st.caption(f"🌐 {reseau['racine']} : {sum(r['requetes'] for r in requetes)} requête(s) · "
+                       f"{sum(r['lignes'] for r in requetes):,} lignes{octets}")
+            for cle, r in sorted(reseau["requetes"].items(), key=lambda x: -x[1]["ms"]):
+                st.caption(f"· {cle} : {r['requetes']} req. · {r['lignes']:,} lignes · {r['ms']:,.0f} ms"
+                           + (f" · {r['echecs']} échec(s)" if r.get("echecs") else ""))
+        
+        # Latences par table depuis le démarrage (bornes des classes de l'histogramme)
+        latences = get_db().latences if get_db() else {}
+        if latences:
+            st.caption("🌐 Latences Supabase (médiane / 95e centile)")
+            for table, compteurs in sorted(latences.items()):
+                st.caption(f"· {table} : {sum(compteurs)} req. · ≤ {quantile_histogramme(compteurs, 0.5):g} ms"
+                           f" / ≤ {quantile_histogramme(compteurs, 0.95):g} ms")
+        
+        trace = st.session_state.get("profilage_trace")
+        if not actif or not trace:
+            st.caption("Mesure chaque chargement, calcul et page (journal dans .cache/profilage.jsonl).")
+            return
+        
+        st.caption(f"Dernier passage : {trace['racine']}")
+        st.plotly_chart(construire_figure_profilage(trace["mesures"]), use_container_width=True)
+        
+        chauds = pd.DataFrame(trace["mesures"]).groupby("nom").agg(
+            ms=("duree_ms", "sum"), appels=("duree_ms", "size")
+        ).sort_values("ms", ascending=False).head(15)
+        st.dataframe(chauds.round(1), use_container_width=True)
+        
+        chargements = [m for m in trace["mesures"] if m["categorie"] == "données"]
+        for m in chargements:
+            st.caption(f"{m['nom']} · {m.get('cache', '?')} · {m.get('lignes', 0):,} lignes · "
+                       f"{m.get('octets', 0) / 1024:,.0f} Ko")
 
 
 def render_account_card(nom: str, solde: float, is_epargne: bool = False):
@@ -1027,6 +4114,8 @@ def render_progress_bar(label: str, current: float, target: float, color: str =
 # ==============================================================================
 # 9. PAGES DE L'APPLICATION
 # ==============================================================================
+@st.fragment
+@chronometrer("Accueil")
 def page_accueil(data: DataStore, user: str, mois: int, annee: int):
     """Page d'accueil / Dashboard"""
     st.markdown(f"## 👋 Bonjour {user}")
@@ -1118,305 +4207,361 @@ def page_accueil(data: DataStore, user: str, mois: int, annee: int):
         st.markdown("### 🎯 Projets")
         
         if not data.projets.empty:
-            for _, proj in data.projets.head(3).iterrows():
-                nom = proj.get("Projet", "")
-                cible = proj.get("Cible", 0)
-                
-                # Calculer l'épargne affectée
-                epargne_projet = 0
-                if not data.transactions.empty:
-                    epargne_projet = data.transactions[
-                        data.transactions["Projet_Epargne"] == nom
-                    ]["Montant"].sum()
-                
-                render_progress_bar(nom, epargne_projet, cible, color="#10B981")
+            versements = data.projection("transactions", COLONNES_PROJETS)
+            projets = progression_projets(versements, data.projets,
+                                          (versements.attrs.get("version", "vide"), data.get_version("projets")),
+                                          date.today())
+            for proj in projets.head(3).itertuples():
+                render_progress_bar(proj.Projet, proj.Epargne, proj.Cible, color="#10B981")
         else:
             st.info("Aucun projet d'épargne.")
 
 
-def page_operations(data: DataStore, user: str, mois: int, annee: int, comptes_visibles: list):
-    """Page Opérations (Saisie, Journal, Abonnements)"""
+@st.fragment
+@chronometrer("Opérations · Saisie")
+def section_saisie(data: DataStore, user: str, comptes_visibles: list):
+    """Formulaire de saisie rapide"""
+    st.markdown("### Nouvelle opération")
     
-    tabs = st.tabs(["➕ Saisie rapide", "📋 Journal", "🔄 Abonnements"])
-    
-    # === SAISIE ===
-    with tabs[0]:
-        st.markdown("### Nouvelle opération")
+    with st.form("form_saisie", clear_on_submit=True):
+        col1, col2, col3 = st.columns(3)
         
-        with st.form("form_saisie", clear_on_submit=True):
-            col1, col2, col3 = st.columns(3)
-            
-            with col1:
-                date_op = st.date_input("Date", datetime.now())
-            with col2:
-                type_op = st.selectbox("Type", TYPES)
-            with col3:
-                montant = st.number_input("Montant (€)", min_value=0.0, step=0.01, format="%.2f")
-            
-            col4, col5 = st.columns(2)
-            
-            with col4:
-                titre = st.text_input("Titre", placeholder="Ex: Carrefour, Loyer...")
-            
-            # Auto-catégorisation
-            cat_auto = "Autre"
-            compte_auto = comptes_visibles[0] if comptes_visibles else ""
-            
-            if titre and not data.mots_cles.empty:
-                for _, mc in data.mots_cles.iterrows():
-                    if str(mc.get("Mot_Cle", "")).lower() in titre.lower():
-                        cat_auto = mc.get("Categorie", cat_auto)
-                        compte_auto = mc.get("Compte", compte_auto)
-                        break
-            
-            categories = data.categories.get(type_op, ["Autre"])
+        with col1:
+            date_op = st.date_input("Date", datetime.now())
+        with col2:
+            type_op = st.selectbox("Type", TYPES)
+        with col3:
+            montant = st.number_input("Montant (€)", min_value=0.0, step=0.01, format="%.2f")
+        
+        col4, col5 = st.columns(2)
+        
+        with col4:
+            titre = st.text_input("Titre", placeholder="Ex: Carrefour, Loyer...")
+        
+        # Auto-catégorisation
+        cat_auto = "Autre"
+        compte_auto = comptes_visibles[0] if comptes_visibles else ""
+        
+        categories = data.categories.get(type_op, ["Autre"])
+        
+        if titre:
+            regle = data.get_matcher().match(titre)
+            if regle:
+                cat_auto = regle["Categorie"] or cat_auto
+                compte_auto = regle["Compte"] or compte_auto
+            else:
+                # Pas de règle : suggestion apprise sur l'historique
+                suggestion = data.get_categoriseur().predire(titre, categories, comptes_visibles)
+                cat_auto = suggestion["Categorie"] or cat_auto
+                compte_auto = suggestion["Compte_Source"] or compte_auto
+        
+        try:
+            idx_cat = categories.index(cat_auto)
+        except ValueError:
+            idx_cat = 0
+        
+        with col5:
+            categorie = st.selectbox("Catégorie", categories, index=idx_cat)
+        
+        col6, col7 = st.columns(2)
+        
+        with col6:
             try:
-                idx_cat = categories.index(cat_auto)
+                idx_compte = comptes_visibles.index(compte_auto)
             except ValueError:
-                idx_cat = 0
-            
-            with col5:
-                categorie = st.selectbox("Catégorie", categories, index=idx_cat)
-            
-            col6, col7 = st.columns(2)
-            
-            with col6:
-                try:
-                    idx_compte = comptes_visibles.index(compte_auto)
-                except ValueError:
-                    idx_compte = 0
-                compte_source = st.selectbox("Compte", comptes_visibles, index=idx_compte)
-            
-            with col7:
-                imputation = st.selectbox("Imputation", IMPUTATIONS)
-            
-            # Champs conditionnels
-            compte_cible = ""
-            projet_epargne = ""
-            pourcentage_perso = 50
-            
-            if imputation == "Commun (Autre %)":
-                pourcentage_perso = st.slider(
-                    f"Ma part ({user})", 
-                    min_value=0, max_value=100, value=50,
-                    help="Pourcentage que vous payez"
-                )
-            
-            if type_op in ["Épargne", "Virement Interne"]:
-                col_a, col_b = st.columns(2)
-                with col_a:
-                    if type_op == "Épargne":
-                        comptes_epargne = [c for c in comptes_visibles if data.type_compte.get(c) == "Épargne"]
-                        if comptes_epargne:
-                            compte_cible = st.selectbox("Vers compte épargne", comptes_epargne)
-                    else:
-                        compte_cible = st.selectbox("Vers compte", comptes_visibles)
-                
-                with col_b:
-                    if type_op == "Épargne" and not data.projets.empty:
-                        projets_list = ["Aucun"] + data.projets["Projet"].tolist()
-                        projet_epargne = st.selectbox("Affecter au projet", projets_list)
-                        if projet_epargne == "Aucun":
-                            projet_epargne = ""
+                idx_compte = 0
+            compte_source = st.selectbox("Compte", comptes_visibles, index=idx_compte)
+        
+        with col7:
+            imputation = st.selectbox("Imputation", IMPUTATIONS)
+        
+        # Champs conditionnels
+        compte_cible = ""
+        projet_epargne = ""
+        pourcentage_perso = 50
+        
+        if imputation == "Commun (Autre %)":
+            pourcentage_perso = st.slider(
+                f"Ma part ({user})", 
+                min_value=0, max_value=100, value=50,
+                help="Pourcentage que vous payez"
+            )
+        
+        if type_op in ["Épargne", "Virement Interne"]:
+            col_a, col_b = st.columns(2)
+            with col_a:
+                if type_op == "Épargne":
+                    comptes_epargne = [c for c in comptes_visibles if data.type_compte.get(c) == "Épargne"]
+                    if comptes_epargne:
+                        compte_cible = st.selectbox("Vers compte épargne", comptes_epargne)
+                else:
+                    compte_cible = st.selectbox("Vers compte", comptes_visibles)
             
-            submitted = st.form_submit_button("💾 Enregistrer", type="primary", use_container_width=True)
+            with col_b:
+                if type_op == "Épargne" and not data.projets.empty:
+                    projets_list = ["Aucun"] + data.projets["Projet"].tolist()
+                    projet_epargne = st.selectbox("Affecter au projet", projets_list)
+                    if projet_epargne == "Aucun":
+                        projet_epargne = ""
+        
+        submitted = st.form_submit_button("💾 Enregistrer", type="primary", use_container_width=True)
+        
+        if submitted and montant > 0:
+            new_row = {
+                "Date": date_op,
+                "Mois": date_op.month,
+                "Annee": date_op.year,
+                "Qui_Connecte": user,
+                "Type": type_op,
+                "Categorie": categorie,
+                "Titre": titre,
+                "Montant": montant,
+                "Paye_Par": user,
+                "Imputation": imputation,
+                "Pourcentage_Perso": pourcentage_perso,
+                "Compte_Source": compte_source,
+                "Compte_Cible": compte_cible,
+                "Projet_Epargne": projet_epargne
+            }
             
-            if submitted and montant > 0:
-                new_row = {
-                    "Date": date_op,
-                    "Mois": date_op.month,
-                    "Annee": date_op.year,
-                    "Qui_Connecte": user,
-                    "Type": type_op,
-                    "Categorie": categorie,
-                    "Titre": titre,
-                    "Montant": montant,
-                    "Paye_Par": user,
-                    "Imputation": imputation,
-                    "Pourcentage_Perso": pourcentage_perso,
-                    "Compte_Source": compte_source,
-                    "Compte_Cible": compte_cible,
-                    "Projet_Epargne": projet_epargne
-                }
-                
-                if save_row("Data", new_row):
-                    st.success("✅ Transaction enregistrée !")
-                    time.sleep(0.5)
-                    st.rerun()
+            if save_row("Data", new_row):
+                st.toast("✅ Transaction enregistrée !")
+                st.rerun()
+
+
+@st.fragment
+@chronometrer("Opérations · Journal")
+def section_journal(data: DataStore, user: str, mois: int, annee: int, comptes_visibles: list):
+    """Journal paginé avec recherche et filtres"""
+    st.markdown("### Historique des transactions")
     
-    # === JOURNAL ===
-    with tabs[1]:
-        st.markdown("### Historique des transactions")
-        
-        col_f1, col_f2, col_f3 = st.columns([2, 2, 1])
-        
-        with col_f1:
-            filtre_mois = st.checkbox("Mois en cours uniquement", value=True)
-        with col_f2:
-            recherche = st.text_input("🔍 Rechercher", placeholder="Titre, catégorie...")
-        with col_f3:
-            if st.button("📥 Export Excel"):
-                export = ExportManager(data, user, mois, annee)
-                excel_data = export.export_excel()
-                st.download_button(
-                    "Télécharger",
-                    excel_data,
-                    file_name=f"budget_{MOIS_FR[mois-1]}_{annee}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+    col_f1, col_f2, col_f3 = st.columns([2, 2, 1])
+    
+    with col_f1:
+        filtre_mois = st.checkbox("Mois en cours uniquement", value=True)
+    with col_f2:
+        recherche = st.text_input("🔍 Rechercher", placeholder="Titre, catégorie...")
+    with col_f3:
+        render_export_excel(data, user, mois, annee, f"budget_{MOIS_FR[mois-1]}_{annee}.xlsx",
+                            label="📥 Export Excel", key="export_journal")
+    
+    # Filtrage : positions (iloc) dans data.transactions, déjà ordonnées
+    transactions = data.transactions
+    if transactions.empty:
+        positions = np.array([], dtype=np.int64)
+    elif recherche:
+        # Résultats de l'index, triés par pertinence
+        positions = data.get_search_index().search(recherche)
+    else:
+        positions = data.get_ordre_chronologique()
+    
+    if filtre_mois and len(positions):
+        dans_mois = (transactions["Mois"].to_numpy() == mois) & (transactions["Annee"].to_numpy() == annee)
+        positions = positions[dans_mois[positions]]
+    
+    # Filtres avancés (résolus par les index secondaires)
+    criteres = {}
+    if not transactions.empty:
+        index = data.get_transaction_index()
+        with st.expander("🎛️ Filtres avancés"):
+            col_a1, col_a2, col_a3 = st.columns(3)
+            with col_a1:
+                periode = st.date_input("Période", value=(), key="journal_periode")
+                comptes_f = st.multiselect("Comptes", comptes_visibles, key="journal_comptes")
+            with col_a2:
+                montant_min = st.number_input("Montant min (€)", min_value=0.0, value=None, key="journal_mmin")
+                montant_max = st.number_input("Montant max (€)", min_value=0.0, value=None, key="journal_mmax")
+                types_f = st.multiselect("Type", TYPES, key="journal_types")
+            with col_a3:
+                imputations_f = st.multiselect("Imputation", IMPUTATIONS, key="journal_imputations")
+                payeurs_f = st.multiselect("Payé par", USERS, key="journal_payeurs")
+                projets_f = st.multiselect("Projet", index.valeurs_distinctes("Projet_Epargne"), key="journal_projets")
+        
+        criteres = {
+            "date_min": periode[0] if len(periode) > 0 else None,
+            "date_max": periode[1] if len(periode) > 1 else None,
+            "montant_min": montant_min,
+            "montant_max": montant_max,
+            "comptes": comptes_f,
+            "types": types_f,
+            "imputations": imputations_f,
+            "payeurs": payeurs_f,
+            "projets": projets_f,
+        }
+        if any(v not in (None, []) for v in criteres.values()) and len(positions):
+            masque = index.masque(**criteres)
+            positions = positions[masque[positions]]
+    
+    # Affichage paginé
+    if len(positions):
+        filtres = (filtre_mois, recherche, mois, annee, repr(sorted(criteres.items())))
+        render_journal(transactions, positions, filtres=filtres)
+    else:
+        st.info("Aucune transaction trouvée.")
+
+
+@st.fragment
+@chronometrer("Opérations · Abonnements")
+def section_abonnements(data: DataStore, user: str, mois: int, annee: int, comptes_visibles: list):
+    """Éditeur d'abonnements et détection automatique"""
+    st.markdown("### Vos abonnements récurrents")
+    
+    col_btn, _ = st.columns([1, 3])
+    with col_btn:
+        if st.button("➕ Nouvel abonnement"):
+            save_row("Abonnements", {
+                "Nom": "Nouvel abonnement",
+                "Montant": 0,
+                "Proprietaire": user,
+                "Jour": 1,
+                "Categorie": "Abonnements",
+                "Imputation": "Perso"
+            })
+            st.rerun()
+
+    # Abonnements détectés automatiquement dans l'historique
+    propositions = detecter_abonnements(data.transactions, data.version, date.today())
+    propositions = propositions[propositions["Proprietaire"] == user]
+    if not data.abonnements.empty and not propositions.empty:
+        connus = set(normaliser_serie(data.abonnements["Nom"]))
+        propositions = propositions[~normaliser_serie(propositions["Nom"]).isin(connus)]
+
+    if not propositions.empty:
+        with st.expander(f"🔍 {len(propositions)} abonnement(s) détecté(s) dans l'historique"):
+            for i, prop in propositions.iterrows():
+                col_p1, col_p2, col_p3 = st.columns([3, 2, 1])
+                col_p1.write(f"**{prop['Nom']}** · {prop['Categorie']}")
+                col_p2.write(f"{prop['Montant']:,.2f} € · {prop['Periodicite'].lower()} · le {prop['Jour']}")
+                if col_p3.button("➕", key=f"add_abo_detecte_{i}", help="Ajouter aux abonnements"):
+                    save_row("Abonnements", {
+                        "Nom": prop["Nom"],
+                        "Montant": prop["Montant"],
+                        "Proprietaire": user,
+                        "Jour": int(prop["Jour"]),
+                        "Categorie": prop["Categorie"],
+                        "Imputation": prop["Imputation"] or "Perso"
+                    })
+                    st.rerun()
+
+    if not data.abonnements.empty:
+        mes_abos = data.abonnements[data.abonnements["Proprietaire"] == user]
         
-        # Filtrage
-        if filtre_mois:
-            df_display = data.get_transactions_mois(mois, annee)
-        else:
-            df_display = data.transactions.copy()
+        total_abos = mes_abos["Montant"].sum()
+        st.metric("Total mensuel", f"{total_abos:,.2f} €")
         
-        if recherche:
-            df_display = df_display[
-                df_display["Titre"].str.contains(recherche, case=False, na=False) |
-                df_display["Categorie"].str.contains(recherche, case=False, na=False)
-            ]
+        st.markdown("---")
         
-        # Affichage
-        if not df_display.empty:
-            df_sorted = df_display.sort_values("Date", ascending=False)
-            
-            for _, row in df_sorted.head(50).iterrows():
-                deleted = render_transaction_item(row, show_delete=True)
-                if deleted:
-                    delete_row("Data", row["id"])
-                    st.rerun()
-        else:
-            st.info("Aucune transaction trouvée.")
-    
-    # === ABONNEMENTS ===
-    with tabs[2]:
-        st.markdown("### Vos abonnements récurrents")
-        
-        col_btn, _ = st.columns([1, 3])
-        with col_btn:
-            if st.button("➕ Nouvel abonnement"):
-                save_row("Abonnements", {
-                    "Nom": "Nouvel abonnement",
-                    "Montant": 0,
-                    "Proprietaire": user,
-                    "Jour": 1,
-                    "Categorie": "Abonnements",
-                    "Imputation": "Perso"
-                })
-                st.rerun()
+        for _, abo in mes_abos.iterrows():
+            with st.expander(f"📅 {abo['Nom']} - {abo['Montant']:.2f} €/mois"):
+                with st.form(f"edit_abo_{abo['id']}"):
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        nom = st.text_input("Nom", value=abo.get("Nom", ""))
+                        montant_abo = st.number_input("Montant", value=float(abo.get("Montant", 0)))
+                    with col2:
+                        jour = st.number_input("Jour du mois", value=int(abo.get("Jour", 1) or 1), min_value=1, max_value=31)
+                        cat_abo = st.selectbox(
+                            "Catégorie",
+                            data.categories.get("Dépense", ["Abonnements"]),
+                            index=0
+                        )
+                    
+                    col_save, col_del = st.columns(2)
+                    with col_save:
+                        if st.form_submit_button("💾 Sauvegarder"):
+                            update_row("Abonnements", abo['id'], {
+                                "Nom": nom,
+                                "Montant": montant_abo,
+                                "Jour": jour,
+                                "Categorie": cat_abo
+                            })
+                            st.rerun()
+                    with col_del:
+                        if st.form_submit_button("🗑️ Supprimer", type="secondary"):
+                            delete_row("Abonnements", abo['id'])
+                            st.rerun()
         
-        if not data.abonnements.empty:
-            mes_abos = data.abonnements[data.abonnements["Proprietaire"] == user]
-            
-            total_abos = mes_abos["Montant"].sum()
-            st.metric("Total mensuel", f"{total_abos:,.2f} €")
-            
-            st.markdown("---")
+        st.markdown("---")
+        
+        if st.button("🚀 Générer les transactions du mois", type="primary", use_container_width=True):
+            df_mois = data.get_transactions_mois(mois, annee)
+            count = 0
             
             for _, abo in mes_abos.iterrows():
-                with st.expander(f"📅 {abo['Nom']} - {abo['Montant']:.2f} €/mois"):
-                    with st.form(f"edit_abo_{abo['id']}"):
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            nom = st.text_input("Nom", value=abo.get("Nom", ""))
-                            montant_abo = st.number_input("Montant", value=float(abo.get("Montant", 0)))
-                        with col2:
-                            jour = st.number_input("Jour du mois", value=int(abo.get("Jour", 1) or 1), min_value=1, max_value=31)
-                            cat_abo = st.selectbox(
-                                "Catégorie",
-                                data.categories.get("Dépense", ["Abonnements"]),
-                                index=0
-                            )
-                        
-                        col_save, col_del = st.columns(2)
-                        with col_save:
-                            if st.form_submit_button("💾 Sauvegarder"):
-                                update_row("Abonnements", abo['id'], {
-                                    "Nom": nom,
-                                    "Montant": montant_abo,
-                                    "Jour": jour,
-                                    "Categorie": cat_abo
-                                })
-                                st.rerun()
-                        with col_del:
-                            if st.form_submit_button("🗑️ Supprimer", type="secondary"):
-                                delete_row("Abonnements", abo['id'])
-                                st.rerun()
-            
-            st.markdown("---")
-            
-            if st.button("🚀 Générer les transactions du mois", type="primary", use_container_width=True):
-                df_mois = data.get_transactions_mois(mois, annee)
-                count = 0
+                # Vérifier si déjà payé
+                existe = not df_mois[
+                    (df_mois["Titre"] == abo["Nom"]) &
+                    (df_mois["Montant"] == abo["Montant"])
+                ].empty
                 
-                for _, abo in mes_abos.iterrows():
-                    # Vérifier si déjà payé
-                    existe = not df_mois[
-                        (df_mois["Titre"] == abo["Nom"]) &
-                        (df_mois["Montant"] == abo["Montant"])
-                    ].empty
+                if not existe:
+                    jour = int(abo.get("Jour", 1) or 1)
+                    jour = min(jour, 28)  # Éviter les erreurs de date
                     
-                    if not existe:
-                        jour = int(abo.get("Jour", 1) or 1)
-                        jour = min(jour, 28)  # Éviter les erreurs de date
-                        
-                        new_row = {
-                            "Date": date(annee, mois, jour),
-                            "Mois": mois,
-                            "Annee": annee,
-                            "Qui_Connecte": user,
-                            "Type": "Dépense",
-                            "Categorie": abo.get("Categorie", "Abonnements"),
-                            "Titre": abo["Nom"],
-                            "Montant": abo["Montant"],
-                            "Paye_Par": user,
-                            "Imputation": abo.get("Imputation", "Perso"),
-                            "Compte_Source": comptes_visibles[0] if comptes_visibles else ""
-                        }
-                        save_row("Data", new_row)
-                        count += 1
-                
-                if count > 0:
-                    st.success(f"✅ {count} transaction(s) générée(s) !")
-                    time.sleep(0.5)
-                    st.rerun()
-                else:
-                    st.info("Tous les abonnements ont déjà été comptabilisés ce mois.")
-        else:
-            st.info("Aucun abonnement configuré.")
+                    new_row = {
+                        "Date": date(annee, mois, jour),
+                        "Mois": mois,
+                        "Annee": annee,
+                        "Qui_Connecte": user,
+                        "Type": "Dépense",
+                        "Categorie": abo.get("Categorie", "Abonnements"),
+                        "Titre": abo["Nom"],
+                        "Montant": abo["Montant"],
+                        "Paye_Par": user,
+                        "Imputation": abo.get("Imputation", "Perso"),
+                        "Compte_Source": comptes_visibles[0] if comptes_visibles else ""
+                    }
+                    save_row("Data", new_row)
+                    count += 1
+            
+            if count > 0:
+                st.toast(f"✅ {count} transaction(s) générée(s) !")
+                st.rerun()
+            else:
+                st.info("Tous les abonnements ont déjà été comptabilisés ce mois.")
+    else:
+        st.info("Aucun abonnement configuré.")
+
+
+@st.fragment
+@chronometrer("Opérations")
+def page_operations(data: DataStore, user: str, mois: int, annee: int, comptes_visibles: list):
+    """Page Opérations (Saisie, Journal, Abonnements)"""
+    
+    tabs = st.tabs(["➕ Saisie rapide", "📋 Journal", "🔄 Abonnements"])
+    
+    with tabs[0]:
+        section_saisie(data, user, comptes_visibles)
+    
+    with tabs[1]:
+        section_journal(data, user, mois, annee, comptes_visibles)
+    
+    with tabs[2]:
+        section_abonnements(data, user, mois, annee, comptes_visibles)
 
 
+@st.fragment
+@chronometrer("Analyses")
 def page_analyses(data: DataStore, user: str, mois: int, annee: int):
     """Page Analyses et graphiques"""
     st.markdown("## 📊 Analyses")
     
-    df_mois = data.get_transactions_mois(mois, annee)
+    totaux = data.agregations.totaux_categories(mois, annee)
     
-    if df_mois.empty:
+    if totaux.empty:
         st.info("Aucune donnée pour ce mois.")
         return
     
     col1, col2 = st.columns(2)
     
+    figures = get_figure_cache()
+    
     with col1:
         st.markdown("### Répartition des dépenses")
         
-        df_dep = df_mois[df_mois["Type"] == "Dépense"].groupby("Categorie")["Montant"].sum().reset_index()
-        
-        if not df_dep.empty:
-            fig = px.pie(
-                df_dep,
-                values="Montant",
-                names="Categorie",
-                hole=0.4,
-                color_discrete_sequence=px.colors.qualitative.Set3
-            )
-            fig.update_traces(textposition='inside', textinfo='percent+label')
-            fig.update_layout(
-                showlegend=False,
-                margin=dict(t=20, b=20, l=20, r=20)
-            )
+        fig = figures.get(("repartition", None, (mois, annee), calculer_version(totaux)),
+                          lambda: construire_figure_repartition(totaux))
+        if fig is not None:
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("Aucune dépense ce mois.")
@@ -1424,45 +4569,9 @@ def page_analyses(data: DataStore, user: str, mois: int, annee: int):
     with col2:
         st.markdown("### Évolution sur 6 mois")
         
-        # Données des 6 derniers mois
-        evolution = []
-        for i in range(6):
-            d = date(annee, mois, 1) - relativedelta(months=i)
-            df_m = data.transactions[
-                (data.transactions["Mois"] == d.month) &
-                (data.transactions["Annee"] == d.year) &
-                (data.transactions["Qui_Connecte"] == user)
-            ]
-            
-            revenus = df_m[df_m["Type"] == "Revenu"]["Montant"].sum()
-            depenses = df_m[df_m["Type"] == "Dépense"]["Montant"].sum()
-            
-            evolution.append({
-                "Mois": f"{MOIS_FR[d.month-1][:3]}",
-                "Revenus": revenus,
-                "Dépenses": depenses
-            })
-        
-        df_evol = pd.DataFrame(evolution[::-1])  # Inverser pour ordre chronologique
-        
-        fig = go.Figure()
-        fig.add_trace(go.Bar(
-            x=df_evol["Mois"],
-            y=df_evol["Revenus"],
-            name="Revenus",
-            marker_color="#10B981"
-        ))
-        fig.add_trace(go.Bar(
-            x=df_evol["Mois"],
-            y=df_evol["Dépenses"],
-            name="Dépenses",
-            marker_color="#EF4444"
-        ))
-        fig.update_layout(
-            barmode='group',
-            margin=dict(t=20, b=20, l=20, r=20),
-            legend=dict(orientation="h", yanchor="bottom", y=1.02)
-        )
+        flux = data.agregations.flux_mensuels(user, mois, annee)
+        fig = figures.get(("evolution", user, (mois, annee), calculer_version(flux)),
+                          lambda: construire_figure_evolution(flux))
         st.plotly_chart(fig, use_container_width=True)
     
     st.markdown("---")
@@ -1470,10 +4579,7 @@ def page_analyses(data: DataStore, user: str, mois: int, annee: int):
     # Tableau détaillé par catégorie
     st.markdown("### Détail par catégorie")
     
-    df_detail = df_mois.groupby(["Type", "Categorie"]).agg({
-        "Montant": ["sum", "count", "mean"]
-    }).reset_index()
-    df_detail.columns = ["Type", "Catégorie", "Total", "Nb", "Moyenne"]
+    df_detail = totaux.rename(columns={"Categorie": "Catégorie"})
     df_detail["Total"] = df_detail["Total"].apply(lambda x: f"{x:,.2f} €")
     df_detail["Moyenne"] = df_detail["Moyenne"].apply(lambda x: f"{x:,.2f} €")
     
@@ -1482,20 +4588,21 @@ def page_analyses(data: DataStore, user: str, mois: int, annee: int):
     # Export
     st.markdown("---")
     
-    col_exp1, col_exp2, _ = st.columns([1, 1, 2])
+    col_exp1, col_exp2, col_exp3, _ = st.columns([1, 1, 1, 1])
     
     with col_exp1:
-        export = ExportManager(data, user, mois, annee)
-        excel_data = export.export_excel()
-        st.download_button(
-            "📥 Télécharger Excel",
-            excel_data,
-            file_name=f"analyse_{MOIS_FR[mois-1]}_{annee}.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            use_container_width=True
-        )
+        render_export_excel(data, user, mois, annee, f"analyse_{MOIS_FR[mois-1]}_{annee}.xlsx",
+                            label="📥 Télécharger Excel", key="export_analyses")
+    
+    with col_exp2:
+        render_export_historique(data, user, mois, annee)
+    
+    with col_exp3:
+        render_export_rapports(data, user, mois, annee)
 
 
+@st.fragment
+@chronometrer("Patrimoine")
 def page_patrimoine(data: DataStore, user: str, comptes_visibles: list):
     """Page Patrimoine et Projets"""
     st.markdown("## 💎 Patrimoine")
@@ -1508,9 +4615,10 @@ def page_patrimoine(data: DataStore, user: str, comptes_visibles: list):
     cols = st.columns(len(comptes_visibles) if comptes_visibles else 1)
     
     total_patrimoine = 0
+    soldes = engine.calculer_soldes(comptes_visibles)
     
     for i, compte in enumerate(comptes_visibles):
-        solde = engine.calculer_solde_compte(compte)
+        solde = soldes[compte]
         total_patrimoine += solde
         type_c = data.type_compte.get(compte, "Courant")
         
@@ -1533,6 +4641,18 @@ def page_patrimoine(data: DataStore, user: str, comptes_visibles: list):
         </div>
     """, unsafe_allow_html=True)
     
+    # === ÉVOLUTION ===
+    st.markdown("### 📈 Évolution du patrimoine")
+    
+    versions = (data.projection("transactions", COLONNES_SOLDES).attrs.get("version", "vide"),
+                data.get_version("patrimoine"), data.get_version("comptes"))
+    fig = get_figure_cache().get(("patrimoine", tuple(comptes_visibles), None, versions),
+                                 lambda: construire_figure_patrimoine(engine.historique_patrimoine(comptes_visibles)))
+    if fig is not None:
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("Pas encore d'historique.")
+    
     st.markdown("---")
     
     # === AJUSTEMENT SOLDE ===
@@ -1565,25 +4685,26 @@ def page_patrimoine(data: DataStore, user: str, comptes_visibles: list):
     st.markdown("### 🎯 Projets d'épargne")
     
     if not data.projets.empty:
-        for _, proj in data.projets.iterrows():
-            nom = proj.get("Projet", "")
-            cible = proj.get("Cible", 0)
-            
-            # Calculer l'épargne
-            epargne = 0
-            if not data.transactions.empty:
-                epargne = data.transactions[
-                    data.transactions["Projet_Epargne"] == nom
-                ]["Montant"].sum()
-            
+        versements = data.projection("transactions", COLONNES_PROJETS)
+        projets = progression_projets(versements, data.projets,
+                                      (versements.attrs.get("version", "vide"), data.get_version("projets")),
+                                      date.today())
+        for proj in projets.itertuples():
             col_p1, col_p2 = st.columns([4, 1])
             
             with col_p1:
-                render_progress_bar(nom, epargne, cible, color="#10B981")
+                render_progress_bar(proj.Projet, proj.Epargne, proj.Cible, color="#10B981")
+                if proj.Epargne >= proj.Cible > 0:
+                    st.caption("✅ Objectif atteint")
+                elif pd.notna(proj.Date_Estimee):
+                    st.caption(f"📈 {proj.Rythme_Mensuel:,.0f} €/mois · objectif estimé en "
+                               f"{MOIS_FR[proj.Date_Estimee.month - 1]} {proj.Date_Estimee.year}")
+                else:
+                    st.caption(f"⏸️ Aucun versement sur les {FENETRE_RYTHME_PROJETS} derniers mois")
             
             with col_p2:
-                if st.button("🗑️", key=f"del_proj_{proj['id']}"):
-                    delete_row("Projets_Config", proj['id'])
+                if st.button("🗑️", key=f"del_proj_{proj.id}"):
+                    delete_row("Projets_Config", proj.id)
                     st.rerun()
     else:
         st.info("Aucun projet d'épargne. Créez-en un ci-dessous !")
@@ -1607,6 +4728,8 @@ def page_patrimoine(data: DataStore, user: str, comptes_visibles: list):
                 st.rerun()
 
 
+@st.fragment
+@chronometrer("Remboursements")
 def page_remboursements(data: DataStore):
     """Page de gestion des remboursements entre personnes"""
     st.markdown("## 🤝 Qui doit quoi ?")
@@ -1614,11 +4737,12 @@ def page_remboursements(data: DataStore):
     # Calcul des avances
     avances = {"Pierre": 0.0, "Elie": 0.0}
     
-    if not data.transactions.empty:
+    transactions = data.projection("transactions", COLONNES_AVANCES)
+    if not transactions.empty:
         for user in USERS:
-            avances[user] = data.transactions[
-                (data.transactions["Paye_Par"] == user) &
-                (data.transactions["Imputation"] == "Avance/Cadeau")
+            avances[user] = transactions[
+                (transactions["Paye_Par"] == user) &
+                (transactions["Imputation"] == "Avance/Cadeau")
             ]["Montant"].sum()
     
     # Calcul des remboursements
@@ -1675,7 +4799,7 @@ def page_remboursements(data: DataStore):
             </div>
         """, unsafe_allow_html=True)
     else:
-        st.markdown(f"""
+        st.markdown("""
             <div style="text-align:center; padding:24px; background:linear-gradient(135deg, #D1FAE5, #A7F3D0); border-radius:16px; border:2px solid #10B981;">
                 <div style="font-size:28px; font-weight:700; color:#065F46;">✅ Tout est équilibré !</div>
             </div>
@@ -1725,6 +4849,8 @@ def page_remboursements(data: DataStore):
             st.rerun()
 
 
+@st.fragment
+@chronometrer("Crédits")
 def page_credits(data: DataStore):
     """Page de suivi des crédits"""
     st.markdown("## 🏦 Crédits en cours")
@@ -1810,6 +4936,8 @@ def page_credits(data: DataStore):
                 st.rerun()
 
 
+@st.fragment
+@chronometrer("Réglages")
 def page_reglages(data: DataStore, user: str):
     """Page de configuration"""
     st.markdown("## ⚙️ Configuration")
@@ -1938,6 +5066,34 @@ def page_reglages(data: DataStore, user: str):
         
         st.markdown("---")
         
+        # Ré-application des règles à tout l'historique
+        col_r1, col_r2 = st.columns([1, 3])
+        with col_r1:
+            if st.button("🔁 Ré-appliquer les règles", help="Prévisualise l'effet des règles sur l'historique"):
+                st.session_state["recat_preview"] = previsualiser_recategorisation(data)
+        
+        diff = st.session_state.get("recat_preview")
+        if diff is not None:
+            if diff.empty:
+                col_r2.info("L'historique est déjà cohérent avec les règles.")
+            else:
+                st.caption(f"{len(diff)} transaction(s) seraient modifiée(s)")
+                st.dataframe(diff, use_container_width=True, hide_index=True)
+                
+                col_a, col_b = st.columns(2)
+                with col_a:
+                    if st.button(f"✅ Appliquer ({len(diff)})", type="primary", use_container_width=True):
+                        nb = appliquer_recategorisation(diff)
+                        del st.session_state["recat_preview"]
+                        st.toast(f"✅ {nb} transaction(s) mise(s) à jour")
+                        st.rerun()
+                with col_b:
+                    if st.button("Annuler", use_container_width=True):
+                        del st.session_state["recat_preview"]
+                        st.rerun()
+        
+        st.markdown("---")
+        
         if not data.mots_cles.empty:
             for _, mc in data.mots_cles.iterrows():
                 col1, col2, col3, col4 = st.columns([2, 2, 2, 1])
@@ -1952,6 +5108,37 @@ def page_reglages(data: DataStore, user: str):
 # ==============================================================================
 # 10. APPLICATION PRINCIPALE
 # ==============================================================================
+@st.fragment
+@chronometrer("Barre latérale · Soldes")
+def render_sidebar_soldes(data: DataStore, user: str, comptes_visibles: list):
+    """Soldes temps réel des comptes visibles"""
+    st.markdown("### 💳 Soldes")
+    
+    engine = FinanceEngine(data, user)
+    
+    total_courant = 0
+    total_epargne = 0
+    soldes = engine.calculer_soldes(comptes_visibles)
+    
+    for compte in comptes_visibles:
+        solde = soldes[compte]
+        is_epargne = data.type_compte.get(compte) == "Épargne"
+        
+        if is_epargne:
+            total_epargne += solde
+        else:
+            total_courant += solde
+        
+        render_account_card(compte, solde, is_epargne)
+    
+    st.markdown(f"""
+        <div style="padding:12px; margin-top:12px; background:rgba(255,255,255,0.05); border-radius:8px; text-align:center;">
+            <span style="color:#9CA3AF; font-size:12px;">Courant: {total_courant:,.0f}€ · Épargne: {total_epargne:,.0f}€</span>
+        </div>
+    """, unsafe_allow_html=True)
+
+
+@chronometrer("Run complet")
 def main():
     st.set_page_config(
         page_title=APP_NAME,
@@ -1972,79 +5159,67 @@ def main():
         
         st.markdown("---")
         
-        # Sélecteur utilisateur
-        user = st.selectbox("👤 Utilisateur", USERS)
+        # Navigation : seule la page active est calculée
+        page_active = st.radio("Navigation", PAGES, key="page_active", label_visibility="collapsed")
+        
+        st.markdown("---")
+        
+        # Sélecteur utilisateur (les clés conservent les choix d'une page à l'autre)
+        user = st.selectbox("👤 Utilisateur", USERS, key="user")
         
         # Sélecteurs date
         d_now = datetime.now()
-        mois_nom = st.selectbox("📅 Mois", MOIS_FR, index=d_now.month - 1)
+        mois_nom = st.selectbox("📅 Mois", MOIS_FR, index=d_now.month - 1, key="mois_nom")
         mois = MOIS_FR.index(mois_nom) + 1
-        annee = st.number_input("Année", value=d_now.year, min_value=2020, max_value=2030)
+        annee = st.number_input("Année", value=d_now.year, min_value=2020, max_value=2030, key="annee")
         
         st.markdown("---")
         
-        # Soldes des comptes
-        st.markdown("### 💳 Soldes")
-        
+        # Soldes des comptes (projection des transactions, sauf si la page lit la table complète)
+        if page_active in PAGES_TRANSACTIONS_COMPLETES and data.agregations.locale:
+            data.precharger("transactions")
         comptes_visibles = data.get_comptes_visibles(user)
-        engine = FinanceEngine(data, user)
-        
-        total_courant = 0
-        total_epargne = 0
-        
-        for compte in comptes_visibles:
-            solde = engine.calculer_solde_compte(compte)
-            is_epargne = data.type_compte.get(compte) == "Épargne"
-            
-            if is_epargne:
-                total_epargne += solde
-            else:
-                total_courant += solde
-            
-            render_account_card(compte, solde, is_epargne)
-        
-        st.markdown(f"""
-            <div style="padding:12px; margin-top:12px; background:rgba(255,255,255,0.05); border-radius:8px; text-align:center;">
-                <span style="color:#9CA3AF; font-size:12px;">Courant: {total_courant:,.0f}€ · Épargne: {total_epargne:,.0f}€</span>
-            </div>
-        """, unsafe_allow_html=True)
+        render_sidebar_soldes(data, user, comptes_visibles)
         
         st.markdown("---")
         
         if st.button("🔄 Actualiser", use_container_width=True):
             st.cache_data.clear()
+            get_tables_partagees().vider()
+            if get_db():
+                get_db().disjoncteur.succes()  # Nouvel essai immédiat
             st.rerun()
+        
+        # Supabase injoignable : dernières tables chargées servies
+        perimees = get_tables_partagees().perimees
+        if perimees:
+            st.warning(f"🔌 Supabase injoignable : données du {min(perimees.values()):%d/%m %H:%M} "
+                       f"({', '.join(sorted(perimees))})")
+        
+        # Écritures pas encore envoyées à Supabase (coupure réseau, Supabase lent)
+        file = get_file_ecritures()
+        etat = file.etat() if file is not None else {"en_attente": 0}
+        if etat["en_attente"]:
+            st.caption(f"⏳ {etat['en_attente']} écriture(s) en attente d'envoi"
+                       + (f" · {etat['erreur']}" if etat["erreur"] else ""))
+        render_ecritures_rejetees(file)
+        
+        render_profilage()
     
     # === CONTENU PRINCIPAL ===
-    tabs = st.tabs([
-        "🏠 Accueil",
-        "💳 Opérations",
-        "📊 Analyses",
-        "💎 Patrimoine",
-        "🤝 Remboursements",
-        "🏦 Crédits",
-        "⚙️ Réglages"
-    ])
-    
-    with tabs[0]:
+    if page_active == "🏠 Accueil":
         page_accueil(data, user, mois, annee)
-    
-    with tabs[1]:
+    elif page_active == "💳 Opérations":
         page_operations(data, user, mois, annee, comptes_visibles)
-    
-    with tabs[2]:
+    elif page_active == "📊 Analyses":
         page_analyses(data, user, mois, annee)
-    
-    with tabs[3]:
+    elif page_active == "💎 Patrimoine":
         page_patrimoine(data, user, comptes_visibles)
-    
-    with tabs[4]:
+    elif page_active == "🤝 Remboursements":
         page_remboursements(data)
-    
-    with tabs[5]:
+    elif page_active == "🏦 Crédits":
         page_credits(data)
-    
-    with tabs[6]:
+    elif page_active == "⚙️ Réglages":
         page_reglages(data, user)
 
 
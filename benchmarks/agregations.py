@@ -0,0 +1,125 @@
+"""
+Agrégations locales (pandas) contre agrégations SQL (RPC)
+=========================================================
+Vérifie que les fonctions SQL d'agrégation (sql/agregations.sql, exécutées
+ici par leur équivalent SQLite via le client Supabase local) donnent les
+mêmes résultats que le calcul pandas, et compare durées et octets transférés.
+
+Depuis la racine du dépôt :
+    python -m benchmarks.agregations --transactions 100000 --comptes 10
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+import streamlit.logger
+
+streamlit.logger.set_log_level("error")
+
+import app  # noqa: E402
+from benchmarks.bench import DOSSIER_RESULTATS, charger, commit_courant  # noqa: E402
+from benchmarks.generateur import FIN_DEFAUT, generer_tables  # noqa: E402
+
+TOLERANCE = 0.01  # Écart max toléré (€), arrondis flottants
+
+
+def ecart(a: pd.DataFrame, b: pd.DataFrame, cles: list) -> float:
+    """Plus grand écart absolu entre deux tableaux d'agrégats alignés sur leurs clés (inf si clés différentes)"""
+    a, b = a.set_index(cles).sort_index(), b.set_index(cles).sort_index()
+    if not a.index.equals(b.index):
+        return float("inf")
+    return float(np.abs(a.to_numpy(float) - b.to_numpy(float)).max(initial=0.0))
+
+
+def chronometrer(func) -> tuple:
+    """(résultat, durée en ms) d'un appel à froid"""
+    st.cache_data.clear()
+    debut = time.perf_counter()
+    resultat = func()
+    return resultat, (time.perf_counter() - debut) * 1000
+
+
+def comparer(brutes: dict, user: str, mois: int, annee: int) -> dict:
+    """Chaque agrégation par les deux implémentations : écart, durées, octets"""
+    data = charger(brutes)
+    locales = app.AgregationsPandas(data)
+    client = app.FakeSupabaseClient({nom: df.to_dict("records") for nom, df in brutes.items()})
+    comptes = data.comptes["Compte"].tolist()
+
+    appels = {
+        "soldes": (
+            lambda: pd.Series(locales.soldes(comptes)).rename_axis("Compte").reset_index(name="Solde"),
+            ("budget_soldes", {"p_comptes": comptes}), ["Compte"],
+        ),
+        "totaux_categories": (
+            lambda: locales.totaux_categories(mois, annee),
+            ("budget_totaux_categories", {"p_mois": mois, "p_annee": annee}), ["Type", "Categorie"],
+        ),
+        "flux_mensuels": (
+            lambda: locales.flux_mensuels(user, mois, annee, 12),
+            ("budget_flux_mensuels", {"p_utilisateur": user, "p_mois": mois, "p_annee": annee, "p_nb_mois": 12}),
+            ["Annee", "Mois"],
+        ),
+    }
+    octets_table = app.taille_json(brutes["Data"].to_dict("records"))
+
+    resultats = {}
+    for nom, (local, (fonction, params), cles) in appels.items():
+        attendu, ms_local = chronometrer(local)
+        lignes, ms_sql = chronometrer(lambda: client.rpc(fonction, params).execute().data)
+        obtenu = pd.DataFrame(lignes, columns=attendu.columns)
+        if nom == "flux_mensuels":
+            obtenu = app.Agregations._completer_mois(obtenu, mois, annee, 12)
+        resultats[nom] = {
+            "ecart": ecart(attendu, obtenu, cles),
+            "lignes": len(lignes),
+            "octets_rpc": app.taille_json(lignes),
+            "octets_table": octets_table,
+            "ms_pandas": round(ms_local, 1),
+            "ms_sqlite": round(ms_sql, 1),
+        }
+        r = resultats[nom]
+        statut = "ok" if r["ecart"] <= TOLERANCE else "ÉCART"
+        print(f"  {nom:<18} {statut:<5} écart {r['ecart']:.4f} · {r['lignes']:>3} lignes, "
+              f"{r['octets_rpc'] / 1024:,.1f} Ko (table : {octets_table / 1024:,.0f} Ko) · "
+              f"pandas {ms_local:,.0f} ms, sqlite {ms_sql:,.0f} ms", flush=True)
+    return resultats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agrégations pandas contre SQL (client local)")
+    parser.add_argument("--transactions", type=int, default=10_000)
+    parser.add_argument("--comptes", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--sortie", help="Fichier JSON (défaut : benchmarks/resultats/agregations_<date>_<commit>.json)")
+    args = parser.parse_args()
+
+    print(f"{args.transactions:,} transactions, {args.comptes} comptes", flush=True)
+    brutes = generer_tables(args.transactions, args.comptes, args.seed)
+    resultats = comparer(brutes, app.USERS[0], FIN_DEFAUT.month, FIN_DEFAUT.year)
+    rapport = {
+        "commit": commit_courant(),
+        "horodatage": datetime.now().isoformat(timespec="seconds"),
+        "transactions": args.transactions,
+        "resultats": resultats,
+    }
+
+    sortie = args.sortie or os.path.join(
+        DOSSIER_RESULTATS, f"agregations_{datetime.now():%Y%m%d_%H%M%S}_{rapport['commit']}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(sortie)), exist_ok=True)
+    with open(sortie, "w", encoding="utf-8") as f:
+        json.dump(rapport, f, ensure_ascii=False, indent=2)
+    print(f"\nRésultats : {sortie}")
+    return 0 if all(r["ecart"] <= TOLERANCE for r in resultats.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
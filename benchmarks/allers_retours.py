@@ -0,0 +1,151 @@
+"""
+Allers-retours Supabase par page et par écriture
+================================================
+Lance l'application avec le client Supabase local (FakeSupabaseClient,
+latence simulée) et relève, pour chaque page puis pour la saisie d'une
+transaction, le nombre de requêtes, de lignes et d'octets échangés.
+Chaque page est mesurée à froid (caches vidés) puis à chaud (rerun).
+
+Depuis la racine du dépôt :
+    python -m benchmarks.allers_retours --transactions 5000 --latence 30
+    python -m benchmarks.allers_retours --agregations supabase
+    python -m benchmarks.allers_retours --echecs 0.1
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import streamlit as st
+import streamlit.logger
+
+streamlit.logger.set_log_level("error")
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import app  # noqa: E402
+from benchmarks.bench import DOSSIER_RESULTATS, commit_courant  # noqa: E402
+from benchmarks.generateur import generer_tables  # noqa: E402
+
+CHEMIN_APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+def compteurs_session(at: AppTest) -> dict:
+    """Copie des compteurs réseau cumulés de la session"""
+    if "reseau_session" not in at.session_state:
+        return {}
+    return {cle: dict(c) for cle, c in at.session_state["reseau_session"].items()}
+
+
+def resume(at: AppTest, avant: dict) -> dict:
+    """Compteurs réseau du dernier at.run() (tous passages confondus, reruns inclus), agrégés"""
+    requetes = {}
+    for cle, c in compteurs_session(at).items():
+        delta = {k: v - avant.get(cle, {}).get(k, 0) for k, v in c.items()}
+        if delta["requetes"] or delta.get("echecs"):
+            requetes[cle] = delta
+    return {
+        "requetes": sum(r["requetes"] for r in requetes.values()),
+        "lignes": sum(r["lignes"] for r in requetes.values()),
+        "octets": sum(r["octets"] for r in requetes.values()),
+        "echecs": sum(r.get("echecs", 0) for r in requetes.values()),
+        "detail": {cle: r["requetes"] for cle, r in sorted(requetes.items())},
+    }
+
+
+def lancer(at: AppTest) -> tuple:
+    """Un rerun chronométré ; échoue si l'application lève une exception"""
+    avant = compteurs_session(at)
+    debut = time.perf_counter()
+    at.run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return (time.perf_counter() - debut) * 1000, resume(at, avant)
+
+
+def mesurer_pages(timeout: int) -> dict:
+    """Chaque page à froid puis à chaud"""
+    resultats = {}
+    for page in app.PAGES:
+        st.cache_data.clear()
+        st.cache_resource.clear()
+        at = AppTest.from_file(CHEMIN_APP, default_timeout=timeout)
+        at.session_state["page_active"] = page
+        ms_froid, froid = lancer(at)
+        ms_chaud, chaud = lancer(at)
+        resultats[page] = {"froid": {**froid, "ms": round(ms_froid, 1)}, "chaud": {**chaud, "ms": round(ms_chaud, 1)}}
+        print(f"  {page:<20} froid {froid['requetes']:>3} req. {ms_froid:>8,.0f} ms · "
+              f"chaud {chaud['requetes']:>3} req. {ms_chaud:>8,.0f} ms"
+              + (f" · {froid['echecs'] + chaud['echecs']} échec(s)" if froid["echecs"] + chaud["echecs"] else ""),
+              flush=True)
+    return resultats
+
+
+def mesurer_saisie(timeout: int) -> dict:
+    """Saisie d'une dépense depuis le formulaire Opérations, rerun qui suit compris"""
+    at = AppTest.from_file(CHEMIN_APP, default_timeout=timeout)
+    at.session_state["page_active"] = "💳 Opérations"
+    lancer(at)
+
+    [w for w in at.text_input if w.label == "Titre"][0].set_value("Benchmark")
+    [w for w in at.number_input if w.label == "Montant (€)"][0].set_value(12.5)
+    [b for b in at.button if b.label == "💾 Enregistrer"][0].click()
+    ms, ecriture = lancer(at)
+    print(f"  {'Saisie':<20} {ecriture['requetes']:>3} req. {ms:>8,.0f} ms", flush=True)
+    return {**ecriture, "ms": round(ms, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Allers-retours Supabase par page (client local)")
+    parser.add_argument("--transactions", type=int, default=5_000)
+    parser.add_argument("--comptes", type=int, default=5)
+    parser.add_argument("--latence", type=float, default=20.0, help="Latence simulée par requête (ms)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--agregations", choices=["pandas", "supabase"], default="pandas",
+                        help="Agrégations locales ou par les fonctions RPC (servies par SQLite)")
+    parser.add_argument("--echecs", type=float, default=0.0,
+                        help="Part des requêtes en échec réseau simulé (relancées par le client)")
+    parser.add_argument("--timeout", type=int, default=300, help="Délai max d'un rerun (s)")
+    parser.add_argument("--sortie", help="Fichier JSON (défaut : benchmarks/resultats/allers_retours_<date>_<commit>.json)")
+    args = parser.parse_args()
+
+    tables = generer_tables(args.transactions, args.comptes, args.seed)
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False, encoding="utf-8") as f:
+        json.dump({nom: df.to_dict("records") for nom, df in tables.items()}, f, default=str)
+        chemin_tables = f.name
+    os.environ[app.FAKE_SUPABASE_ENV] = chemin_tables
+    os.environ[app.FAKE_LATENCE_ENV] = str(args.latence)
+    os.environ[app.AGREGATIONS_ENV] = args.agregations
+    os.environ[app.FAKE_ECHECS_ENV] = str(args.echecs)
+    os.environ[app.PROFILAGE_ENV] = "1"  # Les octets ne sont mesurés qu'en profilage
+
+    try:
+        print(f"{args.transactions:,} transactions, latence {args.latence:g} ms, "
+              f"agrégations {args.agregations}, échecs {args.echecs:.0%}", flush=True)
+        rapport = {
+            "commit": commit_courant(),
+            "horodatage": datetime.now().isoformat(timespec="seconds"),
+            "transactions": args.transactions,
+            "latence_ms": args.latence,
+            "agregations": args.agregations,
+            "echecs": args.echecs,
+            "pages": mesurer_pages(args.timeout),
+            "ecritures": {"saisie": mesurer_saisie(args.timeout)},
+        }
+    finally:
+        os.remove(chemin_tables)
+
+    sortie = args.sortie or os.path.join(
+        DOSSIER_RESULTATS, f"allers_retours_{datetime.now():%Y%m%d_%H%M%S}_{rapport['commit']}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(sortie)), exist_ok=True)
+    with open(sortie, "w", encoding="utf-8") as f:
+        json.dump(rapport, f, ensure_ascii=False, indent=2)
+    print(f"\nRésultats : {sortie}")
+
+
+if __name__ == "__main__":
+    main()
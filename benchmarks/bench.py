@@ -0,0 +1,156 @@
+"""
+Benchmarks des traitements de l'application
+===========================================
+Chronomètre, sur des données synthétiques (benchmarks/generateur.py), les
+traitements coûteux d'un rerun : nettoyage des tables, soldes, reste à vivre,
+assistant, export Excel et recherche du journal. Les caches Streamlit sont
+vidés avant chaque mesure (temps « à froid »).
+
+Depuis la racine du dépôt :
+    python -m benchmarks.bench --tailles 1000,100000 --comptes 5
+    python -m benchmarks.bench --comparer avant.json apres.json
+
+Les résultats sont écrits en JSON (un fichier par exécution, nommé d'après
+le commit courant) pour comparer les commits entre eux.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+import streamlit.logger
+
+# Hors `streamlit run`, Streamlit avertit à chaque fonction en cache : avant d'importer app
+streamlit.logger.set_log_level("error")
+
+import app  # noqa: E402
+from benchmarks.generateur import FIN_DEFAUT, generer_tables  # noqa: E402
+
+DOSSIER_RESULTATS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultats")
+TAILLES_DEFAUT = [1_000, 10_000, 100_000]
+REQUETES_RECHERCHE = ["carrefour", "sncf", "abonnements netflix", "loyer"]
+
+
+def commit_courant() -> str:
+    """Hash court du commit courant (« inconnu » hors dépôt git)"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "inconnu"
+
+
+def chronometrer(func, repetitions: int) -> dict:
+    """Exécute func à froid (caches vidés) et retourne min / médiane en ms"""
+    durees = []
+    for _ in range(repetitions):
+        st.cache_data.clear()
+        st.cache_resource.clear()
+        debut = time.perf_counter()
+        func()
+        durees.append((time.perf_counter() - debut) * 1000)
+    return {"min_ms": round(min(durees), 3), "mediane_ms": round(statistics.median(durees), 3)}
+
+
+def charger(brutes: dict) -> app.DataStore:
+    """DataStore alimenté par les tables synthétiques nettoyées (sans Supabase)"""
+    return app.DataStore({
+        nom: app.nettoyer_table(brutes[table].copy()) for nom, table in app.DataStore.TABLES.items()
+    })
+
+
+def mesurer_taille(n: int, n_comptes: int, seed: int, repetitions: int) -> dict:
+    """Toutes les mesures pour une taille d'historique"""
+    brutes = generer_tables(n, n_comptes, seed)
+    data = charger(brutes)
+    user, mois, annee = app.USERS[0], FIN_DEFAUT.month, FIN_DEFAUT.year
+    comptes = data.comptes["Compte"].tolist()
+    engine = app.FinanceEngine(data, user)
+    index = app.SearchIndex(data.transactions)
+
+    mesures = {
+        "nettoyer_table(Data)": lambda: app.nettoyer_table(brutes["Data"].copy()),
+        "calculer_solde_compte (tous les comptes)": lambda: [engine.calculer_solde_compte(c) for c in comptes],
+        "calculer_reste_a_vivre": lambda: engine.calculer_reste_a_vivre(mois, annee),
+        "SmartAssistant.analyser": lambda: app.SmartAssistant(data, user, mois, annee).analyser(),
+        "ExportManager.export_excel": lambda: app.ExportManager(data, user, mois, annee).export_excel(),
+        "SearchIndex (construction)": lambda: app.SearchIndex(data.transactions),
+        "SearchIndex.search": lambda: [index.search(q) for q in REQUETES_RECHERCHE],
+    }
+
+    resultats = {}
+    for nom, func in mesures.items():
+        resultats[nom] = chronometrer(func, repetitions)
+        print(f"  {nom:<45} {resultats[nom]['mediane_ms']:>12,.1f} ms", flush=True)
+    return {"transactions": len(data.transactions), "comptes": len(comptes), "mesures": resultats}
+
+
+def comparer(avant: str, apres: str):
+    """Affiche le rapport des médianes entre deux fichiers de résultats"""
+    with open(avant, encoding="utf-8") as f:
+        a = json.load(f)
+    with open(apres, encoding="utf-8") as f:
+        b = json.load(f)
+
+    print(f"{a['commit']} → {b['commit']}")
+    for taille, res_b in b["resultats"].items():
+        res_a = a["resultats"].get(taille)
+        if res_a is None:
+            continue
+        print(f"\n{taille} transactions")
+        for nom, m in res_b["mesures"].items():
+            if nom in res_a["mesures"]:
+                ref = res_a["mesures"][nom]["mediane_ms"]
+                ratio = m["mediane_ms"] / ref if ref else float("nan")
+                print(f"  {nom:<45} {ref:>10,.1f} → {m['mediane_ms']:>10,.1f} ms  (x{ratio:.2f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks sur données synthétiques")
+    parser.add_argument("--tailles", default=",".join(map(str, TAILLES_DEFAUT)),
+                        help="Nombres de transactions, séparés par des virgules (1000 → 1000000)")
+    parser.add_argument("--comptes", type=int, default=5, help="Nombre de comptes (1 → 50)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repetitions", type=int, default=3)
+    parser.add_argument("--sortie", help="Fichier JSON (défaut : benchmarks/resultats/<date>_<commit>.json)")
+    parser.add_argument("--comparer", nargs=2, metavar=("AVANT", "APRES"), help="Compare deux fichiers de résultats")
+    args = parser.parse_args()
+
+    if args.comparer:
+        comparer(*args.comparer)
+        return
+
+    commit = commit_courant()
+    rapport = {
+        "commit": commit,
+        "horodatage": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "seed": args.seed,
+        "repetitions": args.repetitions,
+        "resultats": {},
+    }
+    for n in [int(t) for t in args.tailles.split(",")]:
+        print(f"{n:,} transactions, {args.comptes} comptes", flush=True)
+        rapport["resultats"][str(n)] = mesurer_taille(n, args.comptes, args.seed, args.repetitions)
+
+    sortie = args.sortie or os.path.join(
+        DOSSIER_RESULTATS, f"{datetime.now():%Y%m%d_%H%M%S}_{commit}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(sortie)), exist_ok=True)
+    with open(sortie, "w", encoding="utf-8") as f:
+        json.dump(rapport, f, ensure_ascii=False, indent=2)
+    print(f"\nRésultats : {sortie}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+Générateur de données synthétiques pour les benchmarks
+======================================================
+Produit des tables au format brut renvoyé par Supabase (dates et montants en
+texte, montants parfois au format français) pour un foyer de deux personnes :
+Data, Patrimoine, Config, Comptes, Abonnements, Objectifs, Projets_Config,
+Mots_Cles et Credits, plus la table Versions (détection des changements).
+Même graine → mêmes tables.
+"""
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from app import USERS
+
+# Catégories et enseignes par type d'opération
+CATEGORIES = {
+    "Dépense": {
+        "Alimentation": ["Carrefour", "Leclerc", "Lidl", "Monoprix", "Biocoop", "Boulangerie Paul"],
+        "Restaurants": ["Restaurant Le Zinc", "Deliveroo", "Uber Eats", "Brasserie Flo", "Sushi Shop"],
+        "Transport": ["SNCF", "Total Energies", "RATP Navigo", "Autoroute APRR", "Blablacar"],
+        "Logement": ["Loyer", "EDF", "Engie", "Free Box", "Assurance habitation"],
+        "Santé": ["Pharmacie", "Médecin", "Mutuelle", "Dentiste"],
+        "Loisirs": ["Fnac", "Cinéma UGC", "Decathlon", "Spotify", "Netflix"],
+        "Shopping": ["Amazon", "Zara", "Ikea", "Leroy Merlin", "Darty"],
+        "Abonnements": ["Netflix", "Spotify", "Canal+", "Salle de sport", "Forfait mobile"],
+    },
+    "Revenu": {"Salaire": ["Salaire"], "Primes": ["Prime annuelle"], "Remboursements": ["CPAM", "Remboursement ami"]},
+    "Virement Interne": {"Virement": ["Virement compte joint", "Virement interne"]},
+    "Épargne": {"Épargne": ["Versement livret", "Épargne mensuelle"]},
+    "Investissement": {"Bourse": ["Achat ETF", "Versement PEA"], "Crypto": ["Achat BTC"]},
+}
+PROPORTIONS_TYPES = {"Dépense": 0.78, "Revenu": 0.06, "Virement Interne": 0.07, "Épargne": 0.06, "Investissement": 0.03}
+MONTANTS_TYPES = {  # (moyenne log, écart-type log)
+    "Dépense": (3.3, 0.9), "Revenu": (7.6, 0.3), "Virement Interne": (5.5, 0.6),
+    "Épargne": (5.0, 0.7), "Investissement": (5.3, 0.8),
+}
+IMPUTATIONS = (["Perso", "Commun (50/50)", "Commun (Autre %)", "Avance/Cadeau"], [0.6, 0.3, 0.08, 0.02])
+PROJETS = [("Vacances", 3000), ("Voiture", 15000), ("Apport maison", 40000)]
+ABONNEMENTS = [("Netflix", 13.49, 5), ("Spotify", 10.99, 12), ("Forfait mobile", 19.99, 8),
+               ("Salle de sport", 34.90, 1), ("Canal+", 25.99, 20)]
+FIN_DEFAUT = date(2025, 12, 31)  # Date de fin fixe : les tables ne dépendent que de la graine
+
+
+def montant_brut(valeurs: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Montants en texte ; une partie au format français (virgule décimale, espace des milliers)"""
+    texte = np.char.mod("%.2f", valeurs).astype(object)
+    francais = rng.random(len(valeurs)) < 0.2
+    texte[francais] = [f"{v:,.2f}".replace(",", " ").replace(".", ",") for v in valeurs[francais]]
+    return texte
+
+
+def generer_comptes(n_comptes: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Comptes courants et d'épargne répartis entre les deux personnes et le commun"""
+    proprietaires = (USERS + ["Commun"]) * (n_comptes // 3 + 1)
+    types = ["Courant" if i % 3 != 2 else "Épargne" for i in range(n_comptes)]
+    return pd.DataFrame({
+        "id": np.arange(1, n_comptes + 1),
+        "Compte": [f"{'Livret' if t == 'Épargne' else 'Compte'} {i + 1:02d}" for i, t in enumerate(types)],
+        "Proprietaire": proprietaires[:n_comptes],
+        "Type": types,
+    })
+
+
+def generer_transactions(n: int, comptes: pd.DataFrame, rng: np.random.Generator,
+                         fin: date, annees: int = 5) -> pd.DataFrame:
+    """Transactions réparties uniformément sur les dernières années, abonnements mensuels inclus"""
+    types = rng.choice(list(PROPORTIONS_TYPES), n, p=list(PROPORTIONS_TYPES.values()))
+    debut = pd.Timestamp(fin) - pd.DateOffset(years=annees)
+    dates = debut + pd.to_timedelta(rng.integers(0, (pd.Timestamp(fin) - debut).days + 1, n), unit="D")
+
+    categories = np.empty(n, dtype=object)
+    titres = np.empty(n, dtype=object)
+    montants = np.empty(n)
+    for t in PROPORTIONS_TYPES:
+        idx = np.flatnonzero(types == t)
+        noms = list(CATEGORIES[t])
+        cats = rng.choice(noms, len(idx))
+        categories[idx] = cats
+        for c in noms:
+            sous = idx[cats == c]
+            enseignes = np.array(CATEGORIES[t][c], dtype=object)
+            titres[sous] = enseignes[rng.integers(0, len(enseignes), len(sous))]
+        moyenne, ecart = MONTANTS_TYPES[t]
+        montants[idx] = np.round(rng.lognormal(moyenne, ecart, len(idx)), 2)
+
+    # Références variables dans une partie des libellés (comme sur un relevé)
+    suffixe = rng.random(n) < 0.3
+    titres[suffixe] = [f"{t} {r:06d}" for t, r in zip(titres[suffixe], rng.integers(0, 10**6, suffixe.sum()))]
+
+    courants = comptes.loc[comptes["Type"] == "Courant", "Compte"].to_numpy()
+    epargnes = comptes.loc[comptes["Type"] == "Épargne", "Compte"].to_numpy()
+    if len(epargnes) == 0:
+        epargnes = courants
+
+    qui = rng.choice(USERS, n)
+    imputations = np.where(types == "Dépense", rng.choice(IMPUTATIONS[0], n, p=IMPUTATIONS[1]), "Perso")
+    vers_epargne = np.isin(types, ["Virement Interne", "Épargne"])
+    cibles = np.where(vers_epargne, epargnes[rng.integers(0, len(epargnes), n)], "")
+    projets = np.where((types == "Épargne") & (rng.random(n) < 0.4),
+                       np.array([p for p, _ in PROJETS])[rng.integers(0, len(PROJETS), n)], "")
+
+    df = pd.DataFrame({
+        "Date": dates.strftime("%Y-%m-%d"),
+        "Mois": dates.month,
+        "Annee": dates.year,
+        "Qui_Connecte": qui,
+        "Type": types,
+        "Categorie": categories,
+        "Titre": titres,
+        "Montant": montants,
+        "Paye_Par": np.where(rng.random(n) < 0.8, qui, rng.choice(USERS, n)),
+        "Imputation": imputations,
+        "Pourcentage_Perso": np.where(imputations == "Commun (Autre %)", rng.choice([30, 40, 60, 70], n), 50),
+        "Compte_Source": courants[rng.integers(0, len(courants), n)],
+        "Compte_Cible": cibles,
+        "Projet_Epargne": projets,
+    })
+
+    # Abonnements : un prélèvement par mois au même jour
+    mois = pd.date_range(debut, fin, freq="MS")
+    recurrents = pd.concat([
+        pd.DataFrame({
+            "Date": (mois + pd.Timedelta(days=jour - 1)).strftime("%Y-%m-%d"),
+            "Mois": mois.month, "Annee": mois.year, "Qui_Connecte": USERS[i % 2], "Type": "Dépense",
+            "Categorie": "Abonnements", "Titre": nom, "Montant": montant, "Paye_Par": USERS[i % 2],
+            "Imputation": "Perso", "Pourcentage_Perso": 50, "Compte_Source": courants[i % len(courants)],
+            "Compte_Cible": "", "Projet_Epargne": "",
+        })
+        for i, (nom, montant, jour) in enumerate(ABONNEMENTS)
+    ], ignore_index=True)
+
+    df = pd.concat([df, recurrents], ignore_index=True).sort_values("Date", kind="stable", ignore_index=True)
+    df.insert(0, "id", np.arange(1, len(df) + 1))
+    df["Montant"] = montant_brut(df["Montant"].to_numpy(), rng)
+    return df
+
+
+def generer_tables(n_transactions: int = 10_000, n_comptes: int = 5, seed: int = 42,
+                   fin: date = None) -> dict:
+    """Toutes les tables brutes, indexées par leur nom Supabase"""
+    rng = np.random.default_rng(seed)
+    fin = fin or FIN_DEFAUT
+    comptes = generer_comptes(max(1, n_comptes), rng)
+
+    config = pd.DataFrame(
+        [{"Type": t, "Categorie": c} for t, cats in CATEGORIES.items() for c in cats]
+    )
+    config.insert(0, "id", np.arange(1, len(config) + 1))
+
+    patrimoine = pd.DataFrame([
+        {"Date": f"{fin.year - k}-01-01", "Compte": c, "Montant": f"{rng.uniform(500, 20000):.2f}",
+         "Proprietaire": p}
+        for k in range(3) for c, p in zip(comptes["Compte"], comptes["Proprietaire"])
+    ])
+    patrimoine.insert(0, "id", np.arange(1, len(patrimoine) + 1))
+
+    depenses = list(CATEGORIES["Dépense"])
+    objectifs = pd.DataFrame({
+        "id": np.arange(1, len(depenses) + 1),
+        "Categorie": depenses,
+        "Montant": [f"{v:.0f}" for v in rng.uniform(50, 600, len(depenses))],
+        "Scope": rng.choice(["Perso"] + USERS, len(depenses)),
+    })
+
+    abonnements = pd.DataFrame([
+        {"id": i + 1, "Nom": nom, "Montant": f"{montant:.2f}", "Proprietaire": USERS[i % 2], "Jour": jour,
+         "Categorie": "Abonnements", "Imputation": "Perso"}
+        for i, (nom, montant, jour) in enumerate(ABONNEMENTS)
+    ])
+
+    mots_cles = pd.DataFrame([
+        {"Mot_Cle": enseigne.lower(), "Categorie": cat, "Compte": comptes["Compte"].iloc[0]}
+        for cat, enseignes in CATEGORIES["Dépense"].items() for enseigne in enseignes
+    ]).drop_duplicates("Mot_Cle", ignore_index=True)
+    mots_cles.insert(0, "id", np.arange(1, len(mots_cles) + 1))
+
+    tables = {
+        "Data": generer_transactions(n_transactions, comptes, rng, fin),
+        "Patrimoine": patrimoine,
+        "Config": config,
+        "Comptes": comptes,
+        "Objectifs": objectifs,
+        "Abonnements": abonnements,
+        "Projets_Config": pd.DataFrame(
+            [{"id": i + 1, "Projet": p, "Cible": str(c), "Proprietaire": "Commun"} for i, (p, c) in enumerate(PROJETS)]
+        ),
+        "Mots_Cles": mots_cles,
+        "Remboursements": pd.DataFrame(columns=["id", "Date", "De", "A", "Montant"]),
+        "Credits": pd.DataFrame([
+            {"id": 1, "Nom": "Prêt auto", "Organisme": "Banque", "Montant_Initial": "15000",
+             "Montant_Restant": "8200,50", "Mensualite": "310"},
+            {"id": 2, "Nom": "Prêt immobilier", "Organisme": "Crédit Mutuel", "Montant_Initial": "220000",
+             "Montant_Restant": "187 430,12", "Mensualite": "1 050"},
+        ]),
+    }
+    tables["Versions"] = pd.DataFrame({"Table": list(tables), "Version": 1})
+    return tables
@@ -0,0 +1,84 @@
+"""
+Rapports PDF mensuels
+=====================
+Mise en page des rapports (reportlab), séparée de app.py : ce module n'importe
+pas streamlit, les processus du pool de rendu (spawn/forkserver) ne chargent
+que lui.
+"""
+
+from io import BytesIO
+
+
+def generer_pdf_rapport(rapport: dict, app_name: str, couleurs: dict) -> bytes:
+    """Met en page un rapport mensuel (données de ExportManager.generate_report_data) en PDF"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+    
+    styles = getSampleStyleSheet()
+    style_tableau = TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor(couleurs["primary"])),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("ALIGN", (-1, 0), (-1, -1), "RIGHT"),
+        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor(couleurs["light"])]),
+        ("GRID", (0, 0), (-1, -1), 0.25, colors.HexColor(couleurs["muted"])),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
+    ])
+    
+    def euros(x) -> str:
+        return f"{float(x):,.2f} €"
+    
+    def tableau(lignes: list, largeurs: list) -> Table:
+        t = Table(lignes, colWidths=[l * cm for l in largeurs], hAlign="LEFT")
+        t.setStyle(style_tableau)
+        return t
+    
+    rav = rapport["rav"]
+    elements = [
+        Paragraph(f"{app_name} - Rapport de {rapport['mois']} {rapport['annee']}", styles["Title"]),
+        Paragraph(f"Utilisateur : {rapport['user']}", styles["Normal"]),
+        Spacer(1, 0.6 * cm),
+        Paragraph("Reste à vivre", styles["Heading2"]),
+        tableau([
+            ["Libellé", "Montant"],
+            ["Revenus", euros(rav["revenus"])],
+            ["Dépenses Perso", euros(rav["depenses_perso"])],
+            ["Part Commune", euros(rav["part_commune"])],
+            ["Épargne", euros(rav["epargne"])],
+            ["Investissements", euros(rav["investissements"])],
+            ["Reste à Vivre", euros(rav["reste_a_vivre"])],
+        ], [8, 4]),
+        Spacer(1, 0.6 * cm),
+        Paragraph("Top 5 des dépenses", styles["Heading2"]),
+    ]
+    
+    if rapport["top_depenses"]:
+        elements.append(tableau(
+            [["Titre", "Catégorie", "Montant"]] +
+            [[str(d["Titre"])[:45], str(d["Categorie"]), euros(d["Montant"])] for d in rapport["top_depenses"]],
+            [8, 5, 4]
+        ))
+    else:
+        elements.append(Paragraph("Aucune dépense ce mois.", styles["Normal"]))
+    
+    elements += [Spacer(1, 0.6 * cm), Paragraph("Répartition par catégorie", styles["Heading2"])]
+    
+    total = sum(float(r["montant"]) for r in rapport["repartition"])
+    if total:
+        elements.append(tableau(
+            [["Catégorie", "Part", "Montant"]] +
+            [[str(r["cat"]), f"{float(r['montant']) / total:.0%}", euros(r["montant"])] for r in rapport["repartition"]],
+            [8, 3, 4]
+        ))
+    else:
+        elements.append(Paragraph("Aucune dépense ce mois.", styles["Normal"]))
+    
+    output = BytesIO()
+    SimpleDocTemplate(
+        output, pagesize=A4, title=f"Rapport {rapport['mois']} {rapport['annee']} - {rapport['user']}",
+        leftMargin=2 * cm, rightMargin=2 * cm, topMargin=2 * cm, bottomMargin=2 * cm
+    ).build(elements)
+    return output.getvalue()
@@ -0,0 +1,96 @@
+-- ==============================================================================
+-- Agrégations côté serveur (Supabase / Postgres)
+-- ==============================================================================
+-- Fonctions appelées en RPC quand BUDGET_AGREGATIONS=supabase : seules les lignes
+-- agrégées transitent, au lieu de la table "Data" complète.
+-- Mêmes règles que le calcul pandas (FinanceEngine.calculer_solde_compte,
+-- AgregationsPandas) ; l'équivalent SQLite (REQUETES_SQLITE dans app.py) sert au
+-- client Supabase local et à benchmarks/agregations.py.
+--
+-- Installation : coller ce fichier dans l'éditeur SQL de Supabase (idempotent).
+
+-- Montant texte ou numérique → numeric (mêmes règles que clean_amount : espaces,
+-- espaces insécables et € ignorés, virgule décimale ; 0 si illisible)
+create or replace function budget_montant(valeur text)
+returns numeric
+language plpgsql immutable as $$
+begin
+    return coalesce(
+        nullif(replace(replace(replace(replace(valeur, ' ', ''), chr(160), ''), '€', ''), ',', '.'), '')::numeric,
+        0
+    );
+exception when others then
+    return 0;
+end;
+$$;
+
+
+-- Solde temps réel de chaque compte : dernier relevé "Patrimoine" + mouvements postérieurs
+-- (entrées sur la cible, comptées deux fois pour un virement/épargne ; revenus sur la source ;
+-- sorties de la source pour les dépenses, investissements, épargnes et virements)
+create or replace function budget_soldes(p_comptes text[])
+returns table ("Compte" text, "Solde" numeric)
+language sql stable as $$
+    with releves as (
+        select p."Compte" as compte, p."Date"::date as jour, budget_montant(p."Montant"::text) as montant,
+               row_number() over (partition by p."Compte" order by p."Date"::date desc) as rang
+        from "Patrimoine" p
+        where p."Date" is not null and p."Compte" = any(p_comptes)
+    ),
+    base as (
+        select c.compte, coalesce(r.montant, 0) as solde, coalesce(r.jour, date '2000-01-01') as depuis
+        from unnest(p_comptes) as c(compte)
+        left join releves r on r.compte = c.compte and r.rang = 1
+    ),
+    transactions as (
+        select d."Date"::date as jour, d."Type" as type, coalesce(d."Compte_Source", '') as source,
+               coalesce(d."Compte_Cible", '') as cible, budget_montant(d."Montant"::text) as montant
+        from "Data" d
+        where d."Date" is not null
+    ),
+    mouvements as (
+        select cible as compte, jour,
+               montant * case when type in ('Virement Interne', 'Épargne') then 2 else 1 end as delta
+        from transactions where cible <> ''
+        union all
+        select source, jour, montant from transactions where type = 'Revenu' and source <> cible
+        union all
+        select source, jour, -montant from transactions
+        where type in ('Dépense', 'Investissement', 'Épargne', 'Virement Interne')
+    )
+    select b.compte, b.solde + coalesce(sum(m.delta), 0)
+    from base b
+    left join mouvements m on m.compte = b.compte and m.jour > b.depuis
+    group by b.compte, b.solde;
+$$;
+
+
+-- Total, nombre et moyenne des opérations d'un mois par (Type, Categorie)
+create or replace function budget_totaux_categories(p_mois int, p_annee int)
+returns table ("Type" text, "Categorie" text, "Total" numeric, "Nb" bigint, "Moyenne" numeric)
+language sql stable as $$
+    select d."Type", d."Categorie", sum(m.montant), count(*), avg(m.montant)
+    from "Data" d
+    cross join lateral (select budget_montant(d."Montant"::text) as montant) m
+    where d."Mois"::int = p_mois and d."Annee"::int = p_annee
+      and d."Type" is not null and d."Categorie" is not null
+    group by d."Type", d."Categorie"
+    order by d."Type", d."Categorie";
+$$;
+
+
+-- Revenus et dépenses d'un utilisateur, par mois, sur les p_nb_mois mois finissant au mois donné
+-- (les mois sans opération sont absents)
+create or replace function budget_flux_mensuels(p_utilisateur text, p_mois int, p_annee int, p_nb_mois int)
+returns table ("Annee" int, "Mois" int, "Revenus" numeric, "Depenses" numeric)
+language sql stable as $$
+    select d."Annee"::int, d."Mois"::int,
+           sum(case when d."Type" = 'Revenu' then budget_montant(d."Montant"::text) else 0 end),
+           sum(case when d."Type" = 'Dépense' then budget_montant(d."Montant"::text) else 0 end)
+    from "Data" d
+    where d."Qui_Connecte" = p_utilisateur
+      and d."Annee"::int * 12 + d."Mois"::int - 1
+          between p_annee * 12 + p_mois - p_nb_mois and p_annee * 12 + p_mois - 1
+    group by 1, 2
+    order by 1, 2;
+$$;
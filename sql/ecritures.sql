@@ -0,0 +1,23 @@
+-- ==============================================================================
+-- Clé d'écriture (insertions idempotentes)
+-- ==============================================================================
+-- Les insertions passent par le journal local de l'application (écritures
+-- différées) : chacune porte une clé générée à la saisie et part en upsert sur
+-- cette colonne. Renvoyer un lot dont la réponse s'est perdue (délai dépassé
+-- après l'enregistrement) met à jour les mêmes lignes au lieu de les dupliquer.
+-- Sans cette colonne, l'application fait un simple insert (doublon possible).
+--
+-- Installation : coller ce fichier dans l'éditeur SQL de Supabase (idempotent).
+
+do $$
+declare
+    t text;
+begin
+    foreach t in array array['Data', 'Patrimoine', 'Config', 'Comptes', 'Objectifs', 'Abonnements',
+                             'Projets_Config', 'Mots_Cles', 'Remboursements', 'Credits'] loop
+        execute format('alter table %I add column if not exists "Cle_Ecriture" text', t);
+        -- Index unique complet (pas partiel) : requis par on_conflict ; plusieurs NULL restent permis
+        execute format('create unique index if not exists %I on %I ("Cle_Ecriture")', t || '_cle_ecriture', t);
+    end loop;
+end;
+$$;
@@ -0,0 +1,47 @@
+-- ==============================================================================
+-- Versions des tables (détection des changements)
+-- ==============================================================================
+-- Une ligne par table, incrémentée par trigger à chaque écriture (y compris hors
+-- de l'application). L'application lit toute la table en une requête avant de
+-- servir ses caches : une table n'est rechargée que si sa version a changé.
+-- Sans cette table, repli sur une sonde par table (nombre de lignes + id max).
+--
+-- Installation : coller ce fichier dans l'éditeur SQL de Supabase (idempotent).
+-- La clé utilisée par l'application doit pouvoir lire "Versions".
+
+create table if not exists "Versions" (
+    "Table" text primary key,
+    "Version" bigint not null default 1
+);
+
+insert into "Versions" ("Table")
+select unnest(array['Data', 'Patrimoine', 'Config', 'Comptes', 'Objectifs', 'Abonnements',
+                    'Projets_Config', 'Mots_Cles', 'Remboursements', 'Credits'])
+on conflict ("Table") do nothing;
+
+
+-- security definer : les écritures faites avec la clé de l'application incrémentent la version
+create or replace function budget_incrementer_version()
+returns trigger
+language plpgsql security definer as $$
+begin
+    insert into "Versions" ("Table", "Version") values (tg_table_name, 1)
+    on conflict ("Table") do update set "Version" = "Versions"."Version" + 1;
+    return null;
+end;
+$$;
+
+
+-- Un trigger par instruction (une écriture groupée n'incrémente qu'une fois)
+do $$
+declare
+    t text;
+begin
+    foreach t in array array['Data', 'Patrimoine', 'Config', 'Comptes', 'Objectifs', 'Abonnements',
+                             'Projets_Config', 'Mots_Cles', 'Remboursements', 'Credits'] loop
+        execute format('drop trigger if exists budget_version on %I', t);
+        execute format('create trigger budget_version after insert or update or delete or truncate on %I '
+                       'for each statement execute function budget_incrementer_version()', t);
+    end loop;
+end;
+$$;
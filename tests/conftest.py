@@ -0,0 +1,12 @@
+"""
+Configuration des tests
+=======================
+Les tests importent app.py et les générateurs de benchmarks depuis la racine du dépôt.
+"""
+
+import sys
+from pathlib import Path
+
+RACINE = Path(__file__).resolve().parent.parent
+if str(RACINE) not in sys.path:
+    sys.path.insert(0, str(RACINE))
@@ -0,0 +1,49 @@
+"""Détection des abonnements récurrents sur un historique synthétique"""
+
+from datetime import date
+
+import pandas as pd
+
+import app
+from benchmarks.generateur import ABONNEMENTS, generer_tables
+
+REFERENCE = date(2025, 12, 31)
+
+
+def transactions(n: int = 20_000) -> pd.DataFrame:
+    return app.nettoyer_table(generer_tables(n)["Data"])
+
+
+def test_abonnements_mensuels_detectes():
+    """Les prélèvements mensuels générés sont trouvés malgré les achats ponctuels de même titre"""
+    detectes = app.detecter_abonnements(transactions(), "v20k", REFERENCE)
+    mensuels = detectes[detectes["Periodicite"] == "Mensuel"]
+    for nom, montant, jour in ABONNEMENTS:
+        ligne = mensuels[mensuels["Nom"] == nom]
+        assert len(ligne) == 1, nom
+        assert ligne["Montant"].iloc[0] == montant
+        assert ligne["Jour"].iloc[0] == jour
+
+
+def test_achats_ponctuels_non_proposes():
+    """Aucune proposition en dehors des abonnements générés (paires d'achats à un an d'écart)"""
+    detectes = app.detecter_abonnements(transactions(), "v20k", REFERENCE)
+    assert set(detectes["Nom"]) == {nom for nom, _, _ in ABONNEMENTS}
+
+
+def test_paire_annuelle_ignoree():
+    """Deux achats semblables à un an d'écart ne suffisent pas à faire un abonnement annuel"""
+    df = pd.DataFrame({
+        "Date": ["2024-03-14", "2025-03-10"],
+        "Titre": ["Decathlon", "Decathlon"],
+        "Montant": [59.90, 59.90],
+        "Type": "Dépense",
+        "Categorie": "Loisirs",
+        "Imputation": "Perso",
+        "Qui_Connecte": "Pierre",
+    })
+    assert app.detecter_abonnements(df, "paire", REFERENCE).empty
+
+    annuel = pd.concat([df, df.iloc[[0]].assign(Date="2023-03-12")], ignore_index=True)
+    detectes = app.detecter_abonnements(annuel, "trois", REFERENCE)
+    assert list(detectes["Periodicite"]) == ["Annuel"]
@@ -0,0 +1,62 @@
+"""
+Allers-retours Supabase par page, contre le client local (FakeSupabaseClient) :
+nombre de requêtes par table à froid, aucune requête au rerun qui suit.
+Mêmes mesures que benchmarks/allers_retours.py, figées ici pour détecter une régression.
+"""
+
+import json
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import app
+from benchmarks.allers_retours import CHEMIN_APP, lancer
+from benchmarks.generateur import generer_tables
+
+# Requêtes par table au premier affichage de chaque page (caches vides)
+REQUETES_A_FROID = {
+    "🏠 Accueil": {"Abonnements": 1, "Comptes": 1, "Config": 1, "Data": 1, "Objectifs": 1,
+                   "Patrimoine": 1, "Projets_Config": 1, "Versions": 1},
+    "💳 Opérations": {"Abonnements": 1, "Comptes": 1, "Config": 1, "Data": 1, "Patrimoine": 1, "Versions": 1},
+    "📊 Analyses": {"Comptes": 1, "Config": 1, "Data": 1, "Patrimoine": 1, "Versions": 1},
+    "💎 Patrimoine": {"Comptes": 1, "Config": 1, "Data": 2, "Patrimoine": 1, "Projets_Config": 1, "Versions": 1},
+    "🤝 Remboursements": {"Comptes": 1, "Config": 1, "Data": 2, "Patrimoine": 1, "Remboursements": 1,
+                         "Versions": 1},
+    "🏦 Crédits": {"Comptes": 1, "Config": 1, "Credits": 1, "Data": 1, "Patrimoine": 1, "Versions": 1},
+    "⚙️ Réglages": {"Comptes": 1, "Config": 1, "Data": 1, "Mots_Cles": 1, "Objectifs": 1, "Patrimoine": 1,
+                    "Versions": 1},
+}
+
+
+@pytest.fixture(scope="module", autouse=True)
+def supabase_local(tmp_path_factory):
+    """Tables synthétiques servies par le client local, sans latence ni échec simulés"""
+    chemin = tmp_path_factory.mktemp("supabase") / "tables.json"
+    tables = generer_tables(2_000)
+    chemin.write_text(json.dumps({nom: df.to_dict("records") for nom, df in tables.items()}, default=str))
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv(app.FAKE_SUPABASE_ENV, str(chemin))
+        mp.setenv(app.FAKE_LATENCE_ENV, "0")
+        mp.setenv(app.FAKE_ECHECS_ENV, "0")
+        mp.setenv(app.AGREGATIONS_ENV, "pandas")
+        mp.delenv(app.CACHE_PARTAGE_ENV, raising=False)
+        yield
+
+
+def test_toutes_les_pages_couvertes():
+    assert set(REQUETES_A_FROID) == set(app.PAGES)
+
+
+@pytest.mark.parametrize("page", list(REQUETES_A_FROID))
+def test_requetes_par_page(page):
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    at = AppTest.from_file(CHEMIN_APP, default_timeout=120)
+    at.session_state["page_active"] = page
+
+    _, froid = lancer(at)
+    assert froid["detail"] == {f"select {table}": n for table, n in REQUETES_A_FROID[page].items()}
+
+    _, chaud = lancer(at)
+    assert chaud["requetes"] == 0, chaud["detail"]
@@ -0,0 +1,64 @@
+"""Erreurs PostgREST passagères : nouvel essai, disjoncteur, écritures gardées en attente"""
+
+import pytest
+from postgrest.exceptions import APIError
+
+import app
+
+BASE_INJOIGNABLE = {"code": "PGRST000", "message": "Could not connect with the database due to an incorrect "
+                    "db-uri or due to the PostgreSQL service not running.", "details": None, "hint": None}
+
+
+def client_en_panne(pannes: int) -> app.ClientInstrumente:
+    """Client local dont les `pannes` premières requêtes échouent avec PGRST000"""
+    fake = app.FakeSupabaseClient({"Data": [{"id": 1, "Titre": "Loyer"}]})
+    restantes = [pannes]
+
+    def simuler_reseau():
+        if restantes[0] > 0:
+            restantes[0] -= 1
+            raise APIError(BASE_INJOIGNABLE)
+
+    fake.simuler_reseau = simuler_reseau
+    return app.ClientInstrumente(fake)
+
+
+@pytest.mark.parametrize("code", ["PGRST000", "PGRST003", "57P01", "08006", "503", 503])
+def test_codes_transitoires(code):
+    assert app.erreur_transitoire(APIError({"code": code, "message": "indisponible"}))
+
+
+@pytest.mark.parametrize("code", ["23505", "42501", "PGRST116", "PGRST204", "400", None])
+def test_codes_definitifs(code):
+    assert not app.erreur_transitoire(APIError({"code": code, "message": "refusé"}))
+
+
+def test_lecture_relancee_apres_pgrst000():
+    client = client_en_panne(1)
+    reponse = client.table("Data").select("*").execute()
+    assert [r["id"] for r in reponse.data] == [1]
+    assert client.totaux["select Data"]["echecs"] == 1
+    assert client.disjoncteur.echecs == 0
+
+
+def test_disjoncteur_ouvert_par_pgrst000():
+    client = client_en_panne(app.DISJONCTEUR_SEUIL)
+    client.disjoncteur.delai = 60
+    for _ in range(app.DISJONCTEUR_SEUIL):
+        with pytest.raises(APIError):
+            client.executer("Data", "insert", client._client.table("Data").insert({"Titre": "x"}))
+    with pytest.raises(app.SupabaseIndisponible):
+        client.table("Data").select("*").execute()
+
+
+def test_ecriture_gardee_en_attente(tmp_path, monkeypatch):
+    """Une écriture qui échoue sur PGRST000 reste dans le journal au lieu d'être rejetée"""
+    client = client_en_panne(10**6)
+    monkeypatch.setattr(app, "get_db", lambda: client)
+    file = app.FileEcritures(str(tmp_path / "ecritures.db"))
+    file.ajouter("Data", "update", {"Titre": "Courses"}, [1])
+    file.envoyer_lot()
+
+    assert file.rejetees() == []
+    attente = file.en_attente()
+    assert len(attente) == 1 and attente[0]["erreur"]  # PGRST000, ou disjoncteur ouvert par les essais